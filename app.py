@@ -8,20 +8,23 @@ import streamlit as st
 import pandas as pd
 import numpy as np
 import os
+import math
 import json
 import io
 import base64
 import urllib.request
 import time
+import heapq
+import threading
+from collections import deque
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from functools import lru_cache
 import tushare as ts
 from pypinyin import lazy_pinyin, Style
-from PIL import Image, ImageDraw, ImageFont
 
 # ========== 导入缠论算法优化器 ==========
-from chanlun_optimizer import ChanLunOptimizer, SignalScore
+from chanlun_optimizer import ChanLunOptimizer, SignalContext, SignalScore
 
 # 尝试导入efinance或akshare获取实时数据
 try:
@@ -34,6 +37,33 @@ except ImportError:
     except ImportError:
         REALTIME_DATA_SOURCE = None
 
+# 尝试导入orjson加速历史记录序列化
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 尝试导入numba加速缠论核心循环（不可用时退化为普通Python执行）
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        """numba未安装时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# 尝试导入pyarrow，已收盘日线落盘为Parquet（不可用时仅使用内存缓存）
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
 # ========== 2026年热点主线板块配置 ==========
 SECTOR_GROUPS = {
     "科技成长": {
@@ -97,7 +127,10 @@ DATA_DIR = ".streamlit_data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
 WATCHLIST_FILE = os.path.join(DATA_DIR, "watchlist.json")
-HISTORY_FILE = os.path.join(DATA_DIR, "analysis_history.json")
+HISTORY_FILE = os.path.join(DATA_DIR, "analysis_history.jsonl")  # 每行一条分析记录，只追加写入
+LEGACY_HISTORY_FILE = os.path.join(DATA_DIR, "analysis_history.json")  # 旧版整文件JSON格式
+PINYIN_CACHE_FILE = os.path.join(DATA_DIR, "pinyin_cache.json")
+DAILY_CACHE_DIR = os.path.join(DATA_DIR, "daily_cache")  # 每只股票一个Parquet文件
 
 def load_watchlist():
     """加载自选股票"""
@@ -111,55 +144,124 @@ def save_watchlist(watchlist):
     with open(WATCHLIST_FILE, 'w', encoding='utf-8') as f:
         json.dump(watchlist, f, ensure_ascii=False, indent=2)
 
+def get_watchlist_state():
+    """会话内缓存的自选列表及其代码集合（O(1)判断是否已自选）"""
+    if '_wl' not in st.session_state:
+        watchlist = load_watchlist()
+        st.session_state['_wl'] = watchlist
+        st.session_state['_wl_codes'] = {w['code'] for w in watchlist}
+    return st.session_state['_wl'], st.session_state['_wl_codes']
+
 def add_to_watchlist(code, name):
     """添加股票到自选"""
-    watchlist = load_watchlist()
-    if not any(w['code'] == code for w in watchlist):
-        watchlist.append({
-            'code': code,
-            'name': name,
-            'added_at': datetime.now().strftime('%Y-%m-%d %H:%M')
-        })
-        save_watchlist(watchlist)
-        return True
-    return False
+    watchlist, codes = get_watchlist_state()
+    if code in codes:
+        return False
+    watchlist.append({
+        'code': code,
+        'name': name,
+        'added_at': datetime.now().strftime('%Y-%m-%d %H:%M')
+    })
+    codes.add(code)
+    save_watchlist(watchlist)
+    return True
 
 def remove_from_watchlist(code):
     """从自选移除股票"""
-    watchlist = load_watchlist()
-    watchlist = [w for w in watchlist if w['code'] != code]
+    watchlist, codes = get_watchlist_state()
+    watchlist[:] = [w for w in watchlist if w['code'] != code]
+    codes.discard(code)
     save_watchlist(watchlist)
 
+HISTORY_MAX_RECORDS = 20
+
+def dumps_json_line(data):
+    """序列化为一行JSON（UTF-8字节，含换行符），用于JSONL追加写入"""
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) + b'\n'
+    return (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+
+def get_history_state():
+    """会话内缓存的分析历史（最多保留最近20次），避免每次保存都重新读取文件"""
+    if '_history' not in st.session_state:
+        st.session_state['_history'] = deque(load_analysis_history(), maxlen=HISTORY_MAX_RECORDS)
+    return st.session_state['_history']
+
+def results_signature(results):
+    """分析结果的摘要（代码、信号、价格），用于判断两次分析结果是否相同"""
+    return tuple((r.get('code'), r.get('signal'), r.get('price')) for r in results)
+
 def save_analysis_history(results):
-    """保存分析历史"""
-    history = []
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            history = json.load(f)
+    """保存分析历史（与最近一次记录结果相同时跳过，避免重复分析写入重复条目）"""
+    history = get_history_state()
+    if history and results_signature(history[-1].get('results', [])) == results_signature(results):
+        return False
     
-    # 添加本次分析
-    history.append({
+    # 添加本次分析（deque自动只保留最近20次）
+    record = {
         'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
         'results': results
-    })
-    
-    # 只保留最近20次分析
-    history = history[-20:]
+    }
+    history.append(record)
     
-    with open(HISTORY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(history, f, ensure_ascii=False, indent=2)
+    # 只追加一行，不再每次重写整个历史文件
+    with open(HISTORY_FILE, 'ab') as f:
+        f.write(dumps_json_line(record))
+    return True
 
 def load_analysis_history():
-    """加载分析历史"""
-    if os.path.exists(HISTORY_FILE):
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
+    """加载分析历史（只解析最近20条，文件积累过长时顺带压缩）"""
+    if not os.path.exists(HISTORY_FILE):
+        if not os.path.exists(LEGACY_HISTORY_FILE):
+            return []
+        # 旧版JSON文件：读取后迁移为JSONL，之后的保存直接追加
+        with open(LEGACY_HISTORY_FILE, 'r', encoding='utf-8') as f:
+            history = json.load(f)[-HISTORY_MAX_RECORDS:]
+        with open(HISTORY_FILE, 'wb') as f:
+            f.writelines(dumps_json_line(record) for record in history)
+        return history
+    
+    lines = deque(maxlen=HISTORY_MAX_RECORDS)
+    total = 0
+    with open(HISTORY_FILE, 'rb') as f:
+        for line in f:
+            if line.strip():
+                lines.append(line if line.endswith(b'\n') else line + b'\n')
+                total += 1
+    
+    if total > HISTORY_MAX_RECORDS * 2:
+        # 先写临时文件再替换，避免压缩中断导致文件损坏
+        tmp_path = HISTORY_FILE + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.writelines(lines)
+        os.replace(tmp_path, HISTORY_FILE)
+    
+    loads = orjson.loads if orjson is not None else json.loads
+    history = []
+    for line in lines:
+        try:
+            history.append(loads(line))
+        except ValueError:
+            continue  # 写入中断留下的残缺行
+    return history
+
+def load_pinyin_cache():
+    """加载股票名称拼音缓存 {名称: [首字母, 全拼]}"""
+    if os.path.exists(PINYIN_CACHE_FILE):
+        with open(PINYIN_CACHE_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
-    return []
+    return {}
+
+def save_pinyin_cache(cache):
+    """保存股票名称拼音缓存"""
+    with open(PINYIN_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False)
 
 # ========== 生成结果图片 ==========
 
+@st.cache_resource
 def get_chinese_font():
-    """获取中文字体路径 - 尝试多种方式，必要时下载"""
+    """获取中文字体路径 - 尝试多种方式，必要时下载（每个进程只探测一次）"""
     import platform
     
     # 首先检查本地缓存字体
@@ -227,52 +329,113 @@ def get_chinese_font():
     
     return None
 
+@st.cache_resource
+def load_result_fonts():
+    """加载结果图片所需的各号字体（进程级缓存，避免每次生成图片重复解析字体文件）"""
+    from PIL import ImageFont  # 仅生成图片时才需要PIL，延迟导入以缩短首次加载时间
+    
+    font_path = get_chinese_font()
+    try:
+        if font_path:
+            return {
+                'title': ImageFont.truetype(font_path, 28),
+                'subtitle': ImageFont.truetype(font_path, 18),
+                'stock': ImageFont.truetype(font_path, 20),
+                'info': ImageFont.truetype(font_path, 16),
+                'small': ImageFont.truetype(font_path, 12),
+            }
+        else:
+            raise IOError("No Chinese font found")
+    except:
+        # 使用默认字体（可能不支持中文）
+        default_font = ImageFont.load_default()
+        return {key: default_font for key in ('title', 'subtitle', 'stock', 'info', 'small')}
+
+def signal_base(signal):
+    """去掉评分后缀的信号名，如 '强力二买(评分:A)' -> '强力二买'"""
+    return signal.split('(', 1)[0]
+
+RESULT_GROUP_KEYS = ('buy3_all', 'buy3_high', 'buy3_low', 'buy3_div',
+                     'buy2_strong', 'buy2_standard', 'buy2_strong_hot', 'buy2_standard_hot',
+                     'buy2_strong_other', 'buy2_standard_other',
+                     'buy1', 'buy1_div', 'sell3', 'sell2')
+
+def categorize_results(results):
+    """
+    单次遍历将分析结果按信号分组（兼容带评分后缀的信号名）
+    返回: ({分组名: [结果, ...]}, 无信号股票数)
+    *_hot 为所属板块5日资金净流入为正的二买，*_other 为其余二买（板块资金未确认）
+    """
+    groups = {key: [] for key in RESULT_GROUP_KEYS}
+    no_signal = 0
+    for r in results:
+        sig = r['signal']
+        base = signal_base(sig)
+        if '三卖' in sig:
+            groups['sell3'].append(r)
+        elif sig == '二卖':
+            groups['sell2'].append(r)
+        elif '三买' in sig:
+            if '评分' in sig:
+                groups['buy3_all'].append(r)
+            grade = r.get('signal_grade')
+            if grade in ('A', 'B'):
+                groups['buy3_high'].append(r)
+            elif grade in ('C', 'D'):
+                groups['buy3_low'].append(r)
+            if base == '三买+背驰':
+                groups['buy3_div'].append(r)
+        elif base == '强力二买' or base == '标准二买':
+            key = 'buy2_strong' if base == '强力二买' else 'buy2_standard'
+            groups[key].append(r)
+            sector_info = r.get('sector_info')
+            if sector_info and sector_info.get('main_sector_flow', 0) > 0:
+                groups[key + '_hot'].append(r)
+            else:
+                groups[key + '_other'].append(r)
+        elif base == '一买':
+            groups['buy1'].append(r)
+        elif base == '一买+背驰':
+            groups['buy1_div'].append(r)
+        else:
+            no_signal += 1
+    return groups, no_signal
+
 def generate_result_image(results):
     """生成分析结果图片 - 使用PIL确保中文正常显示"""
     if not results:
         return None
     
-    # 筛选有信号的股票（兼容新的评分格式和二买）
-    buy2_strong = [r for r in results if r['signal'] == '强力二买']
-    buy2_standard = [r for r in results if r['signal'] == '标准二买']
-    buy3 = [r for r in results if '三买' in r['signal'] and r.get('signal_grade') in ['A', 'B']]
-    buy3_low = [r for r in results if '三买' in r['signal'] and r.get('signal_grade') in ['C', 'D']]
-    buy1 = [r for r in results if r['signal'] == '一买']
+    # 筛选有信号的股票（兼容新的评分格式和二买）- 单次遍历分组
+    groups, _ = categorize_results(results)
+    buy2_strong = groups['buy2_strong']
+    buy2_standard = groups['buy2_standard']
+    buy3 = groups['buy3_high']
+    buy3_low = groups['buy3_low']
+    buy1 = groups['buy1']
     
     # 如果没有信号股票，不生成图片
     if not buy2_strong and not buy2_standard and not buy3 and not buy1 and not buy3_low:
         return None
     
     # 获取字体
-    font_path = get_chinese_font()
+    fonts = load_result_fonts()
+    font_title = fonts['title']
+    font_subtitle = fonts['subtitle']
+    font_stock = fonts['stock']
+    font_info = fonts['info']
+    font_small = fonts['small']
     
     # 图片尺寸 - 增加二买信号的高度
     width = 800
     signal_count = len(buy2_strong) + len(buy2_standard) + len(buy3) + len(buy1)
     height = 200 + signal_count * 120  # 每个信号卡片约120像素
     
-    # 创建白色背景图片
+    # 创建白色背景图片（PIL延迟到首次生成图片时导入）
+    from PIL import Image, ImageDraw
     img = Image.new('RGB', (width, height), color='white')
     draw = ImageDraw.Draw(img)
     
-    # 尝试加载字体
-    try:
-        if font_path:
-            font_title = ImageFont.truetype(font_path, 28)
-            font_subtitle = ImageFont.truetype(font_path, 18)
-            font_stock = ImageFont.truetype(font_path, 20)
-            font_info = ImageFont.truetype(font_path, 16)
-            font_small = ImageFont.truetype(font_path, 12)
-        else:
-            raise IOError("No Chinese font found")
-    except:
-        # 使用默认字体（可能不支持中文）
-        font_title = ImageFont.load_default()
-        font_subtitle = font_title
-        font_stock = font_title
-        font_info = font_title
-        font_small = font_title
-    
     # 颜色定义
     color_title = '#2c3e50'
     color_green = '#27ae60'
@@ -300,185 +463,69 @@ def generate_result_image(results):
     draw.text((width//2, y_pos), stats_text, fill=color_dark, font=font_subtitle, anchor='mm')
     y_pos += 40
     
-    def draw_rounded_rect(draw, xy, radius, fill, outline=None, width=1):
-        """绘制圆角矩形"""
-        x1, y1, x2, y2 = xy
-        draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
-    
-    # 强力二买股票（核心买点）
-    if buy2_strong:
-        draw.text((40, y_pos), '【强力二买-核心买点】', fill=color_green, font=font_stock)
-        y_pos += 35
-        
-        for r in buy2_strong:
-            card_margin = 30
-            card_height = 90
-            draw.rounded_rectangle(
-                [card_margin, y_pos, width - card_margin, y_pos + card_height],
-                radius=10, fill=color_bg_green, outline='#c8e6c9', width=2
-            )
-            
-            price_color = color_red if r['change'] > 0 else color_green
-            line1 = f"{r['code']} {r['name']}   ¥{r['price']:.2f} ({r['change']:+.1f}%)"
-            draw.text((card_margin + 15, y_pos + 10), line1, fill=color_dark, font=font_stock)
-            
-            info_y = y_pos + 45
-            col_width = (width - 2 * card_margin - 30) // 3
-            
-            buy_text = f"买入: ¥{r['price']:.1f}"
-            draw.text((card_margin + 15, info_y), buy_text, fill=color_green, font=font_info)
-            
-            if r.get('stop_loss'):
-                stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f}"
-                draw.text((card_margin + 15 + col_width, info_y), stop_text, fill=color_red, font=font_info)
-            
-            if r.get('target_price'):
-                target_text = f"目标: ¥{r.get('target_price', 0):.1f}"
-                draw.text((card_margin + 15 + col_width * 2, info_y), target_text, fill='#1976d2', font=font_info)
-            
-            y_pos += card_height + 15
-    
-    # 标准二买股票
-    if buy2_standard:
-        y_pos += 10
-        draw.text((40, y_pos), '【标准二买-有效买点】', fill=color_orange, font=font_stock)
+    # 卡片布局（所有分组共用）
+    card_margin = 30
+    card_height = 90
+    text_x = card_margin + 15
+    col_width = (width - 2 * card_margin - 30) // 3
+    col_x = (text_x, text_x + col_width, text_x + col_width * 2)
+    
+    # 分组配置：(股票列表, 标题, 标题颜色, 卡片底色, 卡片边框, 标题前间距, 卡片样式)
+    # 卡片样式: plain=买入/止损/目标, pct=附带百分比, graded=显示评分且仅显示止损
+    sections = [
+        (buy2_strong, '【强力二买-核心买点】', color_green, color_bg_green, '#c8e6c9', 0, 'plain'),
+        (buy2_standard, '【标准二买-有效买点】', color_orange, color_bg_orange, '#ffcc80', 10, 'plain'),
+        (buy3, '【三买信号-强势突破】', color_green, color_bg_green, '#c8e6c9', 0, 'pct'),
+        (buy3_low, '【三买信号-谨慎参与(C/D级)】', color_orange, color_bg_orange, '#ffcc80', 10, 'graded'),
+        (buy1, '【一买信号-底部反转】', color_orange, color_bg_orange, '#ffe0b2', 10, 'pct'),
+    ]
+    
+    for items, title, title_color, card_bg, card_outline, gap, style in sections:
+        if not items:
+            continue
+        
+        y_pos += gap
+        draw.text((40, y_pos), title, fill=title_color, font=font_stock)
         y_pos += 35
         
-        for r in buy2_standard:
-            card_margin = 30
-            card_height = 90
-            draw.rounded_rectangle(
-                [card_margin, y_pos, width - card_margin, y_pos + card_height],
-                radius=10, fill=color_bg_orange, outline='#ffcc80', width=2
-            )
-            
-            price_color = color_red if r['change'] > 0 else color_green
-            line1 = f"{r['code']} {r['name']}   ¥{r['price']:.2f} ({r['change']:+.1f}%)"
-            draw.text((card_margin + 15, y_pos + 10), line1, fill=color_dark, font=font_stock)
-            
-            info_y = y_pos + 45
-            col_width = (width - 2 * card_margin - 30) // 3
-            
-            buy_text = f"买入: ¥{r['price']:.1f}"
-            draw.text((card_margin + 15, info_y), buy_text, fill=color_green, font=font_info)
-            
-            if r.get('stop_loss'):
-                stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f}"
-                draw.text((card_margin + 15 + col_width, info_y), stop_text, fill=color_red, font=font_info)
-            
-            if r.get('target_price'):
-                target_text = f"目标: ¥{r.get('target_price', 0):.1f}"
-                draw.text((card_margin + 15 + col_width * 2, info_y), target_text, fill='#1976d2', font=font_info)
-            
-            y_pos += card_height + 15
-    
-    # 三买股票
-    if buy3:
-        draw.text((40, y_pos), '【三买信号-强势突破】', fill=color_green, font=font_stock)
-        y_pos += 35
-        
-        for r in buy3:
+        for r in items:
             # 绘制卡片背景
-            card_margin = 30
-            card_height = 90
             draw.rounded_rectangle(
                 [card_margin, y_pos, width - card_margin, y_pos + card_height],
-                radius=10, fill=color_bg_green, outline='#c8e6c9', width=2
+                radius=10, fill=card_bg, outline=card_outline, width=2
             )
             
             # 股票信息
-            price_color = color_red if r['change'] > 0 else color_green
             line1 = f"{r['code']} {r['name']}   ¥{r['price']:.2f} ({r['change']:+.1f}%)"
-            draw.text((card_margin + 15, y_pos + 10), line1, fill=color_dark, font=font_stock)
+            if style == 'graded':
+                line1 += f" [评分:{r.get('signal_grade', '?')}]"
+            draw.text((text_x, y_pos + 10), line1, fill=color_dark, font=font_stock)
             
             # 买卖点信息 - 三列布局
             info_y = y_pos + 45
-            col_width = (width - 2 * card_margin - 30) // 3
-            
-            # 买入
-            buy_text = f"买入: ¥{r['price']:.1f}"
-            draw.text((card_margin + 15, info_y), buy_text, fill=color_green, font=font_info)
             
-            # 止损
-            if r.get('stop_loss'):
-                stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f} ({r.get('stop_loss_pct', 0):+.0f}%)"
-                draw.text((card_margin + 15 + col_width, info_y), stop_text, fill=color_red, font=font_info)
-            
-            # 目标
-            if r.get('target_price'):
-                target_text = f"目标: ¥{r.get('target_price', 0):.1f} (+{r.get('target_pct', 0):.0f}%)"
-                draw.text((card_margin + 15 + col_width * 2, info_y), target_text, fill='#1976d2', font=font_info)
-            
-            y_pos += card_height + 15
-    
-    # 三买低评分股票（谨慎）
-    if buy3_low:
-        y_pos += 10
-        draw.text((40, y_pos), '【三买信号-谨慎参与(C/D级)】', fill=color_orange, font=font_stock)
-        y_pos += 35
-        
-        for r in buy3_low:
-            # 绘制卡片背景
-            card_margin = 30
-            card_height = 90
-            draw.rounded_rectangle(
-                [card_margin, y_pos, width - card_margin, y_pos + card_height],
-                radius=10, fill=color_bg_orange, outline='#ffcc80', width=2
-            )
-            
-            # 股票信息
-            price_color = color_red if r['change'] > 0 else color_green
-            grade = r.get('signal_grade', '?')
-            line1 = f"{r['code']} {r['name']}   ¥{r['price']:.2f} ({r['change']:+.1f}%) [评分:{grade}]"
-            draw.text((card_margin + 15, y_pos + 10), line1, fill=color_dark, font=font_stock)
-            
-            # 买卖点信息
-            info_y = y_pos + 45
-            col_width = (width - 2 * card_margin - 30) // 3
-            
-            if r.get('stop_loss'):
-                stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f}"
-                draw.text((card_margin + 15, info_y), stop_text, fill=color_red, font=font_info)
-            
-            y_pos += card_height + 15
-    
-    # 一买股票
-    if buy1:
-        y_pos += 10
-        draw.text((40, y_pos), '【一买信号-底部反转】', fill=color_orange, font=font_stock)
-        y_pos += 35
-        
-        for r in buy1:
-            # 绘制卡片背景
-            card_margin = 30
-            card_height = 90
-            draw.rounded_rectangle(
-                [card_margin, y_pos, width - card_margin, y_pos + card_height],
-                radius=10, fill=color_bg_orange, outline='#ffe0b2', width=2
-            )
-            
-            # 股票信息
-            price_color = color_red if r['change'] > 0 else color_green
-            line1 = f"{r['code']} {r['name']}   ¥{r['price']:.2f} ({r['change']:+.1f}%)"
-            draw.text((card_margin + 15, y_pos + 10), line1, fill=color_dark, font=font_stock)
-            
-            # 买卖点信息
-            info_y = y_pos + 45
-            col_width = (width - 2 * card_margin - 30) // 3
-            
-            # 买入
-            buy_text = f"买入: ¥{r['price']:.1f}"
-            draw.text((card_margin + 15, info_y), buy_text, fill=color_green, font=font_info)
-            
-            # 止损
-            if r.get('stop_loss'):
-                stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f} ({r.get('stop_loss_pct', 0):+.0f}%)"
-                draw.text((card_margin + 15 + col_width, info_y), stop_text, fill=color_red, font=font_info)
-            
-            # 目标
-            if r.get('target_price'):
-                target_text = f"目标: ¥{r.get('target_price', 0):.1f} (+{r.get('target_pct', 0):.0f}%)"
-                draw.text((card_margin + 15 + col_width * 2, info_y), target_text, fill='#1976d2', font=font_info)
+            if style == 'graded':
+                if r.get('stop_loss'):
+                    stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f}"
+                    draw.text((col_x[0], info_y), stop_text, fill=color_red, font=font_info)
+            else:
+                # 买入
+                buy_text = f"买入: ¥{r['price']:.1f}"
+                draw.text((col_x[0], info_y), buy_text, fill=color_green, font=font_info)
+                
+                # 止损
+                if r.get('stop_loss'):
+                    stop_text = f"止损: ¥{r.get('stop_loss', 0):.1f}"
+                    if style == 'pct':
+                        stop_text += f" ({r.get('stop_loss_pct', 0):+.0f}%)"
+                    draw.text((col_x[1], info_y), stop_text, fill=color_red, font=font_info)
+                
+                # 目标
+                if r.get('target_price'):
+                    target_text = f"目标: ¥{r.get('target_price', 0):.1f}"
+                    if style == 'pct':
+                        target_text += f" (+{r.get('target_pct', 0):.0f}%)"
+                    draw.text((col_x[2], info_y), target_text, fill='#1976d2', font=font_info)
             
             y_pos += card_height + 15
     
@@ -489,7 +536,8 @@ def generate_result_image(results):
     
     # 保存为图片
     buf = io.BytesIO()
-    img.save(buf, format='PNG', quality=95)
+    # PNG无quality参数，压缩耗时主要在zlib；结果图以速度优先使用低压缩级别
+    img.save(buf, format='PNG', compress_level=1, optimize=False)
     buf.seek(0)
     
     return buf
@@ -510,7 +558,22 @@ if not TUSHARE_TOKEN:
     st.error("⚠️ 未设置TUSHARE_TOKEN环境变量！请在Streamlit Cloud设置中添加。")
     st.stop()
 
-pro = ts.pro_api(TUSHARE_TOKEN)
+@st.cache_resource
+def get_tushare_client():
+    """进程级共享的Tushare客户端（脚本每次重跑不再重新创建）"""
+    return ts.pro_api(TUSHARE_TOKEN)
+
+pro = get_tushare_client()
+
+# Tushare并发上限：分析线程可以多开，但同时在途的接口请求不超过该数，避免触发频率限制
+TUSHARE_MAX_CONCURRENCY = 2
+
+@st.cache_resource
+def get_tushare_slots():
+    """进程级共享的Tushare请求信号量，多个会话同时分析时也共用同一并发上限"""
+    return threading.BoundedSemaphore(TUSHARE_MAX_CONCURRENCY)
+
+_tushare_slots = get_tushare_slots()
 
 # ========== 股票列表缓存 ==========
 @st.cache_data(ttl=3600)  # 缓存1小时
@@ -520,41 +583,91 @@ def get_all_stocks():
         df = pro.stock_basic(exchange='', list_status='L', 
                             fields='ts_code,symbol,name,area,industry')
         if df is not None and not df.empty:
-            # 添加拼音首字母
-            df['pinyin'] = df['name'].apply(lambda x: ''.join(lazy_pinyin(x, style=Style.FIRST_LETTER)).upper())
-            df['pinyin_full'] = df['name'].apply(lambda x: ''.join(lazy_pinyin(x)).lower())
+            # 地区、行业取值重复度高，转为分类类型以节省内存
+            df[['area', 'industry']] = df[['area', 'industry']].astype('category')
+            
+            # 添加拼音首字母（拼音结果落盘缓存，只为新出现的名称计算）
+            pinyin_cache = load_pinyin_cache()
+            new_names = [x for x in df['name'].unique() if x not in pinyin_cache]
+            for x in new_names:
+                pinyin_cache[x] = [
+                    ''.join(lazy_pinyin(x, style=Style.FIRST_LETTER)).upper(),
+                    ''.join(lazy_pinyin(x)).lower()
+                ]
+            if new_names:
+                save_pinyin_cache(pinyin_cache)
+            
+            df['pinyin'] = df['name'].map(lambda x: pinyin_cache[x][0])
+            df['pinyin_full'] = df['name'].map(lambda x: pinyin_cache[x][1])
             return df
     except:
         pass
     return None
 
-def search_stocks(query, stock_df, limit=20):
+def build_search_index(stock_df):
+    """
+    为代码和拼音首字母构建有序前缀索引
+    返回: {'df': 股票列表, 'symbol'/'pinyin': (排序后的值, 对应原始行号)}
+    """
+    index = {'df': stock_df}
+    for col in ('symbol', 'pinyin'):
+        values = stock_df[col].fillna('').astype(str).to_numpy(dtype=str)
+        order = np.argsort(values, kind='stable')
+        index[col] = (values[order], order)
+    return index
+
+@st.cache_resource(ttl=3600)
+def get_stock_search_index():
+    """股票搜索索引（进程内共享，与股票列表同步每小时刷新）"""
+    df = get_all_stocks()
+    if df is None:
+        return None
+    return build_search_index(df.reset_index(drop=True))
+
+def _prefix_rows(index, col, prefix):
+    """二分查找以prefix开头的行号（按原始顺序）"""
+    sorted_values, order = index[col]
+    lo = np.searchsorted(sorted_values, prefix, side='left')
+    hi = np.searchsorted(sorted_values, prefix + '\uffff', side='left')
+    return np.sort(order[lo:hi])
+
+def search_stocks(query, stock_df, limit=20, index=None):
     """搜索股票：支持代码、中文名称、拼音首字母"""
     if not query or stock_df is None:
         return []
     
+    if index is None or index['df'] is not stock_df:
+        index = build_search_index(stock_df.reset_index(drop=True))
+    stock_df = index['df']
+    
     query = query.strip().upper()
     
-    # 1. 代码搜索（精确匹配开头）
-    code_match = stock_df[stock_df['symbol'].str.startswith(query, na=False)]
+    # 按匹配优先级合并行号（有序去重），凑够limit条后不再做后续全表扫描
+    rows = {}
+    
+    # 1. 代码搜索（精确匹配开头，二分查找）
+    rows.update(dict.fromkeys(_prefix_rows(index, 'symbol', query).tolist()))
     
     # 2. 中文名称搜索（包含）
-    name_match = stock_df[stock_df['name'].str.contains(query, na=False, case=False)]
+    if len(rows) < limit:
+        name_mask = stock_df['name'].str.contains(query, na=False, case=False, regex=False).to_numpy()
+        rows.update(dict.fromkeys(np.flatnonzero(name_mask).tolist()))
     
-    # 3. 拼音首字母搜索
-    pinyin_match = stock_df[stock_df['pinyin'].str.startswith(query, na=False)]
+    # 3. 拼音首字母搜索（二分查找）
+    if len(rows) < limit:
+        rows.update(dict.fromkeys(_prefix_rows(index, 'pinyin', query).tolist()))
     
     # 4. 全拼搜索
-    pinyin_full_match = stock_df[stock_df['pinyin_full'].str.contains(query.lower(), na=False)]
-    
-    # 合并结果并去重
-    result = pd.concat([code_match, name_match, pinyin_match, pinyin_full_match]).drop_duplicates()
+    if len(rows) < limit:
+        full_mask = stock_df['pinyin_full'].str.contains(query.lower(), na=False, regex=False).to_numpy()
+        rows.update(dict.fromkeys(np.flatnonzero(full_mask).tolist()))
     
     # 返回前limit个
-    return result.head(limit).to_dict('records')
+    return stock_df.iloc[list(rows)[:limit]].to_dict('records')
 
-# 获取股票列表
-stock_df = get_all_stocks()
+# 获取股票列表及搜索索引
+stock_index = get_stock_search_index()
+stock_df = stock_index['df'] if stock_index else None
 
 # ========== CSS样式 ==========
 st.markdown("""
@@ -589,294 +702,548 @@ st.markdown("""
 
 # ========== 缠论核心算法 ==========
 
-def handle_inclusion(df):
-    """K线包含处理"""
-    if df.empty:
-        return df
-    
-    df = df.copy()
-    df.columns = [str(col).lower() for col in df.columns]
-    processed_candles = []
+@njit(cache=True)
+def _merge_inclusion(o, h, l, c):
+    """
+    包含关系合并内核（numba编译）
+    返回: (每组首根K线位置, 合并后open, high, low, close, 有效长度n)
+    """
+    size = len(h)
+    starts = np.empty(size, dtype=np.int64)
+    o2 = np.empty(size, dtype=np.float64)
+    h2 = np.empty(size, dtype=np.float64)
+    l2 = np.empty(size, dtype=np.float64)
+    c2 = np.empty(size, dtype=np.float64)
+    n = 0
     i = 0
     
-    while i < len(df):
-        current_candle = df.iloc[i].copy()
+    while i < size:
+        co, ch, cl, cc = o[i], h[i], l[i], c[i]
         j = i + 1
         
-        while j < len(df):
-            next_candle = df.iloc[j]
-            is_included = (next_candle['high'] >= current_candle['high'] and 
-                          next_candle['low'] <= current_candle['low'])
-            is_including = (next_candle['high'] <= current_candle['high'] and 
-                           next_candle['low'] >= current_candle['low'])
+        while j < size:
+            is_included = h[j] >= ch and l[j] <= cl
+            is_including = h[j] <= ch and l[j] >= cl
             
             if is_included or is_including:
-                current_candle['high'] = max(current_candle['high'], next_candle['high'])
-                current_candle['low'] = min(current_candle['low'], next_candle['low'])
-                current_candle['open'] = next_candle['open']
-                current_candle['close'] = next_candle['close']
+                ch = max(ch, h[j])
+                cl = min(cl, l[j])
+                co = o[j]
+                cc = c[j]
                 j += 1
             else:
                 break
         
-        processed_candles.append(current_candle)
+        starts[n] = i
+        o2[n] = co
+        h2[n] = ch
+        l2[n] = cl
+        c2[n] = cc
+        n += 1
         i = j
     
-    return pd.DataFrame(processed_candles)
-
-def is_top_fractal(df, idx):
-    """顶分型判断"""
-    if idx < 2 or idx >= len(df):
-        return False
-    p2 = df.iloc[idx-1]
-    p1 = df.iloc[idx-2]
-    p3 = df.iloc[idx]
-    return (p2['high'] > p1['high'] and p2['high'] > p3['high'] and 
-            p2['low'] > p1['low'] and p2['low'] > p3['low'])
-
-def is_bottom_fractal(df, idx):
-    """底分型判断"""
-    if idx < 2 or idx >= len(df):
-        return False
-    p2 = df.iloc[idx-1]
-    p1 = df.iloc[idx-2]
-    p3 = df.iloc[idx]
-    return (p2['low'] < p1['low'] and p2['low'] < p3['low'] and 
-            p2['high'] < p1['high'] and p2['high'] < p3['high'])
+    return starts, o2, h2, l2, c2, n
 
-def find_strokes(df):
-    """寻找缠论笔"""
-    if df.empty or len(df) < 5:
-        return [], 0, 0
+def handle_inclusion(df):
+    """K线包含处理"""
+    if df.empty:
+        return df
     
-    strokes = []
-    fractals = []
+    df = df.copy()
+    df.columns = [str(col).lower() for col in df.columns]
+    
+    # 一次性取出OHLC数组交给编译内核，避免逐行iloc构造Series
+    o, h, l, c = np.ascontiguousarray(df[['open', 'high', 'low', 'close']].to_numpy(dtype=np.float64).T)
+    starts, o2, h2, l2, c2, n = _merge_inclusion(o, h, l, c)
+    
+    # 其余列（日期、成交量等）沿用每组首根K线的值
+    result = df.iloc[starts[:n]].copy()
+    result['open'] = o2[:n]
+    result['high'] = h2[:n]
+    result['low'] = l2[:n]
+    result['close'] = c2[:n]
+    # 每根合并K线对应的原始K线位置（组内首根），供笔的端点映射回原始数组
+    result['orig_idx'] = starts[:n]
+    return result
+
+@njit(cache=True)
+def _find_strokes_kernel(h, l):
+    """
+    分型识别 + 笔划分一次遍历完成（numba编译）
+    分型按K线顺序产生，直接流式送入笔划分状态机，无需中间数组
+    返回: (笔方向(1=上, 0=下), 起点K线位置, 终点K线位置, 起点价格, 终点价格, 笔数, 顶分型数, 底分型数)
+    """
+    size = len(h)
+    types = np.empty(size, dtype=np.int8)
+    start_idx = np.empty(size, dtype=np.int64)
+    end_idx = np.empty(size, dtype=np.int64)
+    start_val = np.empty(size, dtype=np.float64)
+    end_val = np.empty(size, dtype=np.float64)
+    n = 0
     ding_count = 0
     di_count = 0
     
-    for i in range(2, len(df)):
-        if is_top_fractal(df, i):
-            fractals.append({'idx': i-1, 'type': 'top', 'price': df.iloc[i-1]['high']})
+    # 当前笔起点分型（类型: 1=顶, 0=底）
+    has_start = False
+    s_idx = 0
+    s_type = 0
+    s_price = 0.0
+    
+    for k in range(1, size - 1):
+        if h[k] > h[k-1] and h[k] > h[k+1] and l[k] > l[k-1] and l[k] > l[k+1]:
+            f_type = 1
+            f_price = h[k]
             ding_count += 1
-        elif is_bottom_fractal(df, i):
-            fractals.append({'idx': i-1, 'type': 'bottom', 'price': df.iloc[i-1]['low']})
+        elif l[k] < l[k-1] and l[k] < l[k+1] and h[k] < h[k-1] and h[k] < h[k+1]:
+            f_type = 0
+            f_price = l[k]
             di_count += 1
-    
-    if len(fractals) < 2:
-        return strokes, ding_count, di_count
-    
-    current_stroke_start = None
-    for i in range(len(fractals)):
-        current_fractal = fractals[i]
-        if current_stroke_start is None:
-            current_stroke_start = current_fractal
         else:
-            if current_fractal['type'] != current_stroke_start['type']:
-                if current_fractal['idx'] - current_stroke_start['idx'] >= 2:
-                    if (current_stroke_start['type'] == 'bottom' and 
-                        current_fractal['type'] == 'top' and 
-                        current_fractal['price'] > current_stroke_start['price']):
-                        strokes.append({'type': 'up', 'start': current_stroke_start['price'], 'end': current_fractal['price']})
-                        current_stroke_start = current_fractal
-                    elif (current_stroke_start['type'] == 'top' and 
-                          current_fractal['type'] == 'bottom' and 
-                          current_fractal['price'] < current_stroke_start['price']):
-                        strokes.append({'type': 'down', 'start': current_stroke_start['price'], 'end': current_fractal['price']})
-                        current_stroke_start = current_fractal
-                    else:
-                        current_stroke_start = current_fractal
-                else:
-                    current_stroke_start = current_fractal
-            else:
-                if ((current_fractal['type'] == 'top' and current_fractal['price'] > current_stroke_start['price']) or
-                    (current_fractal['type'] == 'bottom' and current_fractal['price'] < current_stroke_start['price'])):
-                    current_stroke_start = current_fractal
+            continue
+        
+        if not has_start:
+            has_start = True
+            s_idx, s_type, s_price = k, f_type, f_price
+        elif f_type != s_type:
+            if k - s_idx >= 2:
+                # 底 -> 更高的顶：向上笔；顶 -> 更低的底：向下笔
+                if (s_type == 0 and f_price > s_price) or (s_type == 1 and f_price < s_price):
+                    types[n] = f_type
+                    start_idx[n] = s_idx
+                    end_idx[n] = k
+                    start_val[n] = s_price
+                    end_val[n] = f_price
+                    n += 1
+            s_idx, s_type, s_price = k, f_type, f_price
+        elif (f_type == 1 and f_price > s_price) or (f_type == 0 and f_price < s_price):
+            # 同类分型取更极端者作为起点
+            s_idx, s_type, s_price = k, f_type, f_price
+    
+    return types, start_idx, end_idx, start_val, end_val, n, ding_count, di_count
+
+def find_strokes(df):
+    """
+    寻找缠论笔
+    笔的start_idx/end_idx是原始K线位置：df含handle_inclusion写入的orig_idx列时，
+    合并后K线的位置经orig_idx映射回去，可直接索引未合并的df数组（MACD柱、最低价等）
+    """
+    if df.empty or len(df) < 5:
+        return [], 0, 0
+    
+    h = df['high'].to_numpy(dtype=np.float64)
+    l = df['low'].to_numpy(dtype=np.float64)
+    types, start_idx, end_idx, start_val, end_val, n, ding_count, di_count = _find_strokes_kernel(h, l)
+    if 'orig_idx' in df.columns:
+        orig_idx = df['orig_idx'].to_numpy(dtype=np.int64)
+        start_idx = orig_idx[start_idx[:n]]
+        end_idx = orig_idx[end_idx[:n]]
+    
+    # 仅在边界处转换为字典列表
+    strokes = [
+        {
+            'type': 'up' if types[k] == 1 else 'down',
+            'start': start_val[k], 'end': end_val[k],
+            'start_idx': int(start_idx[k]), 'end_idx': int(end_idx[k])
+        }
+        for k in range(n)
+    ]
     
-    return strokes, ding_count, di_count
+    return strokes, int(ding_count), int(di_count)
+
+def last_stroke_of(strokes, stroke_type):
+    """从末尾反向查找最近一笔指定方向('up'/'down')的笔，找不到返回None"""
+    for s in reversed(strokes):
+        if s['type'] == stroke_type:
+            return s
+    return None
 
 def calculate_zhongshu(df):
     """计算中枢"""
-    df['mid'] = (df['high'] + df['low']) / 2
+    mid = (df['high'].to_numpy(dtype=np.float64) + df['low'].to_numpy(dtype=np.float64)) / 2
+    n = len(mid)
+    if n == 0:
+        return {'low': np.nan, 'high': np.nan}
+    
+    # 与Series.quantile相同的线性插值，用np.partition选择代替两次全排序
+    pos = np.array([0.40, 0.60]) * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    part = np.partition(mid, np.unique(np.concatenate([lo, hi])))
+    q = part[lo] + (part[hi] - part[lo]) * (pos - lo)
     return {
-        'low': df['mid'].quantile(0.40),
-        'high': df['mid'].quantile(0.60),
+        'low': q[0],
+        'high': q[1],
     }
 
+@njit(cache=True)
+def _macd_kernel(close, alpha_fast, alpha_slow, alpha_signal):
+    """
+    单次遍历计算MACD（numba编译，等价于ewm(adjust=False)）
+    返回: (ema_fast, ema_slow, macd, macd_signal, macd_hist)
+    """
+    n = len(close)
+    ema_fast = np.empty(n, dtype=np.float64)
+    ema_slow = np.empty(n, dtype=np.float64)
+    macd = np.empty(n, dtype=np.float64)
+    macd_signal = np.empty(n, dtype=np.float64)
+    macd_hist = np.empty(n, dtype=np.float64)
+    if n == 0:
+        return ema_fast, ema_slow, macd, macd_signal, macd_hist
+    
+    ef = close[0]
+    es = close[0]
+    sig = 0.0
+    for i in range(n):
+        if i > 0:
+            ef = ef + alpha_fast * (close[i] - ef)
+            es = es + alpha_slow * (close[i] - es)
+        m = ef - es
+        if i == 0:
+            sig = m
+        else:
+            sig = sig + alpha_signal * (m - sig)
+        ema_fast[i] = ef
+        ema_slow[i] = es
+        macd[i] = m
+        macd_signal[i] = sig
+        macd_hist[i] = m - sig
+    
+    return ema_fast, ema_slow, macd, macd_signal, macd_hist
+
 def calculate_macd(df, fast=12, slow=26, signal=9):
     """计算MACD指标"""
     df = df.copy()
-    df['ema_fast'] = df['close'].ewm(span=fast, adjust=False).mean()
-    df['ema_slow'] = df['close'].ewm(span=slow, adjust=False).mean()
-    df['macd'] = df['ema_fast'] - df['ema_slow']
-    df['macd_signal'] = df['macd'].ewm(span=signal, adjust=False).mean()
-    df['macd_hist'] = df['macd'] - df['macd_signal']
+    close = df['close'].to_numpy(dtype=np.float64)
+    ema_fast, ema_slow, macd, macd_signal, macd_hist = _macd_kernel(
+        close, 2.0 / (fast + 1), 2.0 / (slow + 1), 2.0 / (signal + 1)
+    )
+    df['ema_fast'] = ema_fast
+    df['ema_slow'] = ema_slow
+    df['macd'] = macd
+    df['macd_signal'] = macd_signal
+    df['macd_hist'] = macd_hist
     return df
 
-def calculate_stroke_macd_area(df, stroke_start_idx, stroke_end_idx):
-    """计算笔对应的MACD面积（用于背驰判断）"""
-    if stroke_start_idx < 0 or stroke_end_idx >= len(df) or stroke_start_idx >= stroke_end_idx:
-        return 0, 0
+@njit(cache=True)
+def macd_hist_fading(hist, i, ref_idx):
+    """
+    力度衰竭：以i结尾的3根MACD柱面积绝对值是否小于以ref_idx结尾的3根
+    调用方保证 i >= 2 且 ref_idx >= 2
+    """
+    curr = abs(hist[i-2] + hist[i-1] + hist[i])
+    prev = abs(hist[ref_idx-2] + hist[ref_idx-1] + hist[ref_idx])
+    return curr < prev
+
+def calculate_stroke_macd_areas(df, strokes):
+    """
+    批量计算每一笔对应的MACD面积（用于背驰判断）
+    df为未合并的原始K线（含macd_hist），strokes的start_idx/end_idx为原始K线位置（见find_strokes）
+    返回: (红柱面积数组, 绿柱面积数组)，与strokes顺序一一对应
+    """
+    count = len(strokes)
+    if count == 0 or 'macd_hist' not in df.columns:
+        return np.zeros(count), np.zeros(count)
+    
+    hist = df['macd_hist'].to_numpy(dtype=np.float64)
+    
+    # 红绿柱前缀和：相邻笔共享端点，区间相互重叠，用前缀差值一次求出所有笔的面积
+    pos_cum = np.concatenate(([0.0], np.cumsum(np.where(hist > 0, hist, 0.0))))
+    neg_cum = np.concatenate(([0.0], np.cumsum(np.where(hist < 0, -hist, 0.0))))
     
-    macd_data = df.iloc[stroke_start_idx:stroke_end_idx+1]['macd_hist']
+    starts = np.fromiter((s['start_idx'] for s in strokes), dtype=np.int64, count=count)
+    ends = np.fromiter((s['end_idx'] for s in strokes), dtype=np.int64, count=count)
+    valid = (starts >= 0) & (ends < len(hist)) & (starts < ends)
+    lo = np.where(valid, starts, 0)
+    hi = np.where(valid, ends + 1, 0)
     
-    # 计算红绿柱面积（绝对值之和）
-    positive_area = macd_data[macd_data > 0].sum()  # 红柱面积
-    negative_area = abs(macd_data[macd_data < 0].sum())  # 绿柱面积
+    positive_area = np.where(valid, pos_cum[hi] - pos_cum[lo], 0.0)  # 红柱面积
+    negative_area = np.where(valid, neg_cum[hi] - neg_cum[lo], 0.0)  # 绿柱面积
     
     return positive_area, negative_area
 
-def check_divergence(df, strokes, zhongshu):
+def analyze_signals(df, strokes, zhongshu):
     """
-    检查背驰信号
+    一次遍历笔列表，同时检查背驰信号与卖出信号（三卖、二卖）
     返回: {
-        'has_divergence': bool,
-        'divergence_type': str,  # '底背驰' 或 '顶背驰'
-        'divergence_strength': str,  # '强' 或 '弱'
-        'explanation': str
+        'divergence': {
+            'has_divergence': bool,
+            'divergence_type': str,  # '底背驰' 或 '顶背驰'
+            'divergence_strength': str,  # '强' 或 '弱'
+            'explanation': str
+        },
+        'sell_signal': {
+            'has_sell_signal': bool,
+            'sell_type': str,  # '三卖' 或 '二卖'
+            'explanation': str
+        }
     }
     """
-    if len(strokes) < 2:
-        return {'has_divergence': False, 'divergence_type': None, 'divergence_strength': None, 'explanation': ''}
-    
-    result = {'has_divergence': False, 'divergence_type': None, 'divergence_strength': None, 'explanation': ''}
-    
-    # 获取最近的两笔下跌（用于底背驰判断）
-    down_strokes = [s for s in strokes if s['type'] == 'down']
+    divergence = {'has_divergence': False, 'divergence_type': None, 'divergence_strength': None, 'explanation': ''}
+    sell_signal = {'has_sell_signal': False, 'sell_type': None, 'explanation': ''}
     
-    if len(down_strokes) >= 2:
-        # 取最近两笔下跌
-        last_down = down_strokes[-1]
-        prev_down = down_strokes[-2]
-        
+    if len(strokes) < 2:
+        return {'divergence': divergence, 'sell_signal': sell_signal}
+    
+    current_price = df['close'].to_numpy()[-1]
+    
+    # 倒序扫描一次，取最近两笔下跌与最近两笔上涨
+    last_down = prev_down = last_up = prev_up = None
+    for s in reversed(strokes):
+        if s['type'] == 'down':
+            if last_down is None:
+                last_down = s
+            elif prev_down is None:
+                prev_down = s
+        else:
+            if last_up is None:
+                last_up = s
+            elif prev_up is None:
+                prev_up = s
+        if prev_down is not None and prev_up is not None:
+            break
+    
+    # ===== 背驰判断 =====
+    # 最近两笔下跌（用于底背驰判断）
+    if prev_down is not None:
         # 价格创新低判断
         price_new_low = last_down['end'] < prev_down['end']
         
-        # 获取对应的MACD数据（简化处理，用笔的终点附近数据）
-        # 实际应该用分型对应的具体K线位置
-        current_price_drop = abs(last_down['end'] - last_down['start'])
-        prev_price_drop = abs(prev_down['end'] - prev_down['start'])
-        
         # 简化背驰判断：后一笔价格跌幅更大，但MACD面积更小
         # 这里用价格跌幅和MACD柱状体高度来近似
-        if price_new_low and current_price_drop > prev_price_drop * 0.8:
-            # 检查是否在中枢下方（一买区域）
-            current_price = df.iloc[-1]['close']
-            if current_price < zhongshu['low']:
-                result['has_divergence'] = True
-                result['divergence_type'] = '底背驰'
-                result['divergence_strength'] = '中'
-                result['explanation'] = f'价格创新低但力度减弱，可能形成一买背驰'
-    
-    # 获取最近的两笔上涨（用于顶背驰判断）
-    up_strokes = [s for s in strokes if s['type'] == 'up']
-    
-    if len(up_strokes) >= 2:
-        last_up = up_strokes[-1]
-        prev_up = up_strokes[-2]
+        current_price_drop = abs(last_down['end'] - last_down['start'])
+        prev_price_drop = abs(prev_down['end'] - prev_down['start'])
         
+        # 检查是否在中枢下方（一买区域）
+        if price_new_low and current_price_drop > prev_price_drop * 0.8 and current_price < zhongshu['low']:
+            divergence['has_divergence'] = True
+            divergence['divergence_type'] = '底背驰'
+            divergence['divergence_strength'] = '中'
+            divergence['explanation'] = f'价格创新低但力度减弱，可能形成一买背驰'
+    
+    # 最近两笔上涨（用于顶背驰判断）
+    if prev_up is not None:
         # 价格创新高判断
         price_new_high = last_up['end'] > prev_up['end']
         
         current_price_rise = last_up['end'] - last_up['start']
         prev_price_rise = prev_up['end'] - prev_up['start']
         
-        if price_new_high and current_price_rise < prev_price_rise * 1.2:
-            current_price = df.iloc[-1]['close']
-            if current_price > zhongshu['high']:
-                result['has_divergence'] = True
-                result['divergence_type'] = '顶背驰'
-                result['divergence_strength'] = '中'
-                result['explanation'] = f'价格创新高但力度减弱，可能形成背驰卖点'
-    
-    return result
-
-def check_sell_signals(df, strokes, zhongshu):
-    """
-    检查卖出信号（三卖）
-    三卖定义：向下离开中枢后，反弹（向上笔）不回到中枢内
-    """
-    if len(strokes) < 3:
-        return {'has_sell_signal': False, 'sell_type': None, 'explanation': ''}
-    
-    result = {'has_sell_signal': False, 'sell_type': None, 'explanation': ''}
+        if price_new_high and current_price_rise < prev_price_rise * 1.2 and current_price > zhongshu['high']:
+            divergence['has_divergence'] = True
+            divergence['divergence_type'] = '顶背驰'
+            divergence['divergence_strength'] = '中'
+            divergence['explanation'] = f'价格创新高但力度减弱，可能形成背驰卖点'
     
-    current_price = df.iloc[-1]['close']
-    
-    # 获取最近三笔
-    recent_strokes = strokes[-3:]
-    
-    # 三卖判断：向下离开中枢 + 反弹不回中枢
-    # 模式：down -> up -> down (当前在最后一笔下跌中)
-    if (recent_strokes[0]['type'] == 'down' and 
-        recent_strokes[1]['type'] == 'up' and 
-        recent_strokes[2]['type'] == 'down'):
+    # ===== 卖出信号 =====
+    if len(strokes) >= 3:
+        # 获取最近三笔
+        recent_strokes = strokes[-3:]
         
-        # 第一笔向下离开中枢
-        first_down_low = recent_strokes[0]['end']
-        # 第二笔反弹高点
-        rebound_high = recent_strokes[1]['end']
-        
-        # 判断：反弹高点低于中枢下沿（不回中枢）
-        if rebound_high < zhongshu['low'] and current_price < rebound_high:
-            result['has_sell_signal'] = True
-            result['sell_type'] = '三卖'
-            result['explanation'] = '向下离开中枢后反弹未回中枢，三卖信号'
-    
-    # 二卖判断（简化）：向上突破中枢后，回抽跌破中枢上沿
-    if (recent_strokes[0]['type'] == 'up' and 
-        recent_strokes[1]['type'] == 'down'):
-        
-        up_high = recent_strokes[0]['end']
-        down_low = recent_strokes[1]['end']
+        # 三卖判断：向下离开中枢 + 反弹不回中枢
+        # 模式：down -> up -> down (当前在最后一笔下跌中)
+        if (recent_strokes[0]['type'] == 'down' and 
+            recent_strokes[1]['type'] == 'up' and 
+            recent_strokes[2]['type'] == 'down'):
+            
+            # 第二笔反弹高点
+            rebound_high = recent_strokes[1]['end']
+            
+            # 判断：反弹高点低于中枢下沿（不回中枢）
+            if rebound_high < zhongshu['low'] and current_price < rebound_high:
+                sell_signal['has_sell_signal'] = True
+                sell_signal['sell_type'] = '三卖'
+                sell_signal['explanation'] = '向下离开中枢后反弹未回中枢，三卖信号'
         
-        # 向上突破后回抽到中枢内
-        if up_high > zhongshu['high'] and down_low < zhongshu['high'] and down_low > zhongshu['low']:
-            if current_price < zhongshu['high']:
-                result['has_sell_signal'] = True
-                result['sell_type'] = '二卖'
-                result['explanation'] = '突破后回抽至中枢内，二卖信号'
+        # 二卖判断（简化）：向上突破中枢后，回抽跌破中枢上沿
+        if (recent_strokes[0]['type'] == 'up' and 
+            recent_strokes[1]['type'] == 'down'):
+            
+            up_high = recent_strokes[0]['end']
+            down_low = recent_strokes[1]['end']
+            
+            # 向上突破后回抽到中枢内
+            if up_high > zhongshu['high'] and down_low < zhongshu['high'] and down_low > zhongshu['low']:
+                if current_price < zhongshu['high']:
+                    sell_signal['has_sell_signal'] = True
+                    sell_signal['sell_type'] = '二卖'
+                    sell_signal['explanation'] = '突破后回抽至中枢内，二卖信号'
     
-    return result
+    return {'divergence': divergence, 'sell_signal': sell_signal}
 
 
 # ==================== 性能优化：缓存 + 多线程 ====================
 
-@st.cache_data(ttl=600, max_entries=20)
-def get_cached_stock_data(ts_code, start_date, end_date):
+def get_last_trade_date(now=None):
     """
-    缓存版股票数据获取（10分钟TTL，最多20条）
-    使用不复权价格(adj=None)确保价格准确
-    只保留核心列：open, high, low, close, vol
+    最近一个已收盘交易日（YYYYMMDD）
+    收盘数据16点后才完整，盘中及周末统一回退，使同一交易日内的重复请求命中同一缓存键
+    """
+    now = now or datetime.now()
+    day = now if now.hour >= 16 else now - timedelta(days=1)
+    while day.weekday() >= 5:  # 周六、周日回退到周五
+        day -= timedelta(days=1)
+    return day.strftime('%Y%m%d')
+
+
+def _daily_cache_path(ts_code):
+    return os.path.join(DAILY_CACHE_DIR, f"{ts_code}.parquet")
+
+
+def _daily_cache_meta(ts_code):
+    """读取本地日线缓存的覆盖区间（只读文件元数据），无缓存返回(None, None)"""
+    path = _daily_cache_path(ts_code)
+    if pq is None or not os.path.exists(path):
+        return None, None
+    try:
+        meta = pq.read_schema(path).metadata or {}
+    except Exception:
+        return None, None
+    covered_from = meta.get(b'covered_from')
+    covered_to = meta.get(b'covered_to')
+    if not covered_from or not covered_to:
+        return None, None
+    return covered_from.decode(), covered_to.decode()
+
+
+def daily_cache_covers(ts_code, start_date, end_date):
+    """本地日线缓存是否已完整覆盖[start_date, end_date]"""
+    covered_from, covered_to = _daily_cache_meta(ts_code)
+    return covered_from is not None and covered_from <= start_date and covered_to >= end_date
+
+
+def load_daily_cache(ts_code):
+    """
+    读取本地日线缓存
+    返回: (DataFrame, 覆盖起始日, 覆盖结束日)；无缓存或读取失败返回(None, None, None)
     """
+    covered_from, covered_to = _daily_cache_meta(ts_code)
+    if covered_from is None:
+        return None, None, None
     try:
+        return pq.read_table(_daily_cache_path(ts_code)).to_pandas(), covered_from, covered_to
+    except Exception:
+        return None, None, None
+
+
+def save_daily_cache(ts_code, df, covered_from):
+    """
+    写入本地日线缓存（按交易日升序，zstd压缩，先写临时文件再替换）
+    覆盖区间记录在Parquet元数据中：结束日取实际返回的最新trade_date，而不是请求的end_date，
+    当天K线尚未发布时覆盖区间不会前移，下次补取仍会请求这一天；未收盘的交易日不落盘
+    """
+    if pq is None or df is None or df.empty:
+        return
+    covered_to = str(df['trade_date'].max())
+    if covered_to > get_last_trade_date():
+        return
+    try:
+        os.makedirs(DAILY_CACHE_DIR, exist_ok=True)
+        df = df.sort_values('trade_date', kind='stable').reset_index(drop=True)
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        meta = dict(table.schema.metadata or {})
+        meta[b'covered_from'] = covered_from.encode()
+        meta[b'covered_to'] = covered_to.encode()
+        path = _daily_cache_path(ts_code)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        pq.write_table(table.replace_schema_metadata(meta), tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+    except Exception as e:
+        print(f"写入{ts_code}日线缓存失败: {e}")
+
+
+def _fetch_daily(ts_code, start_date, end_date):
+    """请求单只股票日线（受并发上限与请求间隔限速），只保留核心列"""
+    with _tushare_slots:
         time.sleep(0.5)  # 限速：每次请求间隔0.5秒
         # 显式指定不复权(adj=None)避免复权导致价格失真
         df = pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
-        
-        # 精简数据：只保留核心列
-        if df is not None and not df.empty:
-            essential_cols = ['trade_date', 'open', 'high', 'low', 'close', 'vol']
-            df = df[[col for col in essential_cols if col in df.columns]]
-        
+    
+    # 精简数据：只保留核心列
+    if df is not None and not df.empty:
+        essential_cols = ['trade_date', 'open', 'high', 'low', 'close', 'vol']
+        df = df[[col for col in essential_cols if col in df.columns]]
+    return df
+
+
+@st.cache_data(ttl=1800, max_entries=2000)
+def get_cached_stock_data(ts_code, start_date, end_date):
+    """
+    缓存版股票数据获取（30分钟TTL，最多2000条，覆盖整个扫描股票池）
+    使用不复权价格(adj=None)确保价格准确
+    只保留核心列：open, high, low, close, vol
+    已收盘K线不会再变化，同时落盘到本地Parquet缓存：重复扫描只需补取缓存之后的新K线
+    """
+    try:
+        cached, covered_from, covered_to = load_daily_cache(ts_code)
+        if cached is not None and covered_from <= start_date:
+            if covered_to < end_date:
+                tail_start = (datetime.strptime(covered_to, '%Y%m%d') + timedelta(days=1)).strftime('%Y%m%d')
+                tail = _fetch_daily(ts_code, tail_start, end_date)
+                if tail is None:
+                    return None
+                if not tail.empty:
+                    cached = pd.concat([cached, tail], ignore_index=True).drop_duplicates('trade_date', keep='last')
+                save_daily_cache(ts_code, cached, covered_from)
+            dates = cached['trade_date']
+            return cached[(dates >= start_date) & (dates <= end_date)].sort_values('trade_date', kind='stable').reset_index(drop=True)
+        
+        df = _fetch_daily(ts_code, start_date, end_date)
+        save_daily_cache(ts_code, df, start_date)
         return df
     except Exception as e:
         return None
 
 
+TUSHARE_DAILY_ROW_LIMIT = 6000  # pro.daily单次返回行数上限
+
+
+@st.cache_data(ttl=1800, max_entries=20)
+def prefetch_daily(ts_codes, start_date, end_date):
+    """
+    多代码批量获取日线（ts_code逗号分隔，一次请求覆盖一批股票）
+    ts_codes: 代码元组（需可哈希以便缓存）
+    返回: {ts_code: DataFrame}，列与get_cached_stock_data一致；失败的批次直接跳过，由调用方逐只补取
+    """
+    # 按区间内交易日数估算每只股票的行数，确保单批不超过接口行数上限
+    span_days = (datetime.strptime(end_date, '%Y%m%d') - datetime.strptime(start_date, '%Y%m%d')).days
+    rows_per_code = span_days * 5 // 7 + 10
+    batch_size = max(1, TUSHARE_DAILY_ROW_LIMIT // rows_per_code)
+    
+    essential_cols = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'vol']
+    frames = {}
+    for i in range(0, len(ts_codes), batch_size):
+        batch = ts_codes[i:i + batch_size]
+        try:
+            with _tushare_slots:
+                time.sleep(0.5)  # 限速
+                df = pro.daily(ts_code=','.join(batch), start_date=start_date, end_date=end_date)
+        except Exception as e:
+            continue
+        if df is None or df.empty:
+            continue
+        df = df[[col for col in essential_cols if col in df.columns]]
+        for code, group in df.groupby('ts_code', sort=False):
+            frames[code] = group.drop(columns='ts_code').reset_index(drop=True)
+            save_daily_cache(code, frames[code], start_date)
+    return frames
+
+
 def get_realtime_price(ts_code):
     """
     获取实时行情价格用于核验
     """
     try:
-        time.sleep(0.3)  # 限速
         # 使用daily_basic获取最新价格
         today = datetime.now().strftime('%Y%m%d')
-        df = pro.daily_basic(ts_code=ts_code, trade_date=today, fields='ts_code,close,open,high,low')
+        with _tushare_slots:
+            time.sleep(0.3)  # 限速
+            df = pro.daily_basic(ts_code=ts_code, trade_date=today, fields='ts_code,close,open,high,low')
         if df is not None and not df.empty:
             return df.iloc[0]['close']
         
         # 备选：使用最新日线数据
-        df_daily = pro.daily(ts_code=ts_code, limit=1)
+        with _tushare_slots:
+            df_daily = pro.daily(ts_code=ts_code, limit=1)
         if df_daily is not None and not df.empty:
             return df_daily.iloc[0]['close']
         
@@ -954,9 +1321,26 @@ def get_all_market_data(trade_date=None, days=90):
         return None
 
 
-def analyze_single_stock(symbol, name, days=90, market_data=None):
+def classify_signal_kind(has_sell, current_price, zs_high, zs_low, stroke_count, bar_count):
+    """
+    按优先级确定信号分支：卖出信号 > 三买 > 二买 > 一买（带背驰）
+    返回: 'sell' / 'buy3' / 'buy2' / 'buy1' / 'none'，各分支互斥
+    """
+    if has_sell:
+        return 'sell'
+    if current_price > zs_high and stroke_count > 0:
+        return 'buy3'
+    if stroke_count >= 3 and bar_count >= 5:
+        return 'buy2'
+    if current_price < zs_low and stroke_count > 0:
+        return 'buy1'
+    return 'none'
+
+
+def analyze_single_stock(symbol, name, days=90, market_data=None, daily_df=None):
     """
     分析单只股票（优化版，支持批量数据传入）
+    daily_df: prefetch_daily预取的该股日线，提供时优先使用
     """
     try:
         # 确定ts_code
@@ -965,11 +1349,14 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
         else:
             ts_code = f"{symbol}.SZ"
         
-        end_date = datetime.now().strftime('%Y%m%d')
-        start_date = (datetime.now() - timedelta(days=days*2)).strftime('%Y%m%d')
+        # 以最近收盘交易日为缓存键，盘中重复运行不会重新请求
+        end_date = get_last_trade_date()
+        start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=days*2)).strftime('%Y%m%d')
         
         # 优先使用批量数据，否则单独获取
-        if market_data is not None and not market_data.empty:
+        if daily_df is not None and len(daily_df) >= 20:
+            df = daily_df
+        elif market_data is not None and not market_data.empty:
             df = market_data[market_data['ts_code'] == ts_code].copy()
             if df.empty or len(df) < 20:
                 df = get_cached_stock_data(ts_code, start_date, end_date)
@@ -979,35 +1366,53 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
         if df is None or len(df) < 20:
             return None
         
-        df = df.sort_values('trade_date').reset_index(drop=True)
+        # 按交易日升序：批量数据本身已升序，单只接口返回为倒序，翻转即可，仅乱序时才排序
+        trade_dates = df['trade_date']
+        if trade_dates.is_monotonic_decreasing:
+            df = df.iloc[::-1]
+        elif not trade_dates.is_monotonic_increasing:
+            df = df.iloc[np.argsort(trade_dates.to_numpy(), kind='stable')]
+        df = df.reset_index(drop=True)
         df = df.rename(columns={
             'trade_date': 'date', 'open': 'open', 'close': 'close',
             'high': 'high', 'low': 'low', 'vol': 'volume', 'pct_chg': 'pct_chg'
         })
         df = df.tail(days)
         
-        # 计算指标
-        current_price = df.iloc[-1]['close']
-        current_chg = df.iloc[-1]['pct_chg']
-        max_price = df['high'].max()
-        min_price = df['low'].min()
+        # 计算指标（各列一次性取出NumPy数组，避免反复iloc构造Series）
+        vals = {c: df[c].to_numpy() for c in ('close', 'pct_chg', 'high', 'low', 'volume') if c in df.columns}
+        close_arr = vals['close']
+        current_price = close_arr[-1]
+        # 精简后的日线数据不含pct_chg时，由最近两日收盘价推算涨跌幅
+        current_chg = vals['pct_chg'][-1] if 'pct_chg' in vals else (close_arr[-1] / close_arr[-2] - 1) * 100
+        max_price = np.nanmax(vals['high'])
+        min_price = np.nanmin(vals['low'])
+        low_arr = vals['low']
+        current_vol_raw = vals['volume'][-1] if 'volume' in vals else None
+        # 20日均量只需最后一个窗口：直接对末尾20个值求均值，不足20根时与rolling一致为NaN
+        if 'volume' in vals:
+            ma20_vol_raw = vals['volume'][-20:].mean() if len(vals['volume']) >= 20 else np.nan
+        else:
+            ma20_vol_raw = None
         
         # 缠论分析
         df_processed = handle_inclusion(df.reset_index(drop=True))
         strokes, ding_count, di_count = find_strokes(df_processed)
         zhongshu = calculate_zhongshu(df)
+        zs_high = zhongshu['high']
+        zs_low = zhongshu['low']
         
         # 计算MACD
         df = calculate_macd(df)
+        macd_hist_arr = df['macd_hist'].to_numpy()
         
-        # 检查背驰信号
-        divergence = check_divergence(df, strokes, zhongshu)
+        # 检查背驰信号与卖出信号（三卖、二卖），单次遍历完成
+        signals = analyze_signals(df, strokes, zhongshu)
+        divergence = signals['divergence']
+        sell_signal = signals['sell_signal']
         
-        # 检查卖出信号（三卖、二卖）
-        sell_signal = check_sell_signals(df, strokes, zhongshu)
-        
-        # ========== 初始化缠论优化器 ==========
-        optimizer = ChanLunOptimizer()
+        # ========== 缠论优化器（进程内共享，波动率按代码缓存） ==========
+        optimizer = get_optimizer()
         
         # 判断信号并生成买卖建议
         signal = "无"
@@ -1023,25 +1428,34 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
         sell_signal_info = ""
         signal_score = None  # 新增：信号评分
         
-        # 优先级：卖出信号 > 三买 > 一买（带背驰）
+        # 优先级：卖出信号 > 三买 > 二买 > 一买（带背驰）
+        # 背驰/卖点结果先取到局部变量，再一次性确定信号分支
+        div_has = divergence['has_divergence']
+        div_type = divergence['divergence_type']
+        div_explanation = divergence['explanation']
+        sell_type = sell_signal['sell_type']
+        sell_explanation = sell_signal['explanation']
+        signal_kind = classify_signal_kind(sell_signal['has_sell_signal'], current_price,
+                                           zs_high, zs_low, len(strokes), len(df))
         
         # 1. 先检查卖出信号（三卖、二卖）- 优化版：评分系统
-        if sell_signal['has_sell_signal']:
-            signal_type = sell_signal['sell_type']  # "三卖" 或 "二卖"
+        if signal_kind == 'sell':
+            signal_type = sell_type  # "三卖" 或 "二卖"
             
             # 卖出信号评分（简化版，主要依据跌破幅度和回抽情况）
-            breakout_pct = abs((current_price - zhongshu['low']) / zhongshu['low'] * 100) if current_price < zhongshu['low'] else 0
-            
-            context = {
-                'breakout_pct': breakout_pct,
-                'current_vol': df.iloc[-1]['volume'] if 'volume' in df.columns else 0,
-                'ma20_vol': df.iloc[-1]['volume'] if 'volume' in df.columns else 1,
-                'rebound_pct': 0,  # 需要计算回抽幅度
-                'market_trend': 'neutral'
-            }
-            
-            if context['ma20_vol'] == 0 or pd.isna(context['ma20_vol']):
-                context['ma20_vol'] = 1
+            breakout_pct = abs((current_price - zs_low) / zs_low * 100) if current_price < zs_low else 0
+            
+            ma20_vol = current_vol_raw if current_vol_raw is not None else 1
+            if not ma20_vol or math.isnan(ma20_vol):
+                ma20_vol = 1
+            
+            context = SignalContext(
+                breakout_pct=breakout_pct,
+                current_vol=current_vol_raw if current_vol_raw is not None else 0,
+                ma20_vol=ma20_vol,
+                rebound_pct=0,  # 需要计算回抽幅度
+                market_trend='neutral'
+            )
             
             signal_score = optimizer.score_sell_signal(context)
             
@@ -1060,15 +1474,15 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                 action = "减仓"
                 risk_level = "中"
             
-            sell_signal_info = sell_signal['explanation']
-            suggestion = f"{signal_score.action} | 预估成功率{signal_score.probability*100:.0f}% | {sell_signal['explanation']}"
+            sell_signal_info = sell_explanation
+            suggestion = f"{signal_score.action} | 预估成功率{signal_score.probability*100:.0f}% | {sell_explanation}"
             
             # 卖出建议
             entry_price = current_price
             # 止损设在近期反弹高点
-            recent_up = [s for s in strokes if s['type'] == 'up']
-            if recent_up:
-                stop_loss = recent_up[-1]['end'] * 1.02  # 反弹高点上方2%
+            last_up = last_stroke_of(strokes, 'up')
+            if last_up:
+                stop_loss = last_up['end'] * 1.02  # 反弹高点上方2%
             else:
                 stop_loss = current_price * 1.05
             stop_loss_pct = (stop_loss - current_price) / current_price * 100
@@ -1078,17 +1492,17 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
             target_pct = (target_price - current_price) / current_price * 100
         
         # 2. 三买信号（向上离开中枢）- 优化版：动态阈值+评分系统
-        elif current_price > zhongshu['high'] and strokes:
-            recent_up = [s for s in strokes if s['type'] == 'up']
-            if recent_up and recent_up[-1]['end'] > zhongshu['high']:
+        elif signal_kind == 'buy3':
+            last_up = last_stroke_of(strokes, 'up')
+            if last_up and last_up['end'] > zs_high:
                 # 计算突破幅度（相对于中枢上沿）
-                breakout_pct = (current_price - zhongshu['high']) / zhongshu['high'] * 100
+                breakout_pct = (current_price - zs_high) / zs_high * 100
                 
                 # 计算距离历史高点的距离
                 distance_to_max = (max_price - current_price) / max_price * 100 if max_price > 0 else 0
                 
                 # 获取动态阈值
-                threshold = optimizer.get_dynamic_threshold(df, symbol)
+                threshold = optimizer.get_dynamic_threshold_arrays(vals['high'], vals['low'], close_arr, symbol)
                 
                 # 检查突破是否有效（基于动态阈值）
                 is_valid, reason = optimizer.is_valid_breakout(breakout_pct, threshold, '三买')
@@ -1110,28 +1524,29 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                     # 判断是否为标准形态：向上离开中枢+回踩确认
                     is_standard = len(strokes) >= 2 and strokes[-1]['type'] == 'up' and strokes[-2]['type'] == 'down'
                     
-                    context = {
-                        'breakout_pct': breakout_pct,
-                        'current_vol': df.iloc[-1]['volume'] if 'volume' in df.columns else 0,
-                        'ma20_vol': df['volume'].rolling(20).mean().iloc[-1] if 'volume' in df.columns else 1,
-                        'is_standard_pattern': is_standard,  # 标准形态判断
-                        'sublevel_confirm': False,  # 暂不支持
-                        'market_trend': 'neutral',
-                        'distance_to_max': distance_to_max
-                    }
-                    
                     # 处理成交量数据可能为0的情况
-                    if context['ma20_vol'] == 0 or pd.isna(context['ma20_vol']):
-                        context['ma20_vol'] = 1
+                    ma20_vol = ma20_vol_raw if ma20_vol_raw is not None else 1
+                    if not ma20_vol or math.isnan(ma20_vol):
+                        ma20_vol = 1
+                    
+                    context = SignalContext(
+                        breakout_pct=breakout_pct,
+                        current_vol=current_vol_raw if current_vol_raw is not None else 0,
+                        ma20_vol=ma20_vol,
+                        is_standard_pattern=is_standard,  # 标准形态判断
+                        sublevel_confirm=False,  # 暂不支持
+                        market_trend='neutral',
+                        distance_to_max=distance_to_max
+                    )
                     
                     # 使用重构后的评分函数，明确指定为三买
-                    signal_score = optimizer.score_buy_signal(context, signal_type='三买')
+                    signal_score = optimizer.score_buy_signal(context, signal_type='三买', build_details=True)
                     
                     # 检查是否背驰
-                    if divergence['has_divergence'] and divergence['divergence_type'] == '顶背驰':
+                    if div_has and div_type == '顶背驰':
                         signal = f"三买+背驰(评分:{signal_score.grade})"
                         action = "减仓"
-                        divergence_info = divergence['explanation']
+                        divergence_info = div_explanation
                         suggestion = f"三买但出现顶背驰，建议减仓而非加仓 | {signal_score.action}"
                         risk_level = "高"
                     else:
@@ -1150,7 +1565,7 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                     # 买入建议
                     entry_price = current_price
                     # 止损：中枢上沿下方2%或-5%取较大值
-                    stop_loss = max(zhongshu['high'] * 0.98, current_price * 0.95)
+                    stop_loss = max(zs_high * 0.98, current_price * 0.95)
                     stop_loss_pct = (stop_loss - current_price) / current_price * 100
                     
                     # 目标：前期高点
@@ -1164,7 +1579,7 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
         
         # 3. 二买信号（核心信号）- 架构师优化版
         # 基于动态分型 + 力度衰竭的精确判断
-        elif strokes and len(strokes) >= 3 and len(df) >= 5:
+        elif signal_kind == 'buy2':
             # 获取最近三笔：down(一买) -> up(反弹) -> down(回抽)
             recent_strokes = strokes[-3:]
             
@@ -1172,59 +1587,56 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                 recent_strokes[1]['type'] == 'up' and 
                 recent_strokes[2]['type'] == 'down'):
                 
-                # 一买位置索引和低点
+                # 一买位置索引（原始K线位置，与low_arr/macd_hist_arr对齐）和低点
                 first_buy_idx = recent_strokes[0]['end_idx']
                 first_buy_low = recent_strokes[0]['end']
                 # 当前检查位置（最新数据）
                 i = len(df) - 1
-                current_low = df['low'].iloc[i]
+                current_low = low_arr[i]
                 
                 # 修正后的二买逻辑：动态分型 + 力度衰竭
                 # 1. 核心条件：不破一买最低点
                 if current_low > first_buy_low and i >= 2 and first_buy_idx >= 2:
                     # 2. 确认底分型 (K线三笔重叠判断)
-                    is_bottom_fractal = (df['low'].iloc[i-1] < df['low'].iloc[i-2] and 
-                                         df['low'].iloc[i-1] < df['low'].iloc[i])
+                    has_bottom_fractal = (low_arr[i-1] < low_arr[i-2] and 
+                                         low_arr[i-1] < low_arr[i])
                     
                     # 3. 力度衰竭：当前回踩的MACD绿柱面积明显小于一买时期
-                    is_fading = False
-                    if 'macd_hist' in df.columns:
-                        curr_macd_hist = abs(df['macd_hist'].iloc[i-2:i+1].sum())
-                        prev_macd_hist = abs(df['macd_hist'].iloc[first_buy_idx-2:first_buy_idx+1].sum())
-                        is_fading = curr_macd_hist < prev_macd_hist
+                    is_fading = macd_hist_fading(macd_hist_arr, i, first_buy_idx)
                     
-                    if is_bottom_fractal and is_fading:
+                    if has_bottom_fractal and is_fading:
                         # 4. 强弱分类
-                        center_high = zhongshu['high']
+                        center_high = zs_high
                         
                         # 计算回踩深度（相对于反弹高点的回撤百分比）
                         rebound_high = recent_strokes[1]['end']
                         pullback_depth = (rebound_high - current_low) / (rebound_high - first_buy_low) * 100 if (rebound_high - first_buy_low) > 0 else 50
                         
                         # 获取成交量数据
-                        current_vol = df.iloc[-1]['volume'] if 'volume' in df.columns else 0
-                        ma20_vol = df['volume'].rolling(20).mean().iloc[-1] if 'volume' in df.columns else 1
-                        if ma20_vol == 0 or pd.isna(ma20_vol):
+                        current_vol = current_vol_raw if current_vol_raw is not None else 0
+                        ma20_vol = ma20_vol_raw if ma20_vol_raw is not None else 1
+                        if not ma20_vol or math.isnan(ma20_vol):
                             ma20_vol = 1
                         
                         # 止损价格
                         stop_loss_price = first_buy_low * 0.98
                         
                         # 二买评分（重构版）
-                        context_2nd = {
-                            'pullback_depth': pullback_depth,
-                            'current_vol': current_vol,
-                            'ma20_vol': ma20_vol,
-                            'current_price': current_price,
-                            'stop_loss_price': stop_loss_price,
-                            'is_standard_pattern': True,  # 已确认满足底分型+力度衰竭
-                            'has_bottom_fractal': is_bottom_fractal,
-                            'market_trend': 'neutral',
-                            'sublevel_confirm': False
-                        }
+                        context_2nd = SignalContext(
+                            pullback_depth=pullback_depth,
+                            current_vol=current_vol,
+                            ma20_vol=ma20_vol,
+                            current_price=current_price,
+                            first_buy_low=first_buy_low,
+                            stop_loss_price=stop_loss_price,
+                            is_standard_pattern=True,  # 已确认满足底分型+力度衰竭
+                            has_bottom_fractal=has_bottom_fractal,
+                            market_trend='neutral',
+                            sublevel_confirm=False
+                        )
                         
                         # 使用重构后的评分函数，明确指定为二买
-                        signal_score = optimizer.score_buy_signal(context_2nd, signal_type='二买')
+                        signal_score = optimizer.score_buy_signal(context_2nd, signal_type='二买', build_details=True)
                         
                         # 根据评分确定信号显示
                         grade_str = f"(评分:{signal_score.grade})" if signal_score else ""
@@ -1240,7 +1652,7 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                             signal = f"标准二买{grade_str}"
                             action = "买入"
                             risk_level = "低" if signal_score and signal_score.grade in ['A', 'B'] else "中"
-                            distance_to_zhongshu = (center_high - current_low) / (center_high - zhongshu['low']) * 100 if center_high > zhongshu['low'] else 0
+                            distance_to_zhongshu = (center_high - current_low) / (center_high - zs_low) * 100 if center_high > zs_low else 0
                             suggestion = f"标准二买确认！回抽进入中枢({distance_to_zhongshu:.1f}%)，评分{signal_score.total_score}分，{signal_score.action}"
                         
                         # 买入建议
@@ -1260,20 +1672,20 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                             suggestion += f"\n💡 " + " | ".join(signal_score.details[:2])
         
         # 4. 一买信号（向下离开中枢，带背驰更好）
-        elif current_price < zhongshu['low'] and strokes:
-            recent_down = [s for s in strokes if s['type'] == 'down']
-            if recent_down:
-                recent_low = recent_down[-1]['end']
+        elif signal_kind == 'buy1':
+            last_down = last_stroke_of(strokes, 'down')
+            if last_down:
+                recent_low = last_down['end']
                 rebound_pct = (current_price - recent_low) / recent_low * 100
                 
                 # 检查是否背驰（底背驰）
-                has_divergence = divergence['has_divergence'] and divergence['divergence_type'] == '底背驰'
+                has_divergence = div_has and div_type == '底背驰'
                 
                 if rebound_pct > 1 or has_divergence:
                     if has_divergence:
                         signal = "一买+背驰"
                         action = "买入"  # 背驰加强信号
-                        divergence_info = divergence['explanation']
+                        divergence_info = div_explanation
                         risk_level = "中"
                         suggestion = "底背驰确认，反弹概率高"
                     else:
@@ -1289,14 +1701,18 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
                     stop_loss_pct = (stop_loss - current_price) / current_price * 100
                     
                     # 目标：中枢下沿
-                    target_price = zhongshu['low']
+                    target_price = zs_low
                     target_pct = (target_price - current_price) / current_price * 100
                     
                     if target_pct < 3 and not has_divergence:
                         suggestion = "反弹空间有限，建议观望"
         
-        # 获取股票板块信息（用于后续筛选）
-        sector_info = get_stock_sector_info(symbol)
+        # 获取股票板块信息（用于后续筛选）；接口暂不可用时本次不带板块信息
+        try:
+            sector_info = get_stock_sector_info(symbol)
+        except _TushareUnavailable as e:
+            print(f"获取{symbol}板块信息失败: {e}")
+            sector_info = None
         
         # ========== 价格核验与修正 ==========
         # 核验当前价格是否与实时行情一致
@@ -1309,8 +1725,8 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
             # 按比例修正其他价格相关字段
             max_price = max_price * price_ratio
             min_price = min_price * price_ratio
-            zhongshu_low = zhongshu['low'] * price_ratio
-            zhongshu_high = zhongshu['high'] * price_ratio
+            zs_low = zs_low * price_ratio
+            zs_high = zs_high * price_ratio
             if entry_price:
                 entry_price = entry_price * price_ratio
             if stop_loss:
@@ -1322,7 +1738,7 @@ def analyze_single_stock(symbol, name, days=90, market_data=None):
             'code': symbol, 'name': name, 'price': current_price, 'change': current_chg,
             'max_price': max_price, 'min_price': min_price,
             'ding_count': ding_count, 'di_count': di_count, 'stroke_count': len(strokes),
-            'zhongshu_low': zhongshu['low'], 'zhongshu_high': zhongshu['high'],
+            'zhongshu_low': zs_low, 'zhongshu_high': zs_high,
             'signal': signal, 'action': action,
             'entry_price': entry_price, 'stop_loss': stop_loss, 'target_price': target_price,
             'stop_loss_pct': stop_loss_pct, 'target_pct': target_pct,
@@ -1344,31 +1760,94 @@ def analyze_stock(symbol, name, days=90):
     return analyze_single_stock(symbol, name, days)
 
 
-def analyze_stocks_parallel(stock_list, days=90, max_workers=2, progress_callback=None):
+class _NoAnalysisResult(Exception):
+    """分析无结果（数据不足或接口失败），用异常跳出缓存，避免把失败结果缓存1小时"""
+
+
+class _TransientAnalysisResult(Exception):
+    """分析结果含临时数据（板块信息获取失败或资金流向为模拟数据），携带结果跳出缓存：本次照常使用，下次重新分析"""
+    
+    def __init__(self, result):
+        super().__init__(result['code'])
+        self.result = result
+
+
+@st.cache_data(ttl=3600, max_entries=2048, show_spinner=False)
+def _analyze_single_stock_cached(symbol, name, days, trade_date, _market_data=None, _daily_df=None):
+    """analyze_single_stock_cached的缓存层，结果不可缓存时抛_NoAnalysisResult/_TransientAnalysisResult"""
+    result = analyze_single_stock(symbol, name, days, _market_data, _daily_df)
+    if result is None:
+        raise _NoAnalysisResult(symbol)
+    sector_info = result['sector_info']
+    if sector_info is None or sector_info['flow_is_mock']:
+        raise _TransientAnalysisResult(result)
+    return result
+
+
+def analyze_single_stock_cached(symbol, name, days, trade_date, market_data=None, daily_df=None):
+    """
+    缓存版单只股票分析，按(代码, 名称, 天数, 最近收盘交易日)缓存1小时
+    行情数据参数不参与缓存键（避免每次调用都对整张表求哈希）
+    板块信息暂时获取失败或基于模拟资金流向的结果只用于本次，不进缓存
     """
-    多线程并行分析股票列表（限速版：2线程+延迟）
+    try:
+        return _analyze_single_stock_cached(symbol, name, days, trade_date, market_data, daily_df)
+    except _TransientAnalysisResult as e:
+        return e.result
+
+
+@st.cache_resource
+def get_optimizer():
+    """进程级共享的缠论优化器，各分析线程共用其波动率缓存"""
+    return ChanLunOptimizer()
+
+def analyze_stocks_parallel(stock_list, days=90, max_workers=8, progress_callback=None):
+    """
+    多线程并行分析股票列表（接口请求经信号量限速+延迟），按完成顺序回调进度
     
     Args:
         stock_list: [(code, name), ...]
         days: 分析天数
-        max_workers: 线程数（默认2，避免触发频率限制）
+        max_workers: 线程数（默认8；接口并发由TUSHARE_MAX_CONCURRENCY单独限制）
         progress_callback: 进度回调函数(current, total)
     
     Returns:
         List[Dict]: 分析结果列表
     """
-    results = []
+    # 按代码去重，避免同一只股票重复请求接口
+    unique_stocks = list(dict((code, name) for code, name in stock_list).items())
+    
+    results = {}
     completed = 0
-    total = len(stock_list)
+    total = len(unique_stocks)
+    
+    # 新一轮扫描开始，清空上一轮的波动率缓存
+    get_optimizer().clear_cache()
     
     # 先尝试获取批量市场数据（减少API调用）
     market_data = get_all_market_data(days=days)
     
+    # 批量数据未覆盖的股票，按批多代码请求预取日线，代替逐只请求
+    ts_codes = {code: f"{code}.SH" if code.startswith('6') else f"{code}.SZ" for code, _ in unique_stocks}
+    if market_data is not None and not market_data.empty:
+        covered = set(market_data['ts_code'].unique())
+    else:
+        covered = set()
+    end_date = get_last_trade_date()
+    start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=days*2)).strftime('%Y%m%d')
+    # 本地日线缓存已覆盖的股票无需预取，由get_cached_stock_data直接读盘
+    missing = tuple(ts for ts in ts_codes.values()
+                    if ts not in covered and not daily_cache_covers(ts, start_date, end_date))
+    prefetched = {}
+    if missing:
+        prefetched = prefetch_daily(missing, start_date, end_date)
+    
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
         # 提交所有任务
         future_to_stock = {
-            executor.submit(analyze_single_stock, code, name, days, market_data): (code, name)
-            for code, name in stock_list
+            executor.submit(analyze_single_stock_cached, code, name, days, end_date, market_data,
+                            prefetched.get(ts_codes[code])): (code, name)
+            for code, name in unique_stocks
         }
         
         # 收集结果
@@ -1377,7 +1856,7 @@ def analyze_stocks_parallel(stock_list, days=90, max_workers=2, progress_callbac
             try:
                 result = future.result()
                 if result:
-                    results.append(result)
+                    results[code] = result
             except Exception as e:
                 pass
             
@@ -1385,136 +1864,158 @@ def analyze_stocks_parallel(stock_list, days=90, max_workers=2, progress_callbac
             if progress_callback:
                 progress_callback(completed, total)
     
-    return results
+    # 按输入顺序返回，结果与线程完成先后无关
+    return [results[code] for code, _ in unique_stocks if code in results]
+
+
+class _TushareUnavailable(Exception):
+    """接口异常或返回空数据，用异常跳出缓存，避免把失败结果缓存到TTL结束（由调用方处理）"""
+
+
+@st.cache_data(ttl=86400)  # 缓存1天
+def get_concept_list():
+    """获取概念板块列表（元数据变化很慢，全会话共用一份；返回空时抛_TushareUnavailable）"""
+    concepts = pro.concept()
+    if concepts is None or concepts.empty:
+        raise _TushareUnavailable("概念板块列表为空")
+    return concepts
+
+
+@st.cache_data(ttl=86400)  # 缓存1天
+def get_sw_industry_index(level='L1'):
+    """获取申万行业分类列表（SW2021，按级别缓存；返回空时抛_TushareUnavailable）"""
+    sw_index = pro.index_classify(level=level, src='SW2021')
+    if sw_index is None or sw_index.empty:
+        raise _TushareUnavailable(f"申万{level}行业列表为空")
+    return sw_index
+
+
+def _concept_members(concept_name):
+    """在概念板块（同花顺/东方财富概念）中匹配板块名，返回成分股；未匹配返回None"""
+    concepts = get_concept_list()
+    matched = concepts[concepts['name'].str.contains(concept_name, na=False, case=False, regex=False)]
+    if matched.empty:
+        return None
+    detail = pro.concept_detail(id=matched.iloc[0]['code'], fields='ts_code,name')
+    if detail is None or detail.empty:
+        return None
+    return [(code.split('.')[0], name) for code, name in
+            zip(detail['ts_code'].to_numpy(), detail['name'].to_numpy())]
+
+
+def _sw_industry_members(level, concept_name):
+    """在申万行业分类（L1/L2）中匹配行业名，返回成分股；未匹配返回None"""
+    sw_index = get_sw_industry_index(level)
+    # 按子串匹配（含完全相同的行业名）
+    matched = sw_index[sw_index['industry_name'].str.contains(concept_name, na=False, case=False, regex=False)]
+    if matched.empty:
+        return None
+    members = pro.index_member(index_code=matched.iloc[0]['index_code'], fields='con_code,con_name')
+    if members is None or members.empty:
+        return None
+    return [(code.split('.')[0], name) for code, name in
+            zip(members['con_code'].to_numpy(), members['con_name'].to_numpy())]
 
 
+@st.cache_data(ttl=3600, max_entries=512)
 def get_concept_stocks(concept_name):
-    """获取板块成分股 - 支持申万行业和概念板块"""
-    try:
-        # 跳过分隔符选项
-        if concept_name.startswith("==="):
-            return None
-            
-        # 1. 先尝试概念板块（同花顺/东方财富概念）
-        try:
-            concepts = pro.concept()
-            matched = concepts[concepts['name'].str.contains(concept_name, na=False, case=False)]
-            
-            if not matched.empty:
-                concept_code = matched.iloc[0]['code']
-                detail = pro.concept_detail(id=concept_code, fields='ts_code,name')
-                
-                if detail is not None and not detail.empty:
-                    stock_list = []
-                    for _, row in detail.iterrows():
-                        symbol = row['ts_code'].split('.')[0]
-                        stock_list.append((symbol, row['name']))
-                    return stock_list
-        except:
-            pass
-        
-        # 2. 尝试申万行业分类
-        try:
-            # 获取申万一级行业列表
-            sw_index = pro.index_classify(level='L1', src='SW2021')
-            if sw_index is not None and not sw_index.empty:
-                # 模糊匹配行业名称
-                matched = sw_index[sw_index['industry_name'].str.contains(concept_name, na=False, case=False)]
-                if matched.empty:
-                    # 尝试精确匹配
-                    matched = sw_index[sw_index['industry_name'] == concept_name]
-                
-                if not matched.empty:
-                    industry_code = matched.iloc[0]['index_code']
-                    # 获取行业成分股
-                    members = pro.index_member(index_code=industry_code, fields='con_code,con_name')
-                    if members is not None and not members.empty:
-                        stock_list = []
-                        for _, row in members.iterrows():
-                            symbol = row['con_code'].split('.')[0]
-                            stock_list.append((symbol, row['con_name']))
-                        return stock_list
-        except:
-            pass
-        
-        # 3. 尝试申万二级行业（如果一级没找到）
-        try:
-            sw_index2 = pro.index_classify(level='L2', src='SW2021')
-            if sw_index2 is not None and not sw_index2.empty:
-                matched = sw_index2[sw_index2['industry_name'].str.contains(concept_name, na=False, case=False)]
-                if not matched.empty:
-                    industry_code = matched.iloc[0]['index_code']
-                    members = pro.index_member(index_code=industry_code, fields='con_code,con_name')
-                    if members is not None and not members.empty:
-                        stock_list = []
-                        for _, row in members.iterrows():
-                            symbol = row['con_code'].split('.')[0]
-                            stock_list.append((symbol, row['con_name']))
-                        return stock_list
-        except:
-            pass
-            
-        # 4. 尝试标准行业分类（证监会行业）
-        try:
-            stock_list_data = pro.stock_company(fields='ts_code,chairman,manager,secretary,reg_capital,setup_date,province,city,website,email,office,employees,main_business,business_scope')
-            if stock_list_data is not None and not stock_list_data.empty:
-                # 这里可以根据业务范围筛选，但比较复杂，暂时跳过
-                pass
-        except:
-            pass
-        
+    """
+    获取板块成分股 - 支持申万行业和概念板块（按板块名缓存1小时）
+    各数据源均未匹配时返回None；未匹配且有数据源接口异常时抛_TushareUnavailable，
+    失败结果不进缓存，接口恢复后下次调用重新请求
+    """
+    # 跳过分隔符选项
+    if concept_name.startswith("==="):
         return None
-    except:
+    
+    # 依次尝试：概念板块 -> 申万一级行业 -> 申万二级行业
+    # 未匹配由返回值判断；仅接口异常（无权限、限频等）才走except，并跳到下一个数据源
+    failed_sources = []
+    sources = (
+        ('概念板块', lambda: _concept_members(concept_name)),
+        ('申万一级行业', lambda: _sw_industry_members('L1', concept_name)),
+        ('申万二级行业', lambda: _sw_industry_members('L2', concept_name)),
+    )
+    for source_name, fetch in sources:
+        try:
+            stocks = fetch()
+        except Exception as e:
+            print(f"获取{concept_name}{source_name}成分股失败: {e}")
+            failed_sources.append(source_name)
+            continue
+        if stocks:
+            return stocks
+    
+    if failed_sources:
+        raise _TushareUnavailable(f"{concept_name}: {'、'.join(failed_sources)}接口异常")
+    return None
+
+
+# 无法获取真实行业走势时的模拟数据（2026年热点板块资金流向，用于演示）
+MOCK_SECTOR_FLOWS = {
+    "半导体": 12.5, "计算机": 15.2, "通信": 8.7, "电子": 10.3,
+    "电力设备": 9.8, "机械设备": 6.5, "汽车": 7.2, "国防军工": 11.1,
+    "有色金属": 5.3, "基础化工": 4.2, "石油石化": 3.1,
+    "食品饮料": 2.8, "医药生物": 4.5, "家用电器": 3.9,
+    "商业航天": 18.5, "人工智能": 22.3, "固态电池": 16.8,
+    "银行": -1.2, "房地产": -2.5, "非银金融": 1.8
+}
+
+
+@st.cache_data(ttl=1800)
+def _fetch_sector_money_flow(days=5):
+    """
+    按申万一级行业指数近N日累计涨跌幅近似板块资金流向（按days缓存30分钟）
+    所有行业指数合并为一次index_daily请求；接口异常或无有效数据时抛出异常（不进本缓存）
+    """
+    end_date = datetime.now().strftime('%Y%m%d')
+    start_date = (datetime.now() - timedelta(days=days+5)).strftime('%Y%m%d')
+    
+    sw_index = get_sw_industry_index('L1')
+    code_to_name = dict(zip(sw_index['index_code'], sw_index['industry_name']))
+    
+    # 一次请求取回所有行业指数近期走势（ts_code支持逗号分隔多个代码）
+    with _tushare_slots:
+        df_index = pro.index_daily(ts_code=','.join(code_to_name), start_date=start_date, end_date=end_date)
+    if df_index is None or df_index.empty:
+        raise _TushareUnavailable("行业指数日线为空")
+    
+    # 每个指数按日期倒序取最近days天，计算累计涨跌幅作为资金流向近似
+    df_index = df_index.sort_values('trade_date', ascending=False)
+    counts = df_index['ts_code'].value_counts()
+    totals = df_index.groupby('ts_code', sort=False).head(days).groupby('ts_code')['pct_chg'].sum()
+    sector_flows = {}
+    for index_code, total_change in totals.items():
+        if index_code in code_to_name and counts[index_code] >= days:
+            sector_flows[code_to_name[index_code]] = total_change
+    if not sector_flows:
+        raise _TushareUnavailable(f"不足{days}个交易日的行业指数数据")
+    return sector_flows
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _sector_money_flow_or_none(days=5):
+    """
+    _fetch_sector_money_flow的失败结果短缓存5分钟（负缓存）：返回None表示暂不可用
+    无pro权限时接口会持续失败，避免逐只股票分析时每只都重新请求一次index_daily
+    """
+    try:
+        return _fetch_sector_money_flow(days)
+    except Exception as e:
+        print(f"获取行业资金流向失败: {e}")
         return None
 
 
 def get_sector_money_flow(days=5):
     """
     获取板块资金净流入数据（过去N个交易日）
-    返回：板块名称 -> 净流入金额的字典
+    返回：(板块名称 -> 净流入金额的字典, 是否为模拟数据)
+    真实数据缓存30分钟；获取失败后5分钟内直接返回模拟数据（需要Tushare的pro版权限）
     """
-    try:
-        # 使用Tushare获取行业资金流向
-        # 注意：这需要Tushare的pro版权限，如果不可用则返回模拟数据
-        end_date = datetime.now().strftime('%Y%m%d')
-        start_date = (datetime.now() - timedelta(days=days+5)).strftime('%Y%m%d')
-        
-        sector_flows = {}
-        
-        # 尝试获取申万行业资金流向
-        try:
-            # 获取每日行业涨跌幅作为资金流向的近似
-            sw_index = pro.index_classify(level='L1', src='SW2021')
-            if sw_index is not None and not sw_index.empty:
-                for _, row in sw_index.iterrows():
-                    industry_name = row['industry_name']
-                    index_code = row['index_code']
-                    
-                    # 获取行业指数近期走势
-                    df_index = pro.index_daily(ts_code=index_code, start_date=start_date, end_date=end_date)
-                    if df_index is not None and len(df_index) >= days:
-                        # 计算累计涨跌幅作为资金流向近似
-                        total_change = df_index['pct_chg'].head(days).sum()
-                        sector_flows[industry_name] = total_change
-        except:
-            pass
-        
-        # 如果无法获取，使用模拟数据（基于当前热点）
-        if not sector_flows:
-            # 模拟2026年热点板块资金流向（用于演示）
-            mock_flows = {
-                "半导体": 12.5, "计算机": 15.2, "通信": 8.7, "电子": 10.3,
-                "电力设备": 9.8, "机械设备": 6.5, "汽车": 7.2, "国防军工": 11.1,
-                "有色金属": 5.3, "基础化工": 4.2, "石油石化": 3.1,
-                "食品饮料": 2.8, "医药生物": 4.5, "家用电器": 3.9,
-                "商业航天": 18.5, "人工智能": 22.3, "固态电池": 16.8,
-                "银行": -1.2, "房地产": -2.5, "非银金融": 1.8
-            }
-            sector_flows = mock_flows
-        
-        return sector_flows
-    except Exception as e:
-        return {}
+    sector_flows = _sector_money_flow_or_none(days)
+    if sector_flows is None:
+        return dict(MOCK_SECTOR_FLOWS), True
+    return sector_flows, False
 
 
 def get_stocks_by_sector_group(group_name):
@@ -1525,22 +2026,19 @@ def get_stocks_by_sector_group(group_name):
         return []
     
     sectors = SECTOR_GROUPS[group_name]["sectors"]
-    all_stocks = []
     
-    for sector in sectors:
-        stocks = get_concept_stocks(sector)
+    # 代码 -> 名称，边取边去重（保留首次出现的顺序），重复板块名只请求一次
+    unique_stocks = {}
+    for sector in dict.fromkeys(sectors):
+        try:
+            stocks = get_concept_stocks(sector)
+        except _TushareUnavailable:
+            continue  # 接口暂不可用，本次跳过该板块（失败未缓存，下次获取会重新请求）
         if stocks:
-            all_stocks.extend(stocks)
-    
-    # 去重
-    seen = set()
-    unique_stocks = []
-    for symbol, name in all_stocks:
-        if symbol not in seen:
-            seen.add(symbol)
-            unique_stocks.append((symbol, name))
+            for symbol, name in stocks:
+                unique_stocks.setdefault(symbol, name)
     
-    return unique_stocks
+    return list(unique_stocks.items())
 
 
 def filter_stocks_by_money_flow(stock_list, sector_flows, top_n=10):
@@ -1551,18 +2049,20 @@ def filter_stocks_by_money_flow(stock_list, sector_flows, top_n=10):
         return stock_list
     
     # 获取资金净流入前N的板块
-    top_sectors = sorted(sector_flows.items(), key=lambda x: x[1], reverse=True)[:top_n]
-    top_sector_names = [s[0] for s in top_sectors]
+    top_sectors = heapq.nlargest(top_n, sector_flows.items(), key=lambda x: x[1])
+    top_sector_names = dict.fromkeys(s[0] for s in top_sectors)
     
-    # 获取这些板块的所有股票
-    hot_stocks = []
+    # 获取这些板块的所有股票代码（直接收集到集合中）
+    hot_symbols = set()
     for sector_name in top_sector_names:
-        sector_stocks = get_concept_stocks(sector_name)
+        try:
+            sector_stocks = get_concept_stocks(sector_name)
+        except _TushareUnavailable:
+            continue
         if sector_stocks:
-            hot_stocks.extend(sector_stocks)
+            hot_symbols.update(s[0] for s in sector_stocks)
     
     # 取交集：用户选择的股票池 ∩ 热门板块股票
-    hot_symbols = set([s[0] for s in hot_stocks])
     filtered = [(s[0], s[1]) for s in stock_list if s[0] in hot_symbols]
     
     return filtered if filtered else stock_list  # 如果交集为空，返回原列表
@@ -1581,12 +2081,7 @@ def get_top_volume_stocks(n=100):
                 # 按成交额排序
                 df['成交额'] = pd.to_numeric(df['成交额'], errors='coerce')
                 df = df.sort_values('成交额', ascending=False).head(n)
-                stocks = []
-                for _, row in df.iterrows():
-                    code = row['股票代码']
-                    name = row['股票名称']
-                    stocks.append((code, name))
-                return stocks
+                return list(df[['股票代码', '股票名称']].itertuples(index=False, name=None))
                 
         elif REALTIME_DATA_SOURCE == "akshare":
             # 使用akshare获取当日行情
@@ -1600,12 +2095,7 @@ def get_top_volume_stocks(n=100):
                 else:
                     return []
                 
-                stocks = []
-                for _, row in df.iterrows():
-                    code = row['代码']
-                    name = row['名称']
-                    stocks.append((code, name))
-                return stocks
+                return list(zip(df['代码'].to_numpy(), df['名称'].to_numpy()))
         
         # 备选：使用Tushare获取昨日数据（可能非实时）
         # 获取当日所有股票行情
@@ -1613,12 +2103,8 @@ def get_top_volume_stocks(n=100):
                              fields='ts_code,name,amount')
         if df is not None and not df.empty:
             df = df.sort_values('amount', ascending=False).head(n)
-            stocks = []
-            for _, row in df.iterrows():
-                code = row['ts_code'].split('.')[0]
-                name = row['name']
-                stocks.append((code, name))
-            return stocks
+            return [(code.split('.')[0], name) for code, name in
+                    zip(df['ts_code'].to_numpy(), df['name'].to_numpy())]
             
     except Exception as e:
         print(f"获取成交额前{n}失败: {e}")
@@ -1626,48 +2112,69 @@ def get_top_volume_stocks(n=100):
     return []
 
 
+@st.cache_data(ttl=3600)
+def get_industry_map():
+    """股票代码 -> 所属行业，复用全市场列表一次取回，避免逐只请求公司信息"""
+    stock_df = get_all_stocks()
+    if stock_df is None or stock_df.empty:
+        return {}
+    return dict(zip(stock_df['symbol'].to_numpy(), stock_df['industry'].astype(object).fillna('').to_numpy()))
+
+
+@st.cache_data(ttl=3600, max_entries=4096)
+def get_stock_industry(symbol):
+    """
+    获取股票所属行业（按代码缓存1小时）
+    接口异常或查不到公司信息时抛_TushareUnavailable，失败结果不进缓存，由调用方处理
+    """
+    # 优先从全市场列表的行业映射中查找，查不到时再单独请求该股票的公司信息
+    industry_map = get_industry_map()
+    if symbol in industry_map:
+        return industry_map[symbol]
+    try:
+        with _tushare_slots:
+            info = pro.stock_company(ts_code=f"{symbol}.SH" if symbol.startswith('6') else f"{symbol}.SZ")
+    except Exception as e:
+        raise _TushareUnavailable(f"{symbol}公司信息: {e}") from e
+    if info is None or info.empty:
+        raise _TushareUnavailable(f"{symbol}公司信息为空")
+    return info.iloc[0].get('industry', '')
+
+
 def get_stock_sector_info(symbol):
     """
-    获取股票所属板块及资金流向信息
+    获取股票所属板块及资金流向信息（行业与资金流向各自缓存，这里只做组合，不再按代码缓存）
     返回: {
         'sectors': ['板块1', '板块2'],
         'sector_flow': {'板块1': 5.2, '板块2': -1.3},  # 5日资金净流入百分比
-        'main_sector': '主要板块'
+        'main_sector': '主要板块',
+        'flow_is_mock': 资金流向是否为模拟数据
     }
+    行业获取失败时抛_TushareUnavailable（见get_stock_industry）
     """
-    try:
-        # 使用Tushare获取股票所属行业
-        info = pro.stock_company(ts_code=f"{symbol}.SH" if symbol.startswith('6') else f"{symbol}.SZ")
-        if info is None or info.empty:
-            return None
-        
-        # 获取行业分类
-        industry = info.iloc[0].get('industry', '')
-        
-        # 获取该行业近5日资金流向（使用模拟数据或真实数据）
-        sector_flows = get_sector_money_flow(days=5)
-        
-        sectors = [industry] if industry else []
-        
-        # 计算主要板块的资金流向
-        sector_flow = {}
-        for sector in sectors:
-            if sector in sector_flows:
-                sector_flow[sector] = sector_flows[sector]
-        
-        # 找出主要板块（资金流入最多的）
-        main_sector = max(sector_flow.items(), key=lambda x: x[1])[0] if sector_flow else sectors[0] if sectors else ''
-        
-        return {
-            'sectors': sectors,
-            'sector_flow': sector_flow,
-            'main_sector': main_sector,
-            'main_sector_flow': sector_flow.get(main_sector, 0)
-        }
-        
-    except Exception as e:
-        print(f"获取{symbol}板块信息失败: {e}")
-        return None
+    industry = get_stock_industry(symbol)
+    
+    # 获取该行业近5日资金流向（使用模拟数据或真实数据）
+    sector_flows, flow_is_mock = get_sector_money_flow(days=5)
+    
+    sectors = [industry] if industry else []
+    
+    # 计算主要板块的资金流向
+    sector_flow = {}
+    for sector in sectors:
+        if sector in sector_flows:
+            sector_flow[sector] = sector_flows[sector]
+    
+    # 找出主要板块（资金流入最多的）
+    main_sector = max(sector_flow.items(), key=lambda x: x[1])[0] if sector_flow else sectors[0] if sectors else ''
+    
+    return {
+        'sectors': sectors,
+        'sector_flow': sector_flow,
+        'main_sector': main_sector,
+        'main_sector_flow': sector_flow.get(main_sector, 0),
+        'flow_is_mock': flow_is_mock
+    }
 
 
 def merge_with_top_volume(selected_stocks, top_n=100):
@@ -1678,7 +2185,7 @@ def merge_with_top_volume(selected_stocks, top_n=100):
     top_stocks = get_top_volume_stocks(top_n)
     
     # 合并并去重（精选股票优先）
-    seen = set([s[0] for s in selected_stocks])
+    seen = {s[0] for s in selected_stocks}
     merged = list(selected_stocks)  # 先放精选股票
     
     for code, name in top_stocks:
@@ -1717,6 +2224,219 @@ def get_all_selected_stocks():
     return all_stocks
 
 
+# ========== 结果卡片渲染 ==========
+
+def _buy2_badge(r):
+    """二买卡片右侧标签：区分强力/标准二买"""
+    if signal_base(r['signal']) == '强力二买':
+        return 'success', "强力二买", "💪"
+    return 'info', "标准二买", "📐"
+
+def build_card_texts(results):
+    """
+    预先格式化信号卡片中的价格文本，返回 {代码: {文本名: 字符串}}
+    只依赖分析结果本身，每次结果变化算一次，页面重跑时直接复用
+    """
+    texts = {}
+    for r in results:
+        price_color = "🔴" if r['change'] > 0 else "🟢"
+        t = {
+            'header': f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)",
+            'current': f"💰 当前: ¥{r['price']:.2f}",
+        }
+        if r.get('entry_price'):
+            t['entry'] = f"💰 买入: ¥{r['entry_price']:.2f}"
+        if r.get('stop_loss'):
+            t['stop_plain'] = f"🛑 止损: ¥{r['stop_loss']:.1f}"
+            if r.get('stop_loss_pct') is not None:
+                t['stop'] = f"🛑 止损: ¥{r['stop_loss']:.1f} ({r['stop_loss_pct']:+.0f}%)"
+        if r.get('target_price') and r.get('target_pct') is not None:
+            t['target'] = f"🎯 目标: ¥{r['target_price']:.1f} (+{r['target_pct']:.0f}%)"
+            t['target_signed'] = f"🎯 目标: ¥{r['target_price']:.1f} ({r['target_pct']:+.0f}%)"
+        texts[r['code']] = t
+    return texts
+
+def get_card_texts(results):
+    """会话内缓存的卡片文本，results对象变化（新分析或载入历史）时才重新格式化"""
+    cached = st.session_state.get('_card_texts')
+    if cached is None or cached[0] is not results:
+        cached = (results, build_card_texts(results))
+        st.session_state['_card_texts'] = cached
+    return cached[1]
+
+def get_result_image(results):
+    """会话内缓存的结果图片（PNG字节），按钮下载与预览共用，results变化时才重新绘制"""
+    cached = st.session_state.get('_result_image')
+    if cached is None or cached[0] is not results:
+        img_buf = generate_result_image(results)
+        cached = (results, img_buf.getvalue() if img_buf else None)
+        st.session_state['_result_image'] = cached
+    return cached[1]
+
+def render_signal_card(r, text, idx, key_prefix, watch_codes, badge, info=None, sector=None,
+                       price_row=None, suggestion=None):
+    """
+    渲染单只股票的信号卡片（各信号分组共用）
+    text: build_card_texts为该股票预先格式化的文本
+    badge: (st方法名, 文本, 图标)，或根据结果返回该元组的函数
+    info: (结果字段, st方法名, 图标)，在买卖点之前显示的说明（如卖点/背驰解释）
+    sector: None不显示 / 'always' 有板块信息即显示 / 'nonzero' 资金流向非0才显示
+    price_row: None不显示 / 'buy' 买入-止损-目标 / 'sell' 当前-止损-目标
+    suggestion: (st方法名, 图标)，方法名为'caption'时以"💡"前缀的说明文字显示
+    """
+    with st.container():
+        cols = st.columns([4, 1])
+        with cols[0]:
+            st.markdown(text['header'])
+        with cols[1]:
+            kind, label, icon = badge(r) if callable(badge) else badge
+            getattr(st, kind)(label, icon=icon)
+        
+        # 显示板块信息
+        sector_info = r.get('sector_info') if sector else None
+        if sector_info:
+            sector_name = sector_info.get('main_sector', '未知')
+            sector_flow = sector_info.get('main_sector_flow', 0)
+            if sector == 'always' or sector_flow != 0:
+                flow_emoji = "🟢" if sector_flow > 0 else "🔴"
+                show = st.success if sector == 'always' else st.info
+                show(f"{flow_emoji} 所属板块: {sector_name} | 5日资金: {sector_flow:+.1f}%", icon="📊")
+        
+        # 显示背驰/卖出信号说明
+        if info and r.get(info[0]):
+            field, kind, icon = info
+            getattr(st, kind)(r[field], icon=icon)
+        
+        # 买卖点
+        if price_row and r.get('entry_price'):
+            c1, c2, c3 = st.columns(3)
+            if price_row == 'buy':
+                c1.caption(text['entry'])
+                if 'stop' in text:
+                    c2.caption(text['stop'])
+                if 'target' in text:
+                    c3.caption(text['target'])
+            else:
+                c1.caption(text['current'])
+                if 'stop_plain' in text:
+                    c2.caption(text['stop_plain'])
+                if 'target_signed' in text:
+                    c3.caption(text['target_signed'])
+        
+        if suggestion and r.get('suggestion'):
+            kind, icon = suggestion
+            if kind == 'caption':
+                st.caption(f"💡 {r['suggestion']}")
+            else:
+                getattr(st, kind)(r['suggestion'], icon=icon)
+        
+        if r['code'] in watch_codes:
+            st.caption("✅ 已自选")
+        else:
+            # 通过回调更新自选：回调在本次重跑前执行，无需再额外st.rerun()整页重跑一遍
+            st.button("⭐ 自选", key=f"{key_prefix}_{r['code']}_{idx}",
+                      on_click=add_to_watchlist, args=(r['code'], r['name']))
+        st.divider()
+
+
+# 局部重跑装饰器：Streamlit>=1.37为st.fragment，1.33起为st.experimental_fragment，更早版本退化为普通函数
+st_fragment = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None) or (lambda func: func)
+
+@st_fragment
+def render_results_table(results):
+    """完整数据表及导出区域：作为fragment渲染，导出/预览按钮只重跑本区域，不会带动整页信号卡片重绘"""
+    # 安全地创建DataFrame
+    try:
+        # 只取表格需要的列（不含sector_info等嵌套字段），缺失的键自动补为NaN
+        required_cols = ['code', 'name', 'price', 'change', 'signal', 'stroke_count', 'ding_count', 'di_count', 'min_price', 'max_price']
+        df_results = pd.DataFrame.from_records(results, columns=required_cols)
+        
+        # 创建区间列（按列取数组一次格式化，避免逐行apply构造Series）
+        min_prices = df_results['min_price']
+        max_prices = df_results['max_price']
+        valid = (min_prices.notna() & max_prices.notna()).to_numpy()
+        df_results['区间'] = [
+            f"{lo:.1f}-{hi:.1f}" if ok else '-'
+            for lo, hi, ok in zip(min_prices.to_numpy(), max_prices.to_numpy(), valid)
+        ]
+        
+        # 选择显示的列
+        display_cols = ['code', 'name', 'price', 'change', 'signal', 'stroke_count', 'ding_count', 'di_count', '区间']
+        df_display = df_results[display_cols]
+        
+        # 列标题与数值格式交给column_config在前端处理，无需复制、重命名DataFrame
+        column_names = {
+            'code': '代码',
+            'name': '名称', 
+            'price': '价格',
+            'change': '涨跌%',
+            'signal': '信号',
+            'stroke_count': '笔数',
+            'ding_count': '顶分型',
+            'di_count': '底分型',
+            '区间': '区间'
+        }
+        column_config = {
+            'code': st.column_config.TextColumn(column_names['code']),
+            'name': st.column_config.TextColumn(column_names['name']),
+            'price': st.column_config.NumberColumn(column_names['price'], format='%.2f'),
+            'change': st.column_config.NumberColumn(column_names['change'], format='%+.2f'),
+            'signal': st.column_config.TextColumn(column_names['signal']),
+            'stroke_count': st.column_config.NumberColumn(column_names['stroke_count'], format='%d'),
+            'ding_count': st.column_config.NumberColumn(column_names['ding_count'], format='%d'),
+            'di_count': st.column_config.NumberColumn(column_names['di_count'], format='%d'),
+            '区间': st.column_config.TextColumn(column_names['区间']),
+        }
+        
+        st.dataframe(df_display, column_config=column_config, use_container_width=True, height=400)
+        
+        # 导出按钮区域
+        export_cols = st.columns(2)
+        
+        with export_cols[0]:
+            # 导出CSV（按results缓存编码结果，无关的控件交互不再重复序列化）
+            cached_csv = st.session_state.get('_result_csv')
+            if cached_csv is None or cached_csv[0] is not results:
+                cached_csv = (results, df_display.rename(columns=column_names).to_csv(index=False).encode('utf-8'))
+                st.session_state['_result_csv'] = cached_csv
+            csv = cached_csv[1]
+            st.download_button(
+                label="📥 导出CSV",
+                data=csv,
+                file_name=f"缠论分析_{datetime.now().strftime('%Y%m%d')}.csv",
+                mime="text/csv",
+                use_container_width=True
+            )
+        
+        with export_cols[1]:
+            # 生成并下载图片
+            if st.button("📸 保存为图片", use_container_width=True):
+                with st.spinner("正在生成图片..."):
+                    img_buf = get_result_image(results)
+                    if img_buf:
+                        st.download_button(
+                            label="⬇️ 下载图片",
+                            data=img_buf,
+                            file_name=f"缠论分析_{datetime.now().strftime('%Y%m%d_%H%M')}.png",
+                            mime="image/png",
+                            use_container_width=True
+                        )
+                    else:
+                        st.error("生成图片失败")
+        
+        # 直接显示图片预览
+        has_buy_signal = any('三买' in r.get('signal', '') or r.get('signal') == '一买' for r in results)
+        if has_buy_signal:
+            with st.expander("👀 图片预览（长按保存）", expanded=False):
+                img_buf = get_result_image(results)
+                if img_buf:
+                    st.image(img_buf, use_column_width=True)
+    except Exception as e:
+        st.error(f"表格生成出错: {str(e)}")
+        # 显示原始数据作为备选
+        st.write("原始数据:", results)
+
+
 # ========== 页面主逻辑 ==========
 
 def main():
@@ -1753,7 +2473,7 @@ def main():
         
         # 显示搜索结果
         if search_query and stock_df is not None:
-            search_results = search_stocks(search_query, stock_df, limit=10)
+            search_results = search_stocks(search_query, stock_df, limit=10, index=stock_index)
             if search_results:
                 st.sidebar.markdown("**搜索结果：**")
                 for stock in search_results:
@@ -1867,13 +2587,15 @@ def main():
                     # 如果启用资金流向筛选
                     if use_money_flow:
                         with st.spinner("获取板块资金流向..."):
-                            sector_flows = get_sector_money_flow(days=5)
+                            sector_flows, flow_is_mock = get_sector_money_flow(days=5)
                             if sector_flows:
                                 filtered_stocks = filter_stocks_by_money_flow(group_stocks, sector_flows, top_n=10)
                                 # 显示资金流向信息
-                                top_sectors = sorted(sector_flows.items(), key=lambda x: x[1], reverse=True)[:5]
-                                flow_info = " | ".join([f"{s[0]}({s[1]:+.1f}%)" for s in top_sectors])
+                                top_sectors = heapq.nlargest(5, sector_flows.items(), key=lambda x: x[1])
+                                flow_info = " | ".join(f"{name}({flow:+.1f}%)" for name, flow in top_sectors)
                                 st.sidebar.success(f"资金流向TOP5: {flow_info}")
+                                if flow_is_mock:
+                                    st.sidebar.warning("行业资金流向获取失败，以上为演示用模拟数据")
                                 
                                 if len(filtered_stocks) < len(group_stocks):
                                     st.sidebar.info(f"资金流向筛选: 从 {len(group_stocks)} 只筛选至 {len(filtered_stocks)} 只")
@@ -1895,6 +2617,8 @@ def main():
     # 分析参数
     st.sidebar.markdown("---")
     days = st.sidebar.slider("分析天数", 30, 180, 90)
+    max_workers = st.sidebar.slider("并行线程数", 1, 16, 8,
+                                    help=f"分析线程数；Tushare接口请求另有{TUSHARE_MAX_CONCURRENCY}并发上限")
     
     # 开始分析
     st.sidebar.markdown("---")
@@ -1903,9 +2627,9 @@ def main():
             st.error("请先添加股票或选择板块！")
             return
         
-        # 使用多线程并行分析 + st.status显示进度（限速版：2线程）
+        # 使用多线程并行分析 + st.status显示进度（接口请求另有并发上限）
         with st.status("🚀 正在分析市场...", expanded=True) as status:
-            st.write(f"准备分析 {len(stock_list)} 只股票，使用2线程并行处理（限速模式）...")
+            st.write(f"准备分析 {len(stock_list)} 只股票，使用{max_workers}线程并行处理（接口限速{TUSHARE_MAX_CONCURRENCY}并发）...")
             
             # 创建进度条
             progress_bar = st.progress(0)
@@ -1917,12 +2641,12 @@ def main():
                 progress_bar.progress(progress)
                 progress_text.text(f"已完成 {current}/{total} 只股票 ({progress*100:.1f}%)")
             
-            # 多线程并行分析（2线程限速）
+            # 多线程并行分析：计算与缓存命中并行，接口请求由信号量限速
             start_time = datetime.now()
             results = analyze_stocks_parallel(
                 stock_list, 
                 days=days, 
-                max_workers=2,  # 限速：2线程
+                max_workers=max_workers,
                 progress_callback=update_progress
             )
             
@@ -1946,15 +2670,14 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.subheader("⭐ 我的自选")
     
-    watchlist = load_watchlist()
+    watchlist, _ = get_watchlist_state()
     if watchlist:
         st.sidebar.markdown(f"自选股票 ({len(watchlist)}只)：")
-        for item in watchlist:
+        for item in list(watchlist):
             cols = st.sidebar.columns([3, 1])
             cols[0].markdown(f"{item['code']} {item['name']}")
-            if cols[1].button("🗑️", key=f"watch_del_{item['code']}"):
-                remove_from_watchlist(item['code'])
-                st.rerun()
+            cols[1].button("🗑️", key=f"watch_del_{item['code']}",
+                           on_click=remove_from_watchlist, args=(item['code'],))
         
         if st.sidebar.button("📊 分析全部自选"):
             st.session_state['selected_stocks'] = [(w['code'], w['name']) for w in watchlist]
@@ -1966,7 +2689,7 @@ def main():
     st.sidebar.markdown("---")
     st.sidebar.subheader("📜 分析历史")
     
-    history = load_analysis_history()
+    history = list(get_history_state())
     if history:
         # 显示最近5次分析
         for i, record in enumerate(reversed(history[-5:])):
@@ -1981,26 +2704,27 @@ def main():
     # 显示结果
     if 'results' in st.session_state:
         results = st.session_state['results']
-        
-        # 统计 - 分类显示各种信号（包含评分和二买）
-        # 原有信号分类
-        buy3_all = [r for r in results if '三买' in r['signal'] and '评分' in r['signal']]
-        buy3_high = [r for r in results if '三买' in r['signal'] and r.get('signal_grade') in ['A', 'B']]
-        buy3_low = [r for r in results if '三买' in r['signal'] and r.get('signal_grade') in ['C', 'D']]
-        buy3_div = [r for r in results if r['signal'] == '三买+背驰']
-        
-        # 二买分类：区分板块资金流入为正的情况
-        buy2_strong = [r for r in results if r['signal'] == '强力二买']
-        buy2_standard = [r for r in results if r['signal'] == '标准二买']
-        
-        # 重点：二买 + 板块资金流入为正
-        buy2_strong_hot = [r for r in buy2_strong if r.get('sector_info') and r['sector_info'].get('main_sector_flow', 0) > 0]
-        buy2_standard_hot = [r for r in buy2_standard if r.get('sector_info') and r['sector_info'].get('main_sector_flow', 0) > 0]
-        
-        buy1 = [r for r in results if r['signal'] == '一买']
-        buy1_div = [r for r in results if r['signal'] == '一买+背驰']
-        sell3 = [r for r in results if '三卖' in r['signal']]
-        sell2 = [r for r in results if r['signal'] == '二卖']
+        # 自选代码集合：会话内缓存，整页渲染共用一份，O(1)判断是否已自选
+        _, watch_codes = get_watchlist_state()
+        card_texts = get_card_texts(results)
+        
+        # 统计 - 分类显示各种信号（包含评分和二买），单次遍历完成分组
+        groups, no_signal_count = categorize_results(results)
+        buy3_all = groups['buy3_all']
+        buy3_high = groups['buy3_high']
+        buy3_low = groups['buy3_low']
+        buy3_div = groups['buy3_div']
+        
+        # 二买分类：区分板块资金流入为正的情况（*_hot）
+        buy2_strong = groups['buy2_strong']
+        buy2_standard = groups['buy2_standard']
+        buy2_strong_hot = groups['buy2_strong_hot']
+        buy2_standard_hot = groups['buy2_standard_hot']
+        
+        buy1 = groups['buy1']
+        buy1_div = groups['buy1_div']
+        sell3 = groups['sell3']
+        sell2 = groups['sell2']
         
         # 显示统计卡片
         st.subheader("📊 信号统计（含二买板块资金流向）")
@@ -2024,7 +2748,7 @@ def main():
         cols2[0].metric("⚠️ 三卖信号", len(sell3), delta="卖出")
         cols2[1].metric("🚀 三买(A/B级)", len(buy3_high), delta="强势突破")
         cols2[2].metric("⚡ 二卖信号", len(sell2), delta="减仓")
-        cols2[3].metric("❌ 无信号", len(results) - len(buy3_all) - len(buy1) - len(buy3_div) - len(sell3) - len(sell2) - len(buy2_strong) - len(buy2_standard))
+        cols2[3].metric("❌ 无信号", no_signal_count)
         
         # 显示资金流向说明
         with st.expander("📖 资金流向说明"):
@@ -2043,383 +2767,80 @@ def main():
         if buy2_strong_hot or buy2_standard_hot:
             st.subheader("🔥 二买+板块资金流入 - 最强买点（优先关注）")
             st.caption("二买信号确认 + 所属板块5日资金净流入为正，双重确认")
-            
             for idx, r in enumerate(buy2_strong_hot + buy2_standard_hot):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        if r['signal'] == '强力二买':
-                            st.success("强力二买", icon="💪")
-                        else:
-                            st.info("标准二买", icon="📐")
-                    
-                    # 显示板块信息
-                    if r.get('sector_info'):
-                        sector_name = r['sector_info'].get('main_sector', '未知')
-                        sector_flow = r['sector_info'].get('main_sector_flow', 0)
-                        flow_emoji = "🟢" if sector_flow > 0 else "🔴"
-                        st.success(f"{flow_emoji} 所属板块: {sector_name} | 5日资金: {sector_flow:+.1f}%", icon="📊")
-                    
-                    # 买卖点
-                    if r.get('entry_price'):
-                        c1, c2, c3 = st.columns(3)
-                        c1.caption(f"💰 买入: ¥{r['entry_price']:.2f}")
-                        if r.get('stop_loss'):
-                            c2.caption(f"🛑 止损: ¥{r['stop_loss']:.1f} ({r['stop_loss_pct']:+.0f}%)")
-                        if r.get('target_price'):
-                            c3.caption(f"🎯 目标: ¥{r['target_price']:.1f} (+{r['target_pct']:.0f}%)")
-                    
-                    if r.get('suggestion'):
-                        st.success(r['suggestion'])
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        btn_key = f"w_buy2hot_{r['code']}_{idx}"
-                        if st.button("⭐ 自选", key=btn_key):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy2hot", watch_codes, badge=_buy2_badge,
+                                   sector='always', price_row='buy', suggestion=('success', None))
         
         # 三卖信号股票（风险警示）
         if sell3:
             st.subheader("⚠️ 三卖信号 - 强势卖出")
             st.caption("向下离开中枢后反弹未回中枢，趋势可能继续下跌")
             for idx, r in enumerate(sell3):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.error("卖出", icon="⚠️")
-                    
-                    # 显示背驰/卖出信号说明
-                    if r.get('sell_signal_info'):
-                        st.info(r['sell_signal_info'], icon="📉")
-                    
-                    # 买卖点
-                    if r.get('entry_price'):
-                        c1, c2, c3 = st.columns(3)
-                        c1.caption(f"💰 当前: ¥{r['price']:.2f}")
-                        if r.get('stop_loss'):
-                            c2.caption(f"🛑 止损: ¥{r['stop_loss']:.1f}")
-                        if r.get('target_price'):
-                            c3.caption(f"🎯 目标: ¥{r['target_price']:.1f} ({r['target_pct']:+.0f}%)")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_sell3_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_sell3", watch_codes, badge=('error', "卖出", "⚠️"),
+                                   info=('sell_signal_info', 'info', "📉"), price_row='sell')
         
         # 二卖信号股票
         if sell2:
             st.subheader("⚡ 二卖信号 - 减仓")
             st.caption("突破后回抽至中枢内，建议减仓")
             for idx, r in enumerate(sell2):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.warning("减仓", icon="⚡")
-                    
-                    if r.get('sell_signal_info'):
-                        st.info(r['sell_signal_info'], icon="📉")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_sell2_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_sell2", watch_codes, badge=('warning', "减仓", "⚡"),
+                                   info=('sell_signal_info', 'info', "📉"))
         
         # ===== 其他二买信号（板块资金未确认或未知）=====
         # 强力二买（板块资金未确认）
-        buy2_strong_other = [r for r in buy2_strong if r not in buy2_strong_hot]
+        buy2_strong_other = groups['buy2_strong_other']
         if buy2_strong_other:
             st.subheader("💪 强力二买 - 核心买点（板块资金待确认）")
             st.caption("回抽不破中枢上沿 + 底分型 + MACD衰竭")
             for idx, r in enumerate(buy2_strong_other):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.success("买入", icon="💪")
-                    
-                    # 显示板块信息（如果有）
-                    if r.get('sector_info'):
-                        sector_name = r['sector_info'].get('main_sector', '未知')
-                        sector_flow = r['sector_info'].get('main_sector_flow', 0)
-                        if sector_flow != 0:
-                            flow_emoji = "🟢" if sector_flow > 0 else "🔴"
-                            st.info(f"{flow_emoji} 所属板块: {sector_name} | 5日资金: {sector_flow:+.1f}%", icon="📊")
-                    
-                    # 买卖点
-                    if r.get('entry_price'):
-                        c1, c2, c3 = st.columns(3)
-                        c1.caption(f"💰 买入: ¥{r['entry_price']:.2f}")
-                        if r.get('stop_loss'):
-                            c2.caption(f"🛑 止损: ¥{r['stop_loss']:.1f} ({r['stop_loss_pct']:+.0f}%)")
-                        if r.get('target_price'):
-                            c3.caption(f"🎯 目标: ¥{r['target_price']:.1f} (+{r['target_pct']:.0f}%)")
-                    
-                    if r.get('suggestion'):
-                        st.success(r['suggestion'], icon="📊")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy2s_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy2s", watch_codes, badge=('success', "买入", "💪"),
+                                   sector='nonzero', price_row='buy', suggestion=('success', "📊"))
         
         # 标准二买（板块资金未确认）
-        buy2_standard_other = [r for r in buy2_standard if r not in buy2_standard_hot]
+        buy2_standard_other = groups['buy2_standard_other']
         if buy2_standard_other:
             st.subheader("📐 标准二买 - 有效买点（板块资金待确认）")
             st.caption("回抽进入中枢但未破一买低点 + 底分型 + MACD衰竭")
             for idx, r in enumerate(buy2_standard_other):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.info("买入", icon="📐")
-                    
-                    # 显示板块信息（如果有）
-                    if r.get('sector_info'):
-                        sector_name = r['sector_info'].get('main_sector', '未知')
-                        sector_flow = r['sector_info'].get('main_sector_flow', 0)
-                        if sector_flow != 0:
-                            flow_emoji = "🟢" if sector_flow > 0 else "🔴"
-                            st.info(f"{flow_emoji} 所属板块: {sector_name} | 5日资金: {sector_flow:+.1f}%", icon="📊")
-                    
-                    # 买卖点
-                    if r.get('entry_price'):
-                        c1, c2, c3 = st.columns(3)
-                        c1.caption(f"💰 买入: ¥{r['entry_price']:.2f}")
-                        if r.get('stop_loss'):
-                            c2.caption(f"🛑 止损: ¥{r['stop_loss']:.1f} ({r['stop_loss_pct']:+.0f}%)")
-                        if r.get('target_price'):
-                            c3.caption(f"🎯 目标: ¥{r['target_price']:.1f} (+{r['target_pct']:.0f}%)")
-                    
-                    if r.get('suggestion'):
-                        st.info(r['suggestion'], icon="💡")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy2st_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy2st", watch_codes, badge=('info', "买入", "📐"),
+                                   sector='nonzero', price_row='buy', suggestion=('info', "💡"))
         
         # 三买+背驰信号（特殊处理）
         if buy3_div:
             st.subheader("🎯 三买+背驰 - 谨慎追涨")
             st.caption("价格创新高但力度减弱，建议减仓而非加仓")
             for idx, r in enumerate(buy3_div):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.warning("减仓", icon="⚠️")
-                    
-                    if r.get('divergence_info'):
-                        st.warning(r['divergence_info'], icon="📊")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy3div_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy3div", watch_codes, badge=('warning', "减仓", "⚠️"),
+                                   info=('divergence_info', 'warning', "📊"))
         
         # 三买信号股票（正常）- 只显示高评分信号
         if buy3_high:
             st.subheader("🎯 三买信号 - 强势突破（A/B级）")
             for idx, r in enumerate(buy3_high):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.success("买入", icon="🚀")
-                    
-                    # 买卖点
-                    if r.get('entry_price'):
-                        c1, c2, c3 = st.columns(3)
-                        c1.caption(f"💰 买入: ¥{r['entry_price']:.2f}")
-                        if r.get('stop_loss'):
-                            c2.caption(f"🛑 止损: ¥{r['stop_loss']:.1f} ({r['stop_loss_pct']:+.0f}%)")
-                        if r.get('target_price'):
-                            c3.caption(f"🎯 目标: ¥{r['target_price']:.1f} (+{r['target_pct']:.0f}%)")
-                    
-                    if r.get('suggestion'):
-                        st.caption(f"💡 {r['suggestion']}")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy3_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy3", watch_codes, badge=('success', "买入", "🚀"),
+                                   price_row='buy', suggestion=('caption', None))
         
         # 一买+背驰信号（加强版一买）
         if buy1_div:
             st.subheader("✨ 一买+背驰 - 底部确认")
             st.caption("底背驰确认，反弹概率高，优于普通一买")
             for idx, r in enumerate(buy1_div):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.success("买入", icon="✨")
-                    
-                    if r.get('divergence_info'):
-                        st.success(r['divergence_info'], icon="📊")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy1div_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy1div", watch_codes, badge=('success', "买入", "✨"),
+                                   info=('divergence_info', 'success', "📊"))
         
         # 一买信号股票（普通）
         if buy1:
             st.subheader("📉 一买信号 - 底部反转")
             for idx, r in enumerate(buy1):
-                with st.container():
-                    cols = st.columns([4, 1])
-                    with cols[0]:
-                        price_color = "🔴" if r['change'] > 0 else "🟢"
-                        st.markdown(f"**{r['code']} {r['name']}** {price_color} ¥{r['price']:.2f} ({r['change']:+.1f}%)")
-                    with cols[1]:
-                        st.warning("关注", icon="📉")
-                    
-                    if r.get('suggestion'):
-                        st.caption(f"💡 {r['suggestion']}")
-                    
-                    watchlist = load_watchlist()
-                    if any(w['code'] == r['code'] for w in watchlist):
-                        st.caption("✅ 已自选")
-                    else:
-                        if st.button("⭐ 自选", key=f"w_buy1_{r['code']}_{idx}"):
-                            add_to_watchlist(r['code'], r['name'])
-                            st.rerun()
-                    st.divider()
+                render_signal_card(r, card_texts[r['code']], idx, "w_buy1", watch_codes, badge=('warning', "关注", "📉"),
+                                   suggestion=('caption', None))
         
         # 完整数据表
         st.markdown("---")
         st.subheader("📋 完整分析数据")
         
-        # 安全地创建DataFrame
-        try:
-            df_results = pd.DataFrame(results)
-            
-            # 确保所有需要的列都存在
-            required_cols = ['code', 'name', 'price', 'change', 'signal', 'stroke_count', 'ding_count', 'di_count', 'min_price', 'max_price']
-            for col in required_cols:
-                if col not in df_results.columns:
-                    df_results[col] = ''
-            
-            # 创建区间列
-            df_results['区间'] = df_results.apply(
-                lambda x: f"{x.get('min_price', 0):.1f}-{x.get('max_price', 0):.1f}" if pd.notna(x.get('min_price')) and pd.notna(x.get('max_price')) else '-', 
-                axis=1
-            )
-            
-            # 选择显示的列
-            display_cols = ['code', 'name', 'price', 'change', 'signal', 'stroke_count', 'ding_count', 'di_count', '区间']
-            df_display = df_results[[col for col in display_cols if col in df_results.columns]].copy()
-            
-            # 重命名列
-            column_names = {
-                'code': '代码',
-                'name': '名称', 
-                'price': '价格',
-                'change': '涨跌%',
-                'signal': '信号',
-                'stroke_count': '笔数',
-                'ding_count': '顶分型',
-                'di_count': '底分型',
-                '区间': '区间'
-            }
-            df_display = df_display.rename(columns=column_names)
-            
-            st.dataframe(df_display, use_container_width=True, height=400)
-            
-            # 导出按钮区域
-            export_cols = st.columns(2)
-            
-            with export_cols[0]:
-                # 导出CSV
-                csv = df_display.to_csv(index=False).encode('utf-8')
-                st.download_button(
-                    label="📥 导出CSV",
-                    data=csv,
-                    file_name=f"缠论分析_{datetime.now().strftime('%Y%m%d')}.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-            
-            with export_cols[1]:
-                # 生成并下载图片
-                if st.button("📸 保存为图片", use_container_width=True):
-                    with st.spinner("正在生成图片..."):
-                        img_buf = generate_result_image(results)
-                        if img_buf:
-                            st.download_button(
-                                label="⬇️ 下载图片",
-                                data=img_buf,
-                                file_name=f"缠论分析_{datetime.now().strftime('%Y%m%d_%H%M')}.png",
-                                mime="image/png",
-                                use_container_width=True
-                            )
-                        else:
-                            st.error("生成图片失败")
-            
-            # 直接显示图片预览
-            has_buy_signal = any('三买' in r.get('signal', '') or r.get('signal') == '一买' for r in results)
-            if has_buy_signal:
-                with st.expander("👀 图片预览（长按保存）", expanded=False):
-                    img_buf = generate_result_image(results)
-                    if img_buf:
-                        st.image(img_buf, use_column_width=True)
-        except Exception as e:
-            st.error(f"表格生成出错: {str(e)}")
-            # 显示原始数据作为备选
-            st.write("原始数据:", results)
+        render_results_table(results)
     else:
         # 欢迎页面
         st.info("👈 请在左侧配置股票池，然后点击「开始分析」")
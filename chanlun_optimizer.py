@@ -3,15 +3,269 @@
 缠论算法优化模块 - 二买专项优化版
 """
 
-import pandas as pd
 import numpy as np
-from typing import Dict, Optional, Tuple
+from bisect import bisect_left, bisect_right
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Mapping, NamedTuple, Optional, Tuple, Union
 from dataclasses import dataclass
 
+# pandas只用于类型标注（运行时只通过 df[列名].to_numpy() 取数），不在导入本模块时加载
+if TYPE_CHECKING:
+    import pandas as pd
+
+# 尝试导入numba加速ATR计算循环（不可用时退化为普通Python执行）
+try:
+    from numba import njit, prange, types
+    
+    # 显式类型签名：导入时即编译（cache=True时直接读磁盘缓存），避免首次调用的编译延迟
+    # 数组按只读、任意内存布局声明，可写数组和pandas返回的只读数组都能直接传入；调用方统一转为float64
+    _ARRAY_1D = types.Array(types.float64, 1, 'A', readonly=True)
+    _ARRAY_2D = types.Array(types.float64, 2, 'A', readonly=True)
+    _ATR_SIGNATURE = types.float64(_ARRAY_1D, _ARRAY_1D, _ARRAY_1D, types.int64)
+    _ATR_MEAN_SIGNATURE = types.UniTuple(types.float64, 2)(_ARRAY_1D, _ARRAY_1D, _ARRAY_1D, types.int64)
+    _ATR_BATCH_SIGNATURE = types.float64[:](_ARRAY_2D, _ARRAY_2D, _ARRAY_2D, types.int64)
+except ImportError:
+    prange = range
+    _ATR_SIGNATURE = _ATR_MEAN_SIGNATURE = _ATR_BATCH_SIGNATURE = None
+    
+    def njit(*args, **kwargs):
+        """numba未安装时的空装饰器"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+
+@njit(_ATR_SIGNATURE, cache=True)
+def _atr_last(high, low, close, period):
+    """最近period根K线真实波幅的均值（单次循环，不生成中间数组）"""
+    n = close.shape[0]
+    if n < period:
+        return 0.0
+    
+    total = 0.0
+    for i in range(n - period, n):
+        # 首根K线没有前收盘，用自身收盘价代替（此时真实波幅即为high-low）
+        prev_close = close[i - 1] if i > 0 else close[i]
+        tr = high[i] - low[i]
+        d = abs(high[i] - prev_close)
+        if d > tr:
+            tr = d
+        d = abs(low[i] - prev_close)
+        if d > tr:
+            tr = d
+        total += tr
+    return total / period
+
+
+@njit(_ATR_MEAN_SIGNATURE, cache=True)
+def _atr_and_mean_last(high, low, close, period):
+    """
+    一次遍历最近period根K线，同时求ATR和平均收盘价（动态阈值用）
+    ATR规则同_atr_last；平均价忽略NaN，全为NaN时为NaN
+    """
+    n = close.shape[0]
+    start = n - period if n > period else 0
+    full = n >= period
+    
+    tr_total = 0.0
+    close_total = 0.0
+    close_count = 0
+    for i in range(start, n):
+        c = close[i]
+        if not np.isnan(c):
+            close_total += c
+            close_count += 1
+        if full:
+            prev_close = close[i - 1] if i > 0 else c
+            tr = high[i] - low[i]
+            d = abs(high[i] - prev_close)
+            if d > tr:
+                tr = d
+            d = abs(low[i] - prev_close)
+            if d > tr:
+                tr = d
+            tr_total += tr
+    
+    atr = tr_total / period if full else 0.0
+    mean_close = close_total / close_count if close_count else np.nan
+    return atr, mean_close
+
+
+@njit(_ATR_BATCH_SIGNATURE, cache=True, parallel=True)
+def _atr_last_batch(high, low, close, period):
+    """
+    多只股票并行计算ATR
+    high/low/close: 形状(股票数, K线数)的二维数组，每行右对齐（最新K线在最后一列），左侧用NaN补齐
+    """
+    count = close.shape[0]
+    out = np.zeros(count)
+    for s in prange(count):
+        # 跳过左侧补齐的NaN，只用该股票实际的K线
+        start = 0
+        while start < close.shape[1] and np.isnan(close[s, start]):
+            start += 1
+        atr = _atr_last(high[s, start:], low[s, start:], close[s, start:], period)
+        out[s] = atr if not np.isnan(atr) else 0.0
+    return out
+
+
+# 按波动率分档的突破阈值（只读，各次调用共用同一份，不再每次新建字典）
+THRESHOLD_HIGH_VOL = MappingProxyType({
+    'volatility_level': 'high',
+    '三买_max': 25.0,
+    '三买_min': 3.0,
+    '三卖_min': 2.0,
+    'description': '高波动股'
+})
+THRESHOLD_MEDIUM_VOL = MappingProxyType({
+    'volatility_level': 'medium',
+    '三买_max': 15.0,
+    '三买_min': 2.0,
+    '三卖_min': 2.0,
+    'description': '中波动股'
+})
+THRESHOLD_LOW_VOL = MappingProxyType({
+    'volatility_level': 'low',
+    '三买_max': 10.0,
+    '三买_min': 1.0,
+    '三卖_min': 1.5,
+    'description': '低波动股'
+})
+
+
+# 三买评分阶梯：bisect_left(上界, 值) 得到档位，即"值 <= 上界"的第一档；(得分, 说明模板)
+# 突破幅度：[3,8]理想 / (8,12]良好 / (12,15]偏高 / 不足3%或超过15%偏差
+BUY3_BREAKOUT_EDGES = (8, 12, 15)
+BUY3_BREAKOUT_RUNGS = (
+    (30, "✓ 突破{:.1f}%理想(30分)"),
+    (25, "△ 突破{:.1f}%良好(25分)"),
+    (15, "⚠ 突破{:.1f}%偏高(15分)"),
+    (5, "✗ 突破{:.1f}%偏差(5分)"),
+)
+# 量比：<=1缩量 / (1,1.5]正常 / (1.5,2]明显 / >2大幅
+BUY3_VOLUME_EDGES = (1.0, 1.5, 2.0)
+BUY3_VOLUME_RUNGS = (
+    (3, "✗ 缩量({:.2f}倍)(3分)"),
+    (10, "○ 正常放量({:.2f}倍)(10分)"),
+    (16, "△ 明显放量({:.2f}倍)(16分)"),
+    (20, "✓ 大幅放量({:.2f}倍)(20分)"),
+)
+# 距前高空间：<=15接近前高 / (15,30]一般 / >30空间大
+BUY3_DISTANCE_EDGES = (15, 30)
+BUY3_DISTANCE_RUNGS = (
+    (2, "⚠ 接近前高(2分)"),
+    (6, "△ 空间一般(6分)"),
+    (10, "✓ 空间大(10分)"),
+)
+
+
+# 批量评分用的各档得分表（单项最高40分，int8即可；累加用int16避免溢出）
+BUY3_BREAKOUT_POINTS = np.array([points for points, _ in BUY3_BREAKOUT_RUNGS], dtype=np.int8)
+BUY3_VOLUME_POINTS = np.array([points for points, _ in BUY3_VOLUME_RUNGS], dtype=np.int8)
+BUY3_DISTANCE_POINTS = np.array([points for points, _ in BUY3_DISTANCE_RUNGS], dtype=np.int8)
+# 卖点：跌破幅度 <=1.5 / (1.5,3] / (3,5] / >5；回抽 <1 / [1,2) / [2,5) / >=5（含NaN）
+SELL_BREAKOUT_EDGES = (1.5, 3, 5)
+SELL_BREAKOUT_POINTS = np.array([8, 15, 25, 30], dtype=np.int8)
+SELL_REBOUND_EDGES = np.array([1.0, 2.0, 5.0])
+SELL_REBOUND_POINTS = np.array([25, 20, 10, 0], dtype=np.int8)
+
+# 评级门槛：<30 E / 30 D / 45 C / 60 B / 75 A，bisect_right(门槛, 分数) 即评级下标
+GRADE_EDGES = (30, 45, 60, 75)
+GRADE_LABELS = ('E', 'D', 'C', 'B', 'A')
+# 各评级对应的操作建议与预估成功率（买卖各一套）
+BUY_GRADE_ACTIONS = ("放弃-风险过高", "观望-等待确认", "谨慎-小仓位试探", "推荐-适量买入", "强烈推荐-重仓买入")
+BUY_GRADE_PROBS = (0.18, 0.32, 0.48, 0.62, 0.75)
+SELL_GRADE_ACTIONS = ("持仓-可能假突破", "观望-设置止损", "谨慎-部分减仓", "推荐-减仓", "强烈推荐-立即卖出")
+SELL_GRADE_PROBS = (0.22, 0.35, 0.48, 0.62, 0.75)
+# 二买跌破一买低点：信号直接不成立
+BUY2_BROKEN_ACTION = "放弃-破底"
+BUY2_BROKEN_PROB = 0.10
+
+
+def _batch_size(contexts) -> int:
+    """批量上下文的候选数：字典取任一列的长度，DataFrame取行数"""
+    if isinstance(contexts, dict):
+        return len(next(iter(contexts.values()))) if contexts else 0
+    return len(contexts)
+
+
+def _batch_field(contexts: Union[Dict[str, np.ndarray], 'pd.DataFrame'], key: str, default, size: int) -> np.ndarray:
+    """取批量上下文中的一列，缺失时用与逐条评分相同的默认值补齐"""
+    if key in contexts:
+        return np.asarray(contexts[key])
+    return np.full(size, default)
+
+
+def _vol_ratio_batch(contexts: Dict[str, np.ndarray], size: int) -> np.ndarray:
+    """批量量比，与SignalContext.vol_ratio规则相同"""
+    current_vol = _batch_field(contexts, 'current_vol', 0, size).astype(float)
+    return current_vol / np.maximum(_batch_field(contexts, 'ma20_vol', 1, size).astype(float), 1)
+
+
+def _grade_batch(scores: np.ndarray, probs: Tuple[float, ...]) -> Tuple[np.ndarray, np.ndarray]:
+    """批量分数 -> (评级编号数组uint8, 预估成功率数组float32)；评级编号为GRADE_LABELS的下标"""
+    rungs = np.searchsorted(np.asarray(GRADE_EDGES), scores, side='right').astype(np.uint8)
+    return rungs, np.asarray(probs, dtype=np.float32)[rungs]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    批量评分后取分数最高的k个候选的下标（按分数从高到低）
+    用np.argpartition只对前k个排序，不必为全部候选生成SignalScore对象
+    """
+    scores = np.asarray(scores)
+    k = min(k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top = np.argpartition(scores, -k)[-k:]
+    # 分数从高到低，同分时按原顺序
+    return top[np.lexsort((top, -scores[top]))]
+
+
+def _rung_batch(edges, values: np.ndarray) -> np.ndarray:
+    """批量版 bisect_left 档位；NaN 与逐条评分一致落在最低档（np.searchsorted会把NaN排到最后）"""
+    rungs = np.searchsorted(np.asarray(edges, dtype=float), values, side='left')
+    return np.where(np.isnan(values), 0, rungs)
+
+
+class SignalContext(NamedTuple):
+    """信号评分上下文（各评分函数共用，未给出的字段取默认值）"""
+    breakout_pct: float = 0.0           # 突破/跌破中枢幅度(%)
+    current_vol: float = 0.0            # 当日成交量
+    ma20_vol: float = 1.0               # 20日均量
+    rebound_pct: float = 0.0            # 回抽幅度(%)，卖点用
+    market_trend: str = 'neutral'       # bull / neutral / bear
+    sublevel_confirm: bool = False      # 次级别确认
+    is_standard_pattern: bool = False   # 三买标准形态
+    has_breakout_structure: bool = False
+    distance_to_max: float = 50.0       # 距前高空间(%)
+    current_price: float = 0.0
+    first_buy_low: Optional[float] = None    # 一买最低点，None时取current_price
+    has_bottom_fractal: bool = False
+    stop_loss_price: Optional[float] = None  # None时取first_buy_low*0.98
+    target_price: Optional[float] = None     # None时取current_price*1.1
+    pullback_depth: float = 0.0         # 二买回踩深度
+    
+    @property
+    def vol_ratio(self) -> float:
+        """量比：当日成交量 / 20日均量（均量不足1按1计）"""
+        return self.current_vol / max(self.ma20_vol, 1)
+
+
+def as_signal_context(context: Union[SignalContext, Dict]) -> SignalContext:
+    """兼容旧的字典形式上下文：只取SignalContext中定义的字段"""
+    if isinstance(context, SignalContext):
+        return context
+    return SignalContext(**{key: value for key, value in context.items() if key in SignalContext._fields})
+
 
 @dataclass
 class SignalScore:
     """信号评分结果"""
+    # 显式__slots__：实例不带__dict__，扫描时大量短生命周期的评分对象更省内存
+    # （字段均无默认值，可直接与dataclass配合，不依赖Python 3.10的slots=True）
+    __slots__ = ('total_score', 'grade', 'action', 'probability', 'details')
+    
     total_score: int
     grade: str
     action: str
@@ -23,55 +277,87 @@ class ChanLunOptimizer:
     """缠论算法优化器 - 二买专项优化版"""
     
     def __init__(self):
+        # (代码, K线数, 最新收盘价) -> (ATR, 平均价, 波动率, 阈值表)
         self.volatility_cache = {}
     
-    def calculate_atr(self, df: pd.DataFrame, period: int = 20) -> float:
-        """计算平均真实波幅(ATR)"""
-        high = df['high']
-        low = df['low']
-        close = df['close']
+    def clear_cache(self):
+        """清空波动率缓存（每轮扫描开始时调用，避免缓存无限增长）"""
+        self.volatility_cache.clear()
+    
+    def calculate_atr(self, df: 'pd.DataFrame', period: int = 20) -> float:
+        """
+        计算平均真实波幅(ATR)，取最近period根K线真实波幅的均值（DataFrame入口）
+        df: pandas或polars的DataFrame均可，只通过 df[列名].to_numpy() 取出high/low/close
+        """
+        return self.calculate_atr_arrays(df['high'].to_numpy(), df['low'].to_numpy(),
+                                         df['close'].to_numpy(), period)
+    
+    def calculate_atr_arrays(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                             period: int = 20) -> float:
+        """
+        计算ATR（NumPy数组入口）
+        high/low/close: 按日期升序的一维数组；已持有数组的调用方直接调用，省去DataFrame取列
+        """
+        atr = _atr_last(np.asarray(high, dtype=float), np.asarray(low, dtype=float),
+                        np.asarray(close, dtype=float), period)
         
-        tr1 = high - low
-        tr2 = abs(high - close.shift(1))
-        tr3 = abs(low - close.shift(1))
+        return atr if not np.isnan(atr) else 0
+    
+    def calculate_atr_batch(self, frames: Dict[str, 'pd.DataFrame'], period: int = 20) -> Dict[str, float]:
+        """批量计算多只股票的ATR：{代码: 日线DataFrame(pandas或polars)} -> {代码: ATR}"""
+        if not frames:
+            return {}
         
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=period).mean().iloc[-1]
+        codes = list(frames)
+        width = max(len(frames[code]) for code in codes)
+        arrays = {col: np.full((len(codes), width), np.nan) for col in ('high', 'low', 'close')}
+        for row, code in enumerate(codes):
+            df = frames[code]
+            for col, arr in arrays.items():
+                if len(df):
+                    arr[row, width - len(df):] = df[col].to_numpy()
         
-        return atr if not np.isnan(atr) else 0
+        atrs = _atr_last_batch(arrays['high'], arrays['low'], arrays['close'], period)
+        return dict(zip(codes, atrs.tolist()))
+    
+    def get_dynamic_threshold(self, df: 'pd.DataFrame', code: str = "") -> Mapping:
+        """根据股票波动率动态调整阈值（DataFrame入口，各列只转换一次；同样支持polars的DataFrame）"""
+        return self.get_dynamic_threshold_arrays(df['high'].to_numpy(), df['low'].to_numpy(),
+                                                 df['close'].to_numpy(), code)
     
-    def get_dynamic_threshold(self, df: pd.DataFrame, code: str = "") -> Dict:
-        """根据股票波动率动态调整阈值"""
-        atr = self.calculate_atr(df)
-        avg_price = df['close'].mean()
+    def get_dynamic_threshold_arrays(self, high: np.ndarray, low: np.ndarray, close: np.ndarray,
+                                     code: str = "", period: int = 20) -> Mapping:
+        """
+        根据股票波动率动态调整阈值（NumPy数组入口，返回模块级只读阈值表之一，传入code时按代码缓存）
+        波动率 = 最近period根K线的ATR / 同一窗口的平均收盘价
+        """
+        close = np.asarray(close, dtype=float)
+        key = None
+        if code and close.size:
+            key = (code, close.size, float(close[-1]))
+            cached = self.volatility_cache.get(key)
+            if cached is not None:
+                return cached[3]
+        
+        # ATR与平均价取同一窗口，在一次遍历中同时算出
+        atr, avg_price = _atr_and_mean_last(np.asarray(high, dtype=float), np.asarray(low, dtype=float),
+                                            close, period)
+        if np.isnan(atr):
+            atr = 0
         volatility = atr / avg_price if avg_price > 0 else 0.03
         
         if volatility > 0.04:
-            return {
-                'volatility_level': 'high',
-                '三买_max': 25.0,
-                '三买_min': 3.0,
-                '三卖_min': 2.0,
-                'description': '高波动股'
-            }
+            threshold = THRESHOLD_HIGH_VOL
         elif volatility > 0.025:
-            return {
-                'volatility_level': 'medium',
-                '三买_max': 15.0,
-                '三买_min': 2.0,
-                '三卖_min': 2.0,
-                'description': '中波动股'
-            }
+            threshold = THRESHOLD_MEDIUM_VOL
         else:
-            return {
-                'volatility_level': 'low',
-                '三买_max': 10.0,
-                '三买_min': 1.0,
-                '三卖_min': 1.5,
-                'description': '低波动股'
-            }
+            threshold = THRESHOLD_LOW_VOL
+        
+        if key is not None:
+            self.volatility_cache[key] = (atr, avg_price, volatility, threshold)
+        return threshold
     
-    def is_valid_breakout(self, breakout_pct: float, threshold: Dict, signal_type: str) -> Tuple[bool, str]:
+    def is_valid_breakout(self, breakout_pct: float, threshold: Mapping, signal_type: str) -> Tuple[bool, str]:
         """判断突破是否有效"""
         if signal_type == '三买':
             if breakout_pct < threshold['三买_min']:
@@ -89,10 +375,26 @@ class ChanLunOptimizer:
         
         return True, ""
     
-    def score_buy_signal(self, context: Dict, signal_type: str = '三买') -> SignalScore:
+    def is_valid_breakout_batch(self, breakout_pcts: np.ndarray, threshold: Mapping, signal_type: str) -> np.ndarray:
+        """
+        批量判断突破是否有效，只返回布尔数组（规则同is_valid_breakout，不生成说明文字）
+        需要说明时只对个别股票再调用is_valid_breakout
+        """
+        pcts = np.asarray(breakout_pcts, dtype=float)
+        # 用取反的比较与单只判断保持一致：NaN既不算不足也不算过大
+        if signal_type == '三买':
+            return ~(pcts < threshold['三买_min']) & ~(pcts > threshold['三买_max'])
+        elif signal_type == '三卖':
+            return ~(pcts < threshold['三卖_min'])
+        return np.ones(pcts.shape, dtype=bool)
+    
+    def score_buy_signal(self, context: Union[SignalContext, Dict], signal_type: str = '三买',
+                         build_details: bool = False) -> SignalScore:
         """
         买入信号评分 - 二买专项优化版
+        build_details: 是否生成逐项评分说明（扫描时只需分数和评级，默认不生成）
         """
+        context = as_signal_context(context)
         score = 0
         details = []
         
@@ -100,250 +402,302 @@ class ChanLunOptimizer:
             # ==================== 二买专属评分逻辑（专项优化）====================
             
             # 1. 【核心】回踩不破底 - 基础分40分
-            current_price = context.get('current_price', 0)
-            first_buy_low = context.get('first_buy_low', current_price)
+            current_price = context.current_price
+            first_buy_low = current_price if context.first_buy_low is None else context.first_buy_low
             
             if current_price > 0 and first_buy_low > 0:
                 if current_price > first_buy_low:
                     # 只要不破一买最低点，直接给40分基础分
                     score += 40
-                    safety_margin = (current_price - first_buy_low) / first_buy_low * 100
-                    details.append(f"✓✓ 回踩不破底，基础分(40分)")
+                    if build_details:
+                        details.append(f"✓✓ 回踩不破底，基础分(40分)")
                 else:
-                    # 破底了，不给分
-                    details.append(f"✗✗ 跌破一买低点，二买不成立(0分)")
+                    # 破底了，二买不成立，其余各项无需再评
+                    if build_details:
+                        details.append(f"✗✗ 跌破一买低点，二买不成立(0分)")
+                    return SignalScore(
+                        total_score=0,
+                        grade=GRADE_LABELS[0],
+                        action=BUY2_BROKEN_ACTION,
+                        probability=BUY2_BROKEN_PROB,
+                        details=details
+                    )
             
             # 2. 【缩量奖励】缩量即给20分
-            vol_ratio = context.get('current_vol', 0) / max(context.get('ma20_vol', 1), 1)
+            vol_ratio = context.vol_ratio
             if vol_ratio < 1.0:
                 score += 20
-                details.append(f"✓✓ 缩量回踩({vol_ratio:.2f}倍<1.0)，奖励(20分)")
-            else:
+                if build_details:
+                    details.append(f"✓✓ 缩量回踩({vol_ratio:.2f}倍<1.0)，奖励(20分)")
+            elif build_details:
                 details.append(f"△ 未明显缩量({vol_ratio:.2f}倍)")
             
             # 3. 【形态确认】底分型奖励20分
-            if context.get('has_bottom_fractal', False):
+            if context.has_bottom_fractal:
                 score += 20
-                details.append(f"✓✓ 底分型确认，奖励(20分)")
-            else:
+                if build_details:
+                    details.append(f"✓✓ 底分型确认，奖励(20分)")
+            elif build_details:
                 details.append(f"△ 无底分型确认")
             
             # 4. 盈亏比评估 (10分)
-            stop_loss = context.get('stop_loss_price', first_buy_low * 0.98)
-            target_price = context.get('target_price', current_price * 1.1)
+            stop_loss = first_buy_low * 0.98 if context.stop_loss_price is None else context.stop_loss_price
+            target_price = current_price * 1.1 if context.target_price is None else context.target_price
             
+            # 盈亏比 = 潜在收益/潜在亏损，两者同除以现价的百分比换算可约去，只做一次除法
             if current_price > 0 and stop_loss > 0:
-                risk = (current_price - stop_loss) / current_price * 100
-                reward = (target_price - current_price) / current_price * 100
+                risk = current_price - stop_loss
                 if risk > 0:
-                    rr_ratio = reward / risk
+                    rr_ratio = (target_price - current_price) / risk
                     if rr_ratio >= 2:
                         score += 10
-                        details.append(f"✓ 盈亏比优秀(10分)")
+                        if build_details:
+                            details.append(f"✓ 盈亏比优秀(10分)")
                     elif rr_ratio >= 1.5:
                         score += 5
-                        details.append(f"△ 盈亏比一般(5分)")
+                        if build_details:
+                            details.append(f"△ 盈亏比一般(5分)")
             
             # 5. 市场环境 (5分)
-            trend = context.get('market_trend', 'neutral')
+            trend = context.market_trend
             if trend == 'bull':
                 score += 5
-                details.append("✓ 牛市(5分)")
+                if build_details:
+                    details.append("✓ 牛市(5分)")
             elif trend == 'neutral':
                 score += 3
-                details.append("○ 震荡(3分)")
+                if build_details:
+                    details.append("○ 震荡(3分)")
             
             # 6. 次级别确认 (加分项)
-            if context.get('sublevel_confirm', False):
+            if context.sublevel_confirm:
                 score += 5
-                details.append("✨ 次级别确认(+5分)")
+                if build_details:
+                    details.append("✨ 次级别确认(+5分)")
         
         else:  # 三买
             # ==================== 三买评分逻辑 ====================
             
-            # 1. 突破幅度评分 (30分)
-            breakout = context.get('breakout_pct', 0)
-            if 3 <= breakout <= 8:
-                score += 30
-                details.append(f"✓ 突破{breakout:.1f}%理想(30分)")
-            elif 8 <= breakout <= 12:
-                score += 25
-                details.append(f"△ 突破{breakout:.1f}%良好(25分)")
-            elif 12 <= breakout <= 15:
-                score += 15
-                details.append(f"⚠ 突破{breakout:.1f}%偏高(15分)")
-            else:
-                score += 5
-                details.append(f"✗ 突破{breakout:.1f}%偏差(5分)")
+            # 1. 突破幅度评分 (30分)；不足3%（含NaN）与超过15%同属"偏差"档
+            breakout = context.breakout_pct
+            rung = bisect_left(BUY3_BREAKOUT_EDGES, breakout) if breakout >= 3 else len(BUY3_BREAKOUT_EDGES)
+            points, template = BUY3_BREAKOUT_RUNGS[rung]
+            score += points
+            if build_details:
+                details.append(template.format(breakout))
             
             # 2. 成交量评分 (20分)
-            vol_ratio = context.get('current_vol', 0) / max(context.get('ma20_vol', 1), 1)
-            if vol_ratio > 2.0:
-                score += 20
-                details.append(f"✓ 大幅放量({vol_ratio:.2f}倍)(20分)")
-            elif vol_ratio > 1.5:
-                score += 16
-                details.append(f"△ 明显放量({vol_ratio:.2f}倍)(16分)")
-            elif vol_ratio > 1.0:
-                score += 10
-                details.append(f"○ 正常放量({vol_ratio:.2f}倍)(10分)")
-            else:
-                score += 3
-                details.append(f"✗ 缩量({vol_ratio:.2f}倍)(3分)")
+            vol_ratio = context.vol_ratio
+            points, template = BUY3_VOLUME_RUNGS[bisect_left(BUY3_VOLUME_EDGES, vol_ratio)]
+            score += points
+            if build_details:
+                details.append(template.format(vol_ratio))
             
             # 3. 形态确认分 (25分)
-            if context.get('is_standard_pattern', False):
+            if context.is_standard_pattern:
                 score += 25
-                details.append("✓ 标准形态(25分)")
-            elif context.get('has_breakout_structure', False):
+                if build_details:
+                    details.append("✓ 标准形态(25分)")
+            elif context.has_breakout_structure:
                 score += 15
-                details.append("△ 有结构(15分)")
+                if build_details:
+                    details.append("△ 有结构(15分)")
             else:
                 score += 8
-                details.append("⚠ 形态一般(8分)")
+                if build_details:
+                    details.append("⚠ 形态一般(8分)")
             
             # 4. 次级别确认 (10分)
-            if context.get('sublevel_confirm', False):
+            if context.sublevel_confirm:
                 score += 10
-                details.append("✓ 次级别(10分)")
+                if build_details:
+                    details.append("✓ 次级别(10分)")
             
             # 5. 盈亏比评估 (10分)
-            distance_to_max = context.get('distance_to_max', 50)
-            if distance_to_max > 30:
-                score += 10
-                details.append("✓ 空间大(10分)")
-            elif distance_to_max > 15:
-                score += 6
-                details.append("△ 空间一般(6分)")
-            else:
-                score += 2
-                details.append("⚠ 接近前高(2分)")
+            distance_to_max = context.distance_to_max
+            points, detail = BUY3_DISTANCE_RUNGS[bisect_left(BUY3_DISTANCE_EDGES, distance_to_max)]
+            score += points
+            if build_details:
+                details.append(detail)
             
             # 6. 市场环境 (5分)
-            trend = context.get('market_trend', 'neutral')
+            trend = context.market_trend
             if trend == 'bull':
                 score += 5
-                details.append("✓ 牛市(5分)")
+                if build_details:
+                    details.append("✓ 牛市(5分)")
             elif trend == 'neutral':
                 score += 3
-                details.append("○ 震荡(3分)")
+                if build_details:
+                    details.append("○ 震荡(3分)")
         
         # ==================== 最终级联评分（门槛已放宽）====================
         # A级: 75分, B级: 60分, C级: 45分
-        if score >= 75:
-            grade = "A"
-            action = "强烈推荐-重仓买入"
-            prob = 0.75
-        elif score >= 60:
-            grade = "B"
-            action = "推荐-适量买入"
-            prob = 0.62
-        elif score >= 45:
-            grade = "C"
-            action = "谨慎-小仓位试探"
-            prob = 0.48
-        elif score >= 30:
-            grade = "D"
-            action = "观望-等待确认"
-            prob = 0.32
-        else:
-            grade = "E"
-            action = "放弃-风险过高"
-            prob = 0.18
+        rung = bisect_right(GRADE_EDGES, score)
         
         return SignalScore(
             total_score=score,
-            grade=grade,
-            action=action,
-            probability=prob,
+            grade=GRADE_LABELS[rung],
+            action=BUY_GRADE_ACTIONS[rung],
+            probability=BUY_GRADE_PROBS[rung],
             details=details
         )
     
-    def score_sell_signal(self, context: Dict) -> SignalScore:
-        """卖出信号评分"""
+    def score_sell_signal(self, context: Union[SignalContext, Dict], build_details: bool = False) -> SignalScore:
+        """卖出信号评分（build_details为True时才生成逐项评分说明）"""
+        context = as_signal_context(context)
         score = 0
         details = []
         
-        breakout = abs(context.get('breakout_pct', 0))
+        breakout = abs(context.breakout_pct)
         if breakout > 5:
             score += 30
-            details.append(f"✓ 强势跌破(30分)")
+            if build_details:
+                details.append(f"✓ 强势跌破(30分)")
         elif breakout > 3:
             score += 25
-            details.append(f"△ 有效跌破(25分)")
+            if build_details:
+                details.append(f"△ 有效跌破(25分)")
         elif breakout > 1.5:
             score += 15
-            details.append(f"○ 跌破(15分)")
+            if build_details:
+                details.append(f"○ 跌破(15分)")
         else:
             score += 8
-            details.append(f"⚠ 微弱跌破(8分)")
+            if build_details:
+                details.append(f"⚠ 微弱跌破(8分)")
         
-        rebound = context.get('rebound_pct', 0)
+        rebound = context.rebound_pct
         if rebound < 1:
             score += 25
-            details.append("✓ 回抽极弱(25分)")
+            if build_details:
+                details.append("✓ 回抽极弱(25分)")
         elif rebound < 2:
             score += 20
-            details.append("△ 回抽较弱(20分)")
+            if build_details:
+                details.append("△ 回抽较弱(20分)")
         elif rebound < 5:
             score += 10
-            details.append("○ 回抽正常(10分)")
-        else:
+            if build_details:
+                details.append("○ 回抽正常(10分)")
+        elif build_details:
             details.append("✗ 回抽过强(0分)")
         
-        vol_ratio = context.get('current_vol', 0) / max(context.get('ma20_vol', 1), 1)
+        vol_ratio = context.vol_ratio
         if vol_ratio > 1.5:
             score += 20
-            details.append("✓ 放量下跌(20分)")
+            if build_details:
+                details.append("✓ 放量下跌(20分)")
         elif vol_ratio > 1.0:
             score += 12
-            details.append("△ 正常(12分)")
-        else:
+            if build_details:
+                details.append("△ 正常(12分)")
+        elif build_details:
             details.append("✗ 缩量(0分)")
         
-        trend = context.get('market_trend', 'neutral')
+        trend = context.market_trend
         if trend == 'bear':
             score += 15
-            details.append("✓ 熊市(15分)")
+            if build_details:
+                details.append("✓ 熊市(15分)")
         elif trend == 'neutral':
             score += 8
-            details.append("○ 震荡(8分)")
-        else:
+            if build_details:
+                details.append("○ 震荡(8分)")
+        elif build_details:
             details.append("✗ 牛市(0分)")
         
-        if context.get('sublevel_confirm'):
+        if context.sublevel_confirm:
             score += 10
-            details.append("✓ 次级别(10分)")
+            if build_details:
+                details.append("✓ 次级别(10分)")
         
-        if score >= 75:
-            grade = "A"
-            action = "强烈推荐-立即卖出"
-            prob = 0.75
-        elif score >= 60:
-            grade = "B"
-            action = "推荐-减仓"
-            prob = 0.62
-        elif score >= 45:
-            grade = "C"
-            action = "谨慎-部分减仓"
-            prob = 0.48
-        elif score >= 30:
-            grade = "D"
-            action = "观望-设置止损"
-            prob = 0.35
-        else:
-            grade = "E"
-            action = "持仓-可能假突破"
-            prob = 0.22
+        rung = bisect_right(GRADE_EDGES, score)
         
         return SignalScore(
             total_score=score,
-            grade=grade,
-            action=action,
-            probability=prob,
+            grade=GRADE_LABELS[rung],
+            action=SELL_GRADE_ACTIONS[rung],
+            probability=SELL_GRADE_PROBS[rung],
             details=details
         )
     
+    def score_buy_signal_batch(self, contexts: Union[Dict[str, np.ndarray], 'pd.DataFrame'],
+                               signal_type: str = '三买') -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        批量买入信号评分：contexts为 {字段: 长度N的数组} 或每行一个候选的DataFrame，字段与SignalContext相同
+        返回 (分数数组int16, 评级编号数组uint8, 预估成功率数组float32)，评级编号对应GRADE_LABELS的下标；
+        不生成说明文字和SignalScore对象，可先用top_k_indices选出前k个，再对选中的个股调用score_buy_signal(build_details=True)
+        """
+        size = _batch_size(contexts)
+        field = lambda key, default: _batch_field(contexts, key, default, size)
+        
+        vol_ratio = _vol_ratio_batch(contexts, size)
+        trend = field('market_trend', 'neutral')
+        sublevel = field('sublevel_confirm', False).astype(bool)
+        
+        if signal_type == '二买':
+            current_price = field('current_price', 0).astype(float)
+            first_buy_low = field('first_buy_low', 0).astype(float) if 'first_buy_low' in contexts else current_price
+            
+            priced = (current_price > 0) & (first_buy_low > 0)
+            broken = priced & ~(current_price > first_buy_low)  # 跌破一买低点，二买不成立
+            scores = np.zeros(size, dtype=np.int16)
+            scores += np.where(priced & (current_price > first_buy_low), 40, 0).astype(np.int16)
+            scores += np.where(vol_ratio < 1.0, 20, 0)
+            scores += np.where(field('has_bottom_fractal', False).astype(bool), 20, 0)
+            
+            # 盈亏比
+            stop_loss = field('stop_loss_price', 0).astype(float) if 'stop_loss_price' in contexts else first_buy_low * 0.98
+            target_price = field('target_price', 0).astype(float) if 'target_price' in contexts else current_price * 1.1
+            risk = current_price - stop_loss
+            with np.errstate(divide='ignore', invalid='ignore'):
+                rr_ratio = (target_price - current_price) / risk
+            rated = (current_price > 0) & (stop_loss > 0) & (risk > 0)
+            scores += np.where(rated & (rr_ratio >= 2), 10, np.where(rated & (rr_ratio >= 1.5), 5, 0))
+            
+            scores += np.where(trend == 'bull', 5, np.where(trend == 'neutral', 3, 0))
+            scores += np.where(sublevel, 5, 0)
+        else:
+            breakout = field('breakout_pct', 0).astype(float)
+            breakout_rung = np.where(breakout >= 3, _rung_batch(BUY3_BREAKOUT_EDGES, breakout), len(BUY3_BREAKOUT_EDGES))
+            scores = BUY3_BREAKOUT_POINTS[breakout_rung].astype(np.int16)
+            scores += BUY3_VOLUME_POINTS[_rung_batch(BUY3_VOLUME_EDGES, vol_ratio)]
+            scores += np.where(field('is_standard_pattern', False).astype(bool), 25,
+                               np.where(field('has_breakout_structure', False).astype(bool), 15, 8))
+            scores += np.where(sublevel, 10, 0)
+            distance = field('distance_to_max', 50).astype(float)
+            scores += BUY3_DISTANCE_POINTS[_rung_batch(BUY3_DISTANCE_EDGES, distance)]
+            scores += np.where(trend == 'bull', 5, np.where(trend == 'neutral', 3, 0))
+        
+        if signal_type == '二买':
+            scores[broken] = 0
+        grades, probs = _grade_batch(scores, BUY_GRADE_PROBS)
+        if signal_type == '二买':
+            probs[broken] = BUY2_BROKEN_PROB
+        return scores, grades, probs
+    
+    def score_sell_signal_batch(self, contexts: Union[Dict[str, np.ndarray], 'pd.DataFrame']) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """批量卖出信号评分，返回 (分数数组int16, 评级编号数组uint8, 预估成功率数组float32)，规则与score_sell_signal相同"""
+        size = _batch_size(contexts)
+        field = lambda key, default: _batch_field(contexts, key, default, size)
+        
+        breakout = np.abs(field('breakout_pct', 0).astype(float))
+        scores = SELL_BREAKOUT_POINTS[_rung_batch(SELL_BREAKOUT_EDGES, breakout)].astype(np.int16)
+        
+        # 回抽：<1 / <2 / <5 / 其余（含NaN）0分，即 bisect_right 档位
+        rebound = field('rebound_pct', 0).astype(float)
+        scores += SELL_REBOUND_POINTS[np.searchsorted(SELL_REBOUND_EDGES, rebound, side='right')]
+        
+        vol_ratio = _vol_ratio_batch(contexts, size)
+        scores += np.where(vol_ratio > 1.5, 20, np.where(vol_ratio > 1.0, 12, 0))
+        
+        trend = field('market_trend', 'neutral')
+        scores += np.where(trend == 'bear', 15, np.where(trend == 'neutral', 8, 0))
+        scores += np.where(field('sublevel_confirm', False).astype(bool), 10, 0)
+        
+        return (scores, *_grade_batch(scores, SELL_GRADE_PROBS))
+    
     def check_sublevel_confirm(self, code: str, signal_type: str, 
                                daily_zhongshu: Dict, daily_price: float) -> Tuple[bool, str]:
         """检查次级别确认"""
@@ -13,11 +13,29 @@
 """
 
 import re
-from typing import Dict, List, Optional
+import sys
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+# 尝试导入pyahocorasick做多关键字单遍预筛（不可用时逐个模式匹配）
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 
-@dataclass
+# 尝试导入hyperscan，把全部模式编译成一个数据库单遍扫描（优先于pyahocorasick预筛）
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# 诊断结果只读：frozen=True；Python 3.10+ 再加slots=True，实例不带__dict__
+# （ErrorDiagnosis字段有默认值，不能像chanlun_optimizer.SignalScore那样手写__slots__）
+_DATACLASS_OPTIONS = {'frozen': True, 'slots': True} if sys.version_info >= (3, 10) else {'frozen': True}
+
+
+@dataclass(**_DATACLASS_OPTIONS)
 class ErrorDiagnosis:
     """错误诊断结果"""
     error_type: str
@@ -28,19 +46,25 @@ class ErrorDiagnosis:
     line_hint: Optional[int] = None
 
 
-@dataclass
+@dataclass(**_DATACLASS_OPTIONS)
 class FixSuggestion:
     """修复建议"""
     priority: int  # 1-10, 越高越优先
     description: str
     code_example: str
-    files_to_check: List[str]
+    files_to_check: Tuple[str, ...]
+    code_lines: Tuple[str, ...]  # code_example去掉首尾空白后按行拆分，渲染报告时直接逐行输出
+
+
+# 报告分隔线
+_SEP = "=" * 80
 
 
 class ErrorDiagnoser:
     """错误诊断器"""
     
     # 缠论系统中常见的错误模式
+    # keyword: 模式匹配时必然出现的小写字面片段，用于Aho-Corasick预筛
     ERROR_PATTERNS = {
         # IndexError 模式
         r"IndexError.*out of bounds.*axis.*size": {
@@ -48,11 +72,12 @@ class ErrorDiagnoser:
             "severity": "high",
             "description": "数组/列表索引越界",
             "likely_cause": "numpy/pandas 切片操作时索引超出范围",
+            "keyword": "out of bounds",
             "common_locations": [
                 "handle_inclusion() - K线包含处理",
                 "find_strokes() - 找笔函数", 
                 "calculate_macd() - MACD计算",
-                "check_divergence() - 背驰判断"
+                "analyze_signals() - 背驰与卖点判断"
             ]
         },
         
@@ -61,6 +86,7 @@ class ErrorDiagnoser:
             "severity": "high", 
             "description": "列表索引越界",
             "likely_cause": "访问strokes列表时索引超出范围",
+            "keyword": "list index out of range",
             "common_locations": [
                 "find_strokes() - 笔列表访问",
                 "analyze_stock() - 信号判断"
@@ -73,6 +99,7 @@ class ErrorDiagnoser:
             "severity": "medium",
             "description": "DataFrame缺少pinyin列",
             "likely_cause": "get_all_stocks()未正确添加拼音列",
+            "keyword": "'pinyin'",
             "common_locations": [
                 "search_stocks() - 搜索函数",
                 "get_all_stocks() - 股票列表获取"
@@ -84,6 +111,7 @@ class ErrorDiagnoser:
             "severity": "medium",
             "description": "DataFrame缺少价格列",
             "likely_cause": "列名大小写不匹配或数据未正确加载",
+            "keyword": "keyerror",
             "common_locations": [
                 "handle_inclusion() - K线处理",
                 "calculate_zhongshu() - 中枢计算"
@@ -96,6 +124,7 @@ class ErrorDiagnoser:
             "severity": "critical",
             "description": "找不到chanlun_optimizer模块",
             "likely_cause": "模块文件未提交到GitHub",
+            "keyword": "chanlun_optimizer",
             "common_locations": [
                 "app.py - import语句"
             ]
@@ -106,6 +135,7 @@ class ErrorDiagnoser:
             "severity": "critical",
             "description": "缺少核心依赖包",
             "likely_cause": "requirements.txt未包含该依赖",
+            "keyword": "modulenotfounderror",
             "common_locations": [
                 "requirements.txt"
             ]
@@ -117,6 +147,7 @@ class ErrorDiagnoser:
             "severity": "high",
             "description": "空对象调用方法",
             "likely_cause": "函数返回None但继续调用方法",
+            "keyword": "'nonetype'",
             "common_locations": [
                 "get_daily() - 数据获取",
                 "analyze_stock() - 分析结果处理"
@@ -129,12 +160,21 @@ class ErrorDiagnoser:
             "severity": "medium",
             "description": "数据长度不匹配",
             "likely_cause": "DataFrame拼接时列数不一致",
+            "keyword": "length mismatch",
             "common_locations": [
                 "数据预处理部分"
             ]
         }
     }
     
+    # 类定义时一次性编译各模式（带IGNORECASE），诊断时直接调用已编译对象的search
+    _COMPILED_PATTERNS = [(re.compile(pattern, re.IGNORECASE), info) for pattern, info in ERROR_PATTERNS.items()]
+    # 全部模式合并成一个交替式，一次search找出最靠前的命中（分组名p<序号>对应模式序号）
+    _FUSED_PATTERN = re.compile("|".join(f"(?P<p{index}>{pattern})" for index, pattern in enumerate(ERROR_PATTERNS)),
+                                re.IGNORECASE)
+    # traceback中的 File "path", line X
+    _LOCATION_RE = re.compile(r'File "([^"]+)", line (\d+)')
+    
     @classmethod
     def diagnose(cls, error_message: str, traceback: str = "") -> ErrorDiagnosis:
         """
@@ -149,9 +189,9 @@ class ErrorDiagnoser:
         """
         error_message = error_message.strip()
         
-        # 匹配错误模式
-        for pattern, info in cls.ERROR_PATTERNS.items():
-            if re.search(pattern, error_message, re.IGNORECASE):
+        # 匹配错误模式（只对预筛命中的模式做正则确认，仍按ERROR_PATTERNS的顺序取第一个）
+        for compiled, info in cls._candidate_patterns(error_message):
+            if compiled.search(error_message):
                 # 尝试从traceback中提取文件和行号
                 file_hint, line_hint = cls._extract_location(traceback)
                 
@@ -174,21 +214,82 @@ class ErrorDiagnoser:
             line_hint=None
         )
     
+    @classmethod
+    def _candidate_patterns(cls, error_message: str) -> list:
+        """
+        预筛：一遍扫描找出可能命中的模式
+        有hyperscan时一遍扫描得到所有命中的模式；其次有pyahocorasick时按关键字筛选；否则用合并交替式search一次：命中第index个模式时，
+        排在它前面的模式仍可能在更靠后的位置命中，因此候选为前index个模式中关键字出现过的，再加上第index个（无命中则为空）
+        """
+        if _HYPERSCAN_DATABASE is not None:
+            hits = set()
+            _HYPERSCAN_DATABASE.scan(error_message.encode('utf-8', 'replace'),
+                                     match_event_handler=lambda pattern_id, *_: hits.add(pattern_id))
+            return [cls._COMPILED_PATTERNS[index] for index in sorted(hits)]
+        
+        if _KEYWORD_AUTOMATON is None:
+            match = cls._FUSED_PATTERN.search(error_message)
+            if match is None:
+                return []
+            index = int(match.lastgroup[1:])
+            lowered = error_message.lower()
+            candidates = [item for item in cls._COMPILED_PATTERNS[:index] if item[1]["keyword"] in lowered]
+            candidates.append(cls._COMPILED_PATTERNS[index])
+            return candidates
+        
+        hits = {index for _, index in _KEYWORD_AUTOMATON.iter(error_message.lower())}
+        return [cls._COMPILED_PATTERNS[index] for index in sorted(hits)]
+    
     @classmethod
     def _extract_location(cls, traceback: str) -> tuple:
         """从traceback中提取文件路径和行号"""
         if not traceback:
             return None, None
             
-        # 匹配 File "path", line X
-        pattern = r'File "([^"]+)", line (\d+)'
-        matches = re.findall(pattern, traceback)
-        
-        if matches:
-            # 返回最后一个匹配（通常是用户代码）
-            return matches[-1][0], int(matches[-1][1])
-        
-        return None, None
+        # 取最后一个匹配（通常是用户代码）：从末尾往前找 File " 的位置逐个尝试，不收集全部帧
+        end = len(traceback)
+        while True:
+            start = traceback.rfind('File "', 0, end)
+            if start < 0:
+                return None, None
+            match = cls._LOCATION_RE.match(traceback, start)
+            if match:
+                return match.group(1), int(match.group(2))
+            end = start
+
+
+def _build_keyword_automaton():
+    """导入时把各模式的关键字建成一个Aho-Corasick自动机，值为模式在ERROR_PATTERNS中的序号"""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for index, (_, info) in enumerate(ErrorDiagnoser._COMPILED_PATTERNS):
+        automaton.add_word(info["keyword"], index)
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_hyperscan_database():
+    """导入时把ERROR_PATTERNS编译成hyperscan块扫描数据库，模式序号作为id；编译失败则不用hyperscan"""
+    if hyperscan is None:
+        return None
+    
+    patterns = list(ErrorDiagnoser.ERROR_PATTERNS)
+    flags = hyperscan.HS_FLAG_CASELESS | hyperscan.HS_FLAG_UTF8 | hyperscan.HS_FLAG_SINGLEMATCH
+    try:
+        database = hyperscan.Database()
+        database.compile(expressions=[pattern.encode('utf-8') for pattern in patterns],
+                         ids=list(range(len(patterns))), elements=len(patterns),
+                         flags=[flags] * len(patterns))
+    except hyperscan.error as e:
+        print(f"hyperscan编译错误模式失败: {e}")
+        return None
+    return database
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+_HYPERSCAN_DATABASE = _build_hyperscan_database()
 
 
 class FixSuggester:
@@ -303,41 +404,33 @@ git push origin master
         Returns:
             FixSuggestion 列表（按优先级排序）
         """
-        suggestions = []
-        
-        if diagnosis.error_type == "IndexError":
-            # IndexError 主要修复方案
-            suggestions.append(cls.FIX_TEMPLATES["IndexError"]["bounds_check"])
-            suggestions.append(cls.FIX_TEMPLATES["IndexError"]["dataframe_slicing"])
-            
-        elif diagnosis.error_type == "KeyError":
-            # KeyError 主要修复方案
-            suggestions.append(cls.FIX_TEMPLATES["KeyError"]["column_check"])
-            
-        elif diagnosis.error_type == "ModuleNotFoundError":
-            # ModuleNotFoundError 主要修复方案
-            suggestions.append(cls.FIX_TEMPLATES["ModuleNotFoundError"]["add_requirements"])
-            suggestions.append(cls.FIX_TEMPLATES["ModuleNotFoundError"]["git_add"])
-        
-        # 转换为 FixSuggestion 对象
-        result = []
-        for key, template in suggestions:
-            if isinstance(template, dict):
-                result.append(FixSuggestion(
-                    priority=template["priority"],
-                    description=template["description"],
-                    code_example=template["code_example"],
-                    files_to_check=template["files_to_check"]
-                ))
+        # 修复建议只取决于错误类型，同类错误直接复用缓存
+        return list(cls._suggest_for_type(diagnosis.error_type))
+    
+    @classmethod
+    @lru_cache(maxsize=16)
+    def _suggest_for_type(cls, error_type: str) -> Tuple[FixSuggestion, ...]:
+        """按错误类型生成修复建议（该类型在FIX_TEMPLATES中的全部方案），按优先级从高到低排序；代码示例在这里一次性拆成行"""
+        result = [
+            FixSuggestion(
+                priority=template["priority"],
+                description=template["description"],
+                code_example=template["code_example"],
+                files_to_check=tuple(template["files_to_check"]),
+                code_lines=tuple(template["code_example"].strip().split('\n'))
+            )
+            for template in cls.FIX_TEMPLATES.get(error_type, {}).values()
+        ]
         
         # 按优先级排序
         result.sort(key=lambda x: x.priority, reverse=True)
-        return result
+        return tuple(result)
 
 
+@lru_cache(maxsize=128)
 def diagnose_error(error_message: str, traceback: str = "") -> str:
     """
-    便捷函数：诊断错误并返回可读报告
+    便捷函数：诊断错误并返回可读报告（同样的错误信息和堆栈直接返回缓存的报告）
     
     用法:
         report = diagnose_error(error_msg, traceback)
@@ -346,34 +439,31 @@ def diagnose_error(error_message: str, traceback: str = "") -> str:
     diagnosis = ErrorDiagnoser.diagnose(error_message, traceback)
     suggestions = FixSuggester.suggest(diagnosis)
     
-    report = []
-    report.append("=" * 80)
-    report.append("🔍 错误诊断报告")
-    report.append("=" * 80)
-    report.append(f"错误类型: {diagnosis.error_type}")
-    report.append(f"严重程度: {diagnosis.severity}")
-    report.append(f"问题描述: {diagnosis.description}")
-    report.append(f"可能原因: {diagnosis.likely_cause}")
-    
-    if diagnosis.file_hint:
-        report.append(f"问题位置: {diagnosis.file_hint}:{diagnosis.line_hint}")
-    
-    report.append("")
-    report.append("=" * 80)
-    report.append("🔧 修复建议（按优先级排序）")
-    report.append("=" * 80)
-    
-    for i, sug in enumerate(suggestions, 1):
-        report.append(f"\n{i}. [优先级{ sug.priority}] {sug.description}")
-        report.append(f"   需要检查的文件: {', '.join(sug.files_to_check)}")
-        report.append(f"   代码示例:")
-        for line in sug.code_example.strip().split('\n'):
-            report.append(f"   {line}")
-    
-    report.append("")
-    report.append("=" * 80)
+    location = f"问题位置: {diagnosis.file_hint}:{diagnosis.line_hint}\n" if diagnosis.file_hint else ""
+    body = "".join(_render_suggestion(i, sug) for i, sug in enumerate(suggestions, 1))
     
-    return "\n".join(report)
+    return (
+        f"{_SEP}\n🔍 错误诊断报告\n{_SEP}\n"
+        f"错误类型: {diagnosis.error_type}\n"
+        f"严重程度: {diagnosis.severity}\n"
+        f"问题描述: {diagnosis.description}\n"
+        f"可能原因: {diagnosis.likely_cause}\n"
+        f"{location}"
+        f"\n{_SEP}\n🔧 修复建议（按优先级排序）\n{_SEP}\n"
+        f"{body}"
+        f"\n{_SEP}"
+    )
+
+
+def _render_suggestion(index: int, sug: FixSuggestion) -> str:
+    """单条修复建议的报告片段（以空行开头，代码示例每行缩进3格）"""
+    code = "\n".join(f"   {line}" for line in sug.code_lines)
+    return (
+        f"\n{index}. [优先级{sug.priority}] {sug.description}\n"
+        f"   需要检查的文件: {', '.join(sug.files_to_check)}\n"
+        f"   代码示例:\n"
+        f"{code}\n"
+    )
 
 
 # 便捷函数
@@ -381,21 +471,22 @@ def quick_fix_indexerror(file_path: str, line_num: int, context: str = "") -> st
     """
     快速生成 IndexError 修复代码
     """
-    return f''"
+    fallback = context if context else "return None  # 或适当处理"
+    return f"""
 # 在 {file_path}:{line_num} 附近添加边界检查
 
 # 如果访问列表/数组
 if index < len(your_list):
     value = your_list[index]
 else:
-    logger.warning(f"索引越界: {index} >= {len(your_list)}")
-    {context if context else "return None  # 或适当处理"}
+    logger.warning(f"索引越界: {{index}} >= {{len(your_list)}}")
+    {fallback}
 
 # 如果访问DataFrame
 if len(df) > required_min_rows:
     result = df.iloc[index]
 else:
-    logger.warning(f"数据不足: {len(df)} rows")
+    logger.warning(f"数据不足: {{len(df)}} rows")
     return None
 """
 
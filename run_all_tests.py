@@ -22,52 +22,61 @@ import argparse
 import sys
 import asyncio
 from datetime import datetime
+from typing import NamedTuple
 
 # 导入测试模块
 from test_chanlun_auto import ChanLunTester, quick_test
 from error_diagnosis import diagnose_error
 
 
-def run_diagnosis_only():
-    """仅运行错误诊断（用于已有错误日志的情况）"""
-    print("=" * 80)
-    print("🔍 缠论系统错误诊断模式")
-    print("=" * 80)
-    
-    # 常见错误模式示例
-    common_errors = [
-        {
-            "name": "IndexError - 数组越界",
-            "error": "IndexError: index 10 is out of bounds for axis 0 with size 5",
-            "traceback": '''
+class CommonError(NamedTuple):
+    """诊断模式下可直接选择的常见错误示例"""
+    name: str
+    error: str
+    traceback: str
+
+
+# 常见错误模式示例（模块级常量，诊断模式每次运行不再重新构建）
+_COMMON_ERRORS = (
+    CommonError(
+        name="IndexError - 数组越界",
+        error="IndexError: index 10 is out of bounds for axis 0 with size 5",
+        traceback='''
 File "/app/chanlun_optimizer.py", line 45, in calculate_atr
     return tr.rolling(window=period).mean().iloc[-1]
 IndexError: index -1 is out of bounds for axis 0 with size 0
             '''
-        },
-        {
-            "name": "KeyError - 缺少pinyin列", 
-            "error": "KeyError: 'pinyin'",
-            "traceback": '''
+    ),
+    CommonError(
+        name="KeyError - 缺少pinyin列",
+        error="KeyError: 'pinyin'",
+        traceback='''
 File "/app/app.py", line 384, in search_stocks
     pinyin_match = stock_df[stock_df['pinyin'].str.startswith(query)]
 KeyError: 'pinyin'
             '''
-        },
-        {
-            "name": "ModuleNotFoundError - 缺少模块",
-            "error": "ModuleNotFoundError: No module named 'chanlun_optimizer'",
-            "traceback": '''
+    ),
+    CommonError(
+        name="ModuleNotFoundError - 缺少模块",
+        error="ModuleNotFoundError: No module named 'chanlun_optimizer'",
+        traceback='''
 File "/app/app.py", line 25, in <module>
     from chanlun_optimizer import ChanLunOptimizer
 ModuleNotFoundError: No module named 'chanlun_optimizer'
             '''
-        }
-    ]
+    ),
+)
+
+
+def run_diagnosis_only():
+    """仅运行错误诊断（用于已有错误日志的情况）"""
+    print("=" * 80)
+    print("🔍 缠论系统错误诊断模式")
+    print("=" * 80)
     
     print("\n请选择要诊断的错误类型（或输入自定义错误）:")
-    for i, err in enumerate(common_errors, 1):
-        print(f"  {i}. {err['name']}")
+    for i, err in enumerate(_COMMON_ERRORS, 1):
+        print(f"  {i}. {err.name}")
     print("  4. 输入自定义错误")
     print("  5. 退出")
     
@@ -81,10 +90,10 @@ ModuleNotFoundError: No module named 'chanlun_optimizer'
             traceback = input("请输入堆栈跟踪（可选，直接回车跳过）: ").strip()
             print("\n" + diagnose_error(error_msg, traceback))
         elif choice in ["1", "2", "3"]:
-            err = common_errors[int(choice)-1]
-            print(f"\n诊断: {err['name']}")
+            err = _COMMON_ERRORS[int(choice)-1]
+            print(f"\n诊断: {err.name}")
             print("=" * 80)
-            print(diagnose_error(err['error'], err['traceback']))
+            print(diagnose_error(err.error, err.traceback))
         else:
             print("无效选择")
             
@@ -113,7 +122,12 @@ def run_full_test_suite(url: str, headless: bool = True) -> bool:
         print("🔍 自动错误诊断")
         print("=" * 80)
         
-        for i, error in enumerate(result["errors"][:3], 1):  # 只诊断前3个错误
+        # 同样的错误只诊断一次（保持首次出现的顺序），只诊断前3个不同的错误
+        unique_errors = list(dict.fromkeys(result["errors"]))
+        if len(unique_errors) < len(result["errors"]):
+            print(f"共 {len(result['errors'])} 个错误，去重后 {len(unique_errors)} 个")
+        
+        for i, error in enumerate(unique_errors[:3], 1):
             print(f"\n错误 {i}:")
             print(diagnose_error(error))
     
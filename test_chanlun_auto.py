@@ -7,33 +7,261 @@
 用法:
     python test_chanlun_auto.py
     python test_chanlun_auto.py --url https://your-app.streamlit.app
+    python test_chanlun_auto.py --url http://localhost:8501 https://your-app.streamlit.app  # 多个地址同时快速测试
     python test_chanlun_auto.py --full  # 完整测试模式
+    python test_chanlun_auto.py --full --url URL1 URL2  # 多个地址并行完整测试（共用浏览器池）
+    python test_chanlun_auto.py setup   # 安装Playwright及浏览器
 """
 
 import asyncio
 import sys
 import argparse
+import zipfile
+import hashlib
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional
 
 try:
-    from playwright.async_api import async_playwright, Page, Browser
+    from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
 except ImportError:
-    print("⚙️ Playwright 未安装，正在自动安装...")
-    import subprocess
-    subprocess.run([sys.executable, "-m", "pip", "install", "playwright"], check=True)
-    subprocess.run([sys.executable, "-m", "playwright", "install"], check=True)
-    from playwright.async_api import async_playwright, Page, Browser
+    # 导入时不再自动安装，需要时手动执行 python test_chanlun_auto.py setup
+    async_playwright = Page = Browser = PlaywrightTimeoutError = None
+
+
+# Chromium启动参数（容器/CI环境下避免/dev/shm过小和GPU初始化开销，关闭测试用不到的扩展、音频和自动化特征）
+LAUNCH_ARGS = [
+    "--disable-dev-shm-usage",
+    "--disable-gpu",
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-extensions",
+    "--mute-audio",
+]
+# 测试只检查DOM文本，这些类型的请求直接拦截，减少页面加载的流量和等待
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media"})
+# 在页面内一次取出所有匹配元素的文本（代替逐个元素await inner_text）
+ALL_INNER_TEXTS_JS = "elements => elements.map(element => element.innerText)"
+# 静态资源与登录态缓存目录：Streamlit的js/css/字体文件名带hash，命中后直接从本地返回，重复运行不再下载
+PW_CACHE_DIR = Path(".pwcache")
+STORAGE_STATE_FILE = PW_CACHE_DIR / "state.json"
+CACHED_ASSET_SUFFIXES = (".js", ".css", ".woff2")
+# 批量快速测试时同时打开的页面数上限（也是浏览器池的默认大小）
+MAX_BROWSER_CONTEXTS = 4
+# 浏览器池中单个Chromium最多服务的测试次数和最长存活时间，超过后关闭重启，避免长时间运行内存膨胀
+MAX_PAGES_PER_BROWSER = 20
+MAX_BROWSER_AGE_SECONDS = 600
+
+
+@dataclass
+class BrowserInstance:
+    """浏览器池中的一个Chromium实例"""
+    browser: Browser
+    launched_at: float
+    pages_served: int = 0
+    
+    def expired(self, max_pages: int, max_age_seconds: float) -> bool:
+        return self.pages_served >= max_pages or time.monotonic() - self.launched_at >= max_age_seconds
+
+
+class BrowserPool:
+    """
+    预热的Chromium浏览器池：最多同时借出size个浏览器（Semaphore控制），
+    归还后留给下一个测试复用；服务次数或存活时间超限的实例在下次借出前重启
+    """
+    
+    def __init__(self, size: int = MAX_BROWSER_CONTEXTS, headless: bool = True,
+                 max_pages_per_browser: int = MAX_PAGES_PER_BROWSER,
+                 max_age_seconds: float = MAX_BROWSER_AGE_SECONDS):
+        self.size = size
+        self.headless = headless
+        self.max_pages_per_browser = max_pages_per_browser
+        self.max_age_seconds = max_age_seconds
+        self._semaphore = asyncio.Semaphore(size)
+        self._idle: List[BrowserInstance] = []
+        self._playwright = None
+    
+    async def start(self):
+        """启动Playwright（浏览器在第一次借出时才启动，地址少于池大小时不会多开）"""
+        if self._playwright is not None:
+            return
+        if async_playwright is None:
+            raise RuntimeError("Playwright 未安装，请先运行: python test_chanlun_auto.py setup")
+        self._playwright = await async_playwright().start()
+    
+    async def _launch(self) -> BrowserInstance:
+        browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        return BrowserInstance(browser=browser, launched_at=time.monotonic())
+    
+    async def acquire(self) -> BrowserInstance:
+        """借出一个浏览器（池中都被占用时等待）"""
+        await self.start()
+        await self._semaphore.acquire()
+        try:
+            instance = self._idle.pop() if self._idle else None
+            if instance is not None and instance.expired(self.max_pages_per_browser, self.max_age_seconds):
+                await instance.browser.close()
+                instance = None
+            if instance is None:
+                instance = await self._launch()
+        except BaseException:
+            self._semaphore.release()
+            raise
+        instance.pages_served += 1
+        return instance
+    
+    def release(self, instance: BrowserInstance):
+        """归还浏览器"""
+        self._idle.append(instance)
+        self._semaphore.release()
+    
+    @asynccontextmanager
+    async def browser(self):
+        """async with pool.browser() as browser: 借出并在结束时归还"""
+        instance = await self.acquire()
+        try:
+            yield instance.browser
+        finally:
+            self.release(instance)
+    
+    async def stop(self):
+        """关闭池中所有浏览器和Playwright"""
+        for instance in self._idle:
+            await instance.browser.close()
+        self._idle.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
 
 
 class ChanLunTester:
-    """缠论系统自动化测试器"""
+    """
+    缠论系统自动化测试器（Playwright、浏览器和BrowserContext在start()中创建一次，各测试共用）
+    传入browser（如从BrowserPool借出）时只在其上创建BrowserContext，stop()也不会关闭该浏览器
+    """
     
-    def __init__(self, url: str = "http://localhost:8501", headless: bool = True):
+    def __init__(self, url: str = "http://localhost:8501", headless: bool = True,
+                 block_resources: bool = True, use_cache: bool = True,
+                 browser: Optional[Browser] = None):
         self.url = url
         self.headless = headless
+        self.block_resources = block_resources  # 是否拦截图片/字体/音视频请求（需要截图保留图片时传False）
+        self.use_cache = use_cache  # 是否复用 PW_CACHE_DIR 中的静态资源和storage_state
         self.results = []
         self.errors = []
+        self.console_errors = []
+        self._playwright = None
+        self._browser: Optional[Browser] = browser
+        self._owns_browser = browser is None
+        self._context = None
+        # 本次运行的截图统一写入一个zip（第一次截图时创建）
+        self.screenshot_archive: Optional[str] = None
+        self._screenshot_zip: Optional[zipfile.ZipFile] = None
+    
+    async def start(self):
+        """启动Playwright和Chromium，创建共用的BrowserContext（已启动时直接返回）"""
+        if self._context is not None:
+            return
+        if async_playwright is None:
+            raise RuntimeError("Playwright 未安装，请先运行: python test_chanlun_auto.py setup")
+        if self._owns_browser:
+            self._playwright = await async_playwright().start()
+            self._browser = await self._playwright.chromium.launch(headless=self.headless, args=LAUNCH_ARGS)
+        storage_state = str(STORAGE_STATE_FILE) if self.use_cache and STORAGE_STATE_FILE.exists() else None
+        self._context = await self._browser.new_context(viewport={'width': 1920, 'height': 1080},
+                                                        storage_state=storage_state)
+        if self.block_resources or self.use_cache:
+            await self._context.route("**/*", self._route_request)
+    
+    async def _route_request(self, route):
+        """拦截BLOCKED_RESOURCE_TYPES类型的请求；js/css/woff2优先从本地缓存返回，其余照常发出"""
+        request = route.request
+        if self.block_resources and request.resource_type in BLOCKED_RESOURCE_TYPES:
+            await route.abort()
+            return
+        url_path = request.url.split("?", 1)[0]
+        if not (self.use_cache and request.method == "GET" and url_path.endswith(CACHED_ASSET_SUFFIXES)):
+            await route.continue_()
+            return
+        
+        # 开启route后浏览器自身的HTTP缓存失效，这里按URL落盘代替（后缀保留，fulfill据此推断Content-Type）
+        cache_file = PW_CACHE_DIR / (hashlib.sha1(request.url.encode()).hexdigest() + Path(url_path).suffix)
+        if cache_file.exists():
+            await route.fulfill(path=cache_file)
+            return
+        try:
+            response = await route.fetch()
+        except Exception as e:
+            print(f"⚠️ 静态资源请求失败: {e}")
+            await route.abort()
+            return
+        if response.ok:
+            try:
+                PW_CACHE_DIR.mkdir(exist_ok=True)
+                cache_file.write_bytes(await response.body())
+            except OSError as e:
+                print(f"⚠️ 写入静态资源缓存失败: {e}")
+        await route.fulfill(response=response)
+    
+    async def stop(self):
+        """关闭BrowserContext、浏览器和Playwright（外部传入的浏览器不关闭），并写完截图zip"""
+        if self._screenshot_zip is not None:
+            self._screenshot_zip.close()
+            self._screenshot_zip = None
+        if self._context is not None:
+            if self.use_cache:
+                try:
+                    PW_CACHE_DIR.mkdir(exist_ok=True)
+                    await self._context.storage_state(path=str(STORAGE_STATE_FILE))
+                except Exception as e:
+                    print(f"⚠️ 保存storage_state失败: {e}")
+            await self._context.close()
+            self._context = None
+        if not self._owns_browser:
+            return
+        if self._browser is not None:
+            await self._browser.close()
+        if self._playwright is not None:
+            await self._playwright.stop()
+        self._playwright = self._browser = None
+    
+    async def new_page(self) -> Page:
+        """在共用的BrowserContext中新开一个页面（未启动时先启动），并监听控制台错误和页面未捕获异常"""
+        await self.start()
+        page = await self._context.new_page()
+        page.on("console", self._on_console)
+        page.on("pageerror", self._on_page_error)
+        return page
+    
+    def _on_console(self, message):
+        """收集控制台error级别的消息（被拦截的图片/字体请求产生的加载失败不算）"""
+        if message.type != "error":
+            return
+        if self.block_resources and "net::ERR_FAILED" in message.text:
+            return
+        self.console_errors.append(message.text)
+    
+    def _on_page_error(self, error):
+        """页面JS未捕获异常直接记为错误"""
+        self.errors.append(f"JS: {error}")
+    
+    async def __aenter__(self):
+        await self.start()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
         
     async def run_full_test(self) -> Dict:
         """运行完整测试套件"""
@@ -43,35 +271,36 @@ class ChanLunTester:
         print(f"⏰ 开始时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 80)
         
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            page = await browser.new_page(viewport={'width': 1920, 'height': 1080})
+        # 调用方已启动（如复用同一个测试器）时不在这里关闭浏览器
+        owns_browser = self._context is None
+        page = await self.new_page()
+        try:
+            # 1. 基础页面加载测试
+            await self.test_page_load(page)
             
-            try:
-                # 1. 基础页面加载测试
-                await self.test_page_load(page)
-                
-                # 2. UI 元素检测
-                await self.test_ui_elements(page)
-                
-                # 3. 股票搜索功能
-                await self.test_stock_search(page)
-                
-                # 4. 分析功能测试（重点）
-                await self.test_analysis_function(page)
-                
-                # 5. 侧边栏功能
-                await self.test_sidebar_features(page)
-                
-                # 6. 错误捕获检查
-                await self.check_for_errors(page)
-                
-            except Exception as e:
-                self.errors.append(f"测试执行异常: {str(e)}")
-                await self.capture_screenshot(page, "error_final")
-                
-            finally:
-                await browser.close()
+            # 2. UI 元素检测
+            await self.test_ui_elements(page)
+            
+            # 3. 股票搜索功能
+            await self.test_stock_search(page)
+            
+            # 4. 分析功能测试（重点）
+            await self.test_analysis_function(page)
+            
+            # 5. 侧边栏功能
+            await self.test_sidebar_features(page)
+            
+            # 6. 错误捕获检查
+            await self.check_for_errors(page)
+            
+        except Exception as e:
+            self.errors.append(f"测试执行异常: {str(e)}")
+            await self.capture_screenshot(page, "error_final", full_page=True)
+            
+        finally:
+            await page.close()
+            if owns_browser:
+                await self.stop()
         
         # 生成测试报告
         return self.generate_report()
@@ -81,7 +310,8 @@ class ChanLunTester:
         print("\n📌 测试1: 页面加载")
         try:
             await page.goto(self.url, wait_until="networkidle", timeout=30000)
-            await page.wait_for_timeout(3000)  # 等待 Streamlit 渲染
+            # 等待 Streamlit 渲染出标题（或报错）
+            await self.wait_for_render(page, "h1, .stException", timeout=15000)
             
             # 检查标题
             title = await page.title()
@@ -102,27 +332,36 @@ class ChanLunTester:
         
         elements_to_check = [
             ("标题", "h1", "缠论选股系统"),
-            ("分析配置侧边栏", "text=分析配置"),
-            ("股票池选择", "text=股票池选择方式"),
+            ("分析配置侧边栏", "text", "分析配置"),
+            ("股票池选择", "text", "股票池选择方式"),
             ("开始分析按钮", "button", "开始分析"),
         ]
         
-        for name, selector_type, selector_value in elements_to_check:
-            try:
-                if selector_type == "h1":
-                    element = await page.wait_for_selector(f"h1:has-text('{selector_value}')", timeout=5000)
-                elif selector_type == "button":
-                    element = await page.get_by_role("button", name=selector_value).first
-                else:
-                    element = await page.wait_for_selector(f"text={selector_value}", timeout=5000)
-                
-                if element:
-                    self.log_pass(f"元素存在: {name}")
-                else:
-                    self.log_fail(f"元素缺失: {name}")
-                    
-            except Exception as e:
-                self.log_fail(f"元素检测失败: {name}", str(e))
+        # 各元素互不依赖，同时等待：最坏情况只等一个超时，而不是每个元素各等一次
+        probes = await asyncio.gather(
+            *(self._probe_element(page, selector_type, selector_value)
+              for _, selector_type, selector_value in elements_to_check),
+            return_exceptions=True
+        )
+        
+        for (name, _, _), element in zip(elements_to_check, probes):
+            if isinstance(element, Exception):
+                self.log_fail(f"元素检测失败: {name}", str(element))
+            elif element:
+                self.log_pass(f"元素存在: {name}")
+            else:
+                self.log_fail(f"元素缺失: {name}")
+    
+    async def _probe_element(self, page: Page, selector_type: str, selector_value: str):
+        """等待单个UI元素出现，返回找到的元素（按钮返回Locator）"""
+        if selector_type == "h1":
+            return await page.wait_for_selector(f"h1:has-text('{selector_value}')", timeout=5000)
+        elif selector_type == "button":
+            button = page.get_by_role("button", name=selector_value).first
+            await button.wait_for(timeout=5000)
+            return button
+        else:
+            return await page.wait_for_selector(f"text={selector_value}", timeout=5000)
     
     async def test_stock_search(self, page: Page):
         """测试股票搜索功能"""
@@ -130,20 +369,21 @@ class ChanLunTester:
         
         try:
             # 切换到自定义股票池
-            radio = await page.get_by_label("自定义股票池").first
-            if radio:
+            radio = page.get_by_label("自定义股票池").first
+            if await radio.count():
                 await radio.click()
-                await page.wait_for_timeout(500)
+                await self.wait_for_render(page, "[data-testid='stTextInput']")
             
             # 搜索股票输入框
-            search_input = await page.get_by_placeholder("搜索股票").first
-            if search_input:
+            search_input = page.get_by_placeholder("搜索股票").first
+            if await search_input.count():
                 await search_input.fill("贵州茅台")
-                await page.wait_for_timeout(1500)  # 等待搜索结果
+                # 等待搜索结果
+                await self.wait_for_render(page, "[data-testid='stMarkdownContainer']:has-text('贵州茅台')")
                 
                 # 检查搜索结果
-                search_results = await page.query_selector_all("[data-testid='stMarkdownContainer']")
-                if search_results:
+                search_count = await page.locator("[data-testid='stMarkdownContainer']").count()
+                if search_count:
                     self.log_pass("股票搜索功能正常", "找到搜索结果")
                 else:
                     self.log_warn("股票搜索无结果")
@@ -161,44 +401,45 @@ class ChanLunTester:
         
         try:
             # 选择板块扫描模式
-            radio = await page.get_by_label("板块自动扫描").first
-            if radio:
+            radio = page.get_by_label("板块自动扫描").first
+            if await radio.count():
                 await radio.click()
-                await page.wait_for_timeout(500)
+                await self.wait_for_render(page, "button:has-text('获取成分股')")
             
             # 选择一个小板块进行测试（避免数据量过大）
-            select = await page.get_by_label("选择概念板块").first
-            if select:
+            select = page.get_by_label("选择概念板块").first
+            if await select.count():
                 await select.select_option("银行")
-                await page.wait_for_timeout(500)
             
             # 点击获取成分股
-            get_stocks_btn = await page.get_by_role("button", name="获取成分股").first
-            if get_stocks_btn:
+            get_stocks_btn = page.get_by_role("button", name="获取成分股").first
+            if await get_stocks_btn.count():
                 await get_stocks_btn.click()
-                await page.wait_for_timeout(2000)
+                # 等待成分股获取结果（需要请求Tushare，给较长的超时）
+                await self.wait_for_render(page, "text=/获取到 \\d+ 只成分股|未找到该主线成分股/", timeout=30000)
                 self.log_pass("获取板块成分股成功")
             
             # 点击开始分析（核心测试）
-            analyze_btn = await page.get_by_role("button", name="开始分析").first
-            if analyze_btn:
+            analyze_btn = page.get_by_role("button", name="开始分析").first
+            if await analyze_btn.count():
                 print("  ⏳ 开始执行分析，等待结果...")
                 await analyze_btn.click()
                 
-                # 等待分析完成（最多60秒）
-                try:
-                    await page.wait_for_selector("text=分析完成", timeout=60000)
+                # 等待分析完成或页面报错，先出现的一方决定结果（最多60秒，报错时不必等满超时）
+                finished = await self.wait_for_first(page, ["text=分析完成", ".stException"], timeout=60000)
+                if finished == "text=分析完成":
                     self.log_pass("分析功能执行成功")
-                except:
+                elif finished == ".stException":
+                    self.log_fail("分析过程中页面报错", "详见错误捕获检查")
+                else:
                     self.log_warn("分析可能未完成或提示文本不匹配")
                 
-                await page.wait_for_timeout(3000)
                 await self.capture_screenshot(page, "04_analysis_done")
                 
                 # 检查分析结果
-                results = await page.query_selector_all("[data-testid='stMetricValue']")
-                if len(results) > 0:
-                    self.log_pass("分析结果已显示", f"找到 {len(results)} 个指标")
+                metric_count = await page.locator("[data-testid='stMetricValue']").count()
+                if metric_count > 0:
+                    self.log_pass("分析结果已显示", f"找到 {metric_count} 个指标")
                 else:
                     self.log_warn("未找到分析结果指标")
                     
@@ -214,10 +455,10 @@ class ChanLunTester:
         
         try:
             # 检查评分说明是否存在
-            rating_info = await page.get_by_text("评分说明").first
-            if rating_info:
+            rating_info = page.get_by_text("评分说明").first
+            if await rating_info.count():
                 await rating_info.click()
-                await page.wait_for_timeout(500)
+                await self.wait_for_render(page, "[data-testid='stExpanderDetails']")
                 self.log_pass("评分说明功能正常")
                 await self.capture_screenshot(page, "05_rating_info")
             else:
@@ -231,11 +472,10 @@ class ChanLunTester:
         print("\n📌 测试6: 错误捕获检查（重点）")
         
         # 1. 检查 Streamlit 异常组件
-        error_elements = await page.query_selector_all(".stException")
-        if error_elements:
-            print(f"  ❌ 发现 {len(error_elements)} 个页面报错！")
-            for i, err in enumerate(error_elements):
-                content = await err.inner_text()
+        error_texts = await page.eval_on_selector_all(".stException", ALL_INNER_TEXTS_JS)
+        if error_texts:
+            print(f"  ❌ 发现 {len(error_texts)} 个页面报错！")
+            for i, content in enumerate(error_texts):
                 # 截断过长的错误信息
                 content_short = content[:500] + "..." if len(content) > 500 else content
                 print(f"  --- 错误 {i+1} ---")
@@ -253,28 +493,80 @@ class ChanLunTester:
                 else:
                     self.errors.append(f"UI Error: {content_short[:200]}")
                     
-                await self.capture_screenshot(page, f"error_{i+1}")
+                await self.capture_screenshot(page, f"error_{i+1}", full_page=True)
         else:
             print("  ✅ 未探测到 UI 异常")
             
-        # 2. 检查控制台错误
-        console_logs = []
-        # Playwright 不支持直接获取控制台日志，可以通过 page.evaluate 间接检查
+        # 2. 检查控制台错误（由new_page注册的console监听器在整个测试过程中收集）
+        if self.console_errors:
+            self.log_warn("浏览器控制台发现错误", str(self.console_errors))
+    
+    async def quick_check(self, url: Optional[str] = None) -> bool:
+        """快速检查：打开页面后只检查是否有Streamlit异常（url默认为self.url）"""
+        page = await self.new_page()
+        
+        try:
+            await page.goto(url or self.url, timeout=30000)
+            await self.wait_for_render(page, "h1, .stException", timeout=15000)
+            
+            # 快速检查错误
+            error_texts = await page.eval_on_selector_all(".stException", ALL_INNER_TEXTS_JS)
+            if error_texts:
+                print(f"❌ 发现 {len(error_texts)} 个错误")
+                for content in error_texts:
+                    print(f"  错误: {content[:200]}...")
+                return False
+            else:
+                print("✅ 页面运行正常")
+                return True
+                
+        except Exception as e:
+            print(f"❌ 测试失败: {e}")
+            return False
+        finally:
+            await page.close()
+    
+    async def wait_for_render(self, page: Page, selector: str, timeout: int = 5000) -> bool:
+        """等待下一步需要的元素出现（代替固定时长的等待）；超时返回False，由后续检查给出结论"""
         try:
-            js_errors = await page.evaluate("""() => {
-                return window.errors || [];
-            }""")
-            if js_errors:
-                self.log_warn("浏览器控制台发现错误", str(js_errors))
-        except:
-            pass
-    
-    async def capture_screenshot(self, page: Page, name: str):
-        """截取屏幕"""
+            await page.wait_for_selector(selector, timeout=timeout)
+            return True
+        except PlaywrightTimeoutError:
+            return False
+    
+    async def wait_for_first(self, page: Page, selectors: List[str], timeout: int = 5000) -> Optional[str]:
+        """同时等待多个选择器，返回最先出现的那个；超时或都失败时返回None（其余等待随即取消）"""
+        tasks = {asyncio.create_task(page.wait_for_selector(selector, timeout=timeout)): selector
+                 for selector in selectors}
+        done, pending = await asyncio.wait(tasks, timeout=timeout / 1000, return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() is None:
+                return tasks[task]
+        return None
+    
+    async def capture_screenshot(self, page: Page, name: str, full_page: bool = False):
+        """
+        截取屏幕：默认只截可视区域并存为JPEG（过程截图）
+        full_page=True 时截取整页并存为PNG（报错现场等需要完整页面的截图）
+        """
         timestamp = datetime.now().strftime("%H%M%S")
-        filename = f"screenshot_{name}_{timestamp}.png"
-        await page.screenshot(path=filename, full_page=True)
-        print(f"  📸 截图已保存: {filename}")
+        if full_page:
+            filename = f"screenshot_{name}_{timestamp}.png"
+            data = await page.screenshot(full_page=True)
+        else:
+            filename = f"screenshot_{name}_{timestamp}.jpg"
+            data = await page.screenshot(type="jpeg", quality=70)
+        
+        if self._screenshot_zip is None:
+            # 文件名带上地址的短hash，多个地址并行测试时各写各的zip
+            url_tag = hashlib.sha1(self.url.encode()).hexdigest()[:8]
+            self.screenshot_archive = f"artifacts_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{url_tag}.zip"
+            self._screenshot_zip = zipfile.ZipFile(self.screenshot_archive, "w", zipfile.ZIP_DEFLATED)
+        self._screenshot_zip.writestr(filename, data)
+        print(f"  📸 截图已保存: {self.screenshot_archive}/{filename}")
     
     def log_pass(self, message: str, detail: str = ""):
         """记录通过"""
@@ -294,7 +586,7 @@ class ChanLunTester:
     def generate_report(self) -> Dict:
         """生成测试报告"""
         print("\n" + "=" * 80)
-        print("📊 测试报告")
+        print(f"📊 测试报告: {self.url}")
         print("=" * 80)
         
         pass_count = sum(1 for r in self.results if r["status"] == "PASS")
@@ -313,6 +605,9 @@ class ChanLunTester:
         else:
             print("\n🎉 未发现严重错误")
             
+        if self.screenshot_archive:
+            print(f"\n📦 截图归档: {self.screenshot_archive}")
+        
         print(f"\n结束时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 80)
         
@@ -330,50 +625,72 @@ async def quick_test(url: str = "http://localhost:8501"):
     """快速测试模式"""
     print("🚀 快速测试模式")
     
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
+    async with ChanLunTester(url=url, headless=True) as tester:
+        return await tester.quick_check()
+
+
+async def quick_test_batch(urls: List[str]) -> Dict[str, bool]:
+    """批量快速测试：共用一个浏览器，多个地址同时检查（最多MAX_BROWSER_CONTEXTS个页面并发）"""
+    print(f"🚀 批量快速测试: {len(urls)} 个地址")
+    slots = asyncio.Semaphore(MAX_BROWSER_CONTEXTS)
+    
+    async with ChanLunTester(headless=True) as tester:
+        async def check(url: str) -> bool:
+            async with slots:
+                return await tester.quick_check(url)
         
-        try:
-            await page.goto(url, timeout=30000)
-            await page.wait_for_timeout(3000)
-            
-            # 快速检查错误
-            errors = await page.query_selector_all(".stException")
-            if errors:
-                print(f"❌ 发现 {len(errors)} 个错误")
-                for err in errors:
-                    content = await err.inner_text()
-                    print(f"  错误: {content[:200]}...")
-                return False
-            else:
-                print("✅ 页面运行正常")
-                return True
-                
-        except Exception as e:
-            print(f"❌ 测试失败: {e}")
-            return False
-        finally:
-            await browser.close()
+        results = await asyncio.gather(*(check(url) for url in urls))
+    
+    for url, success in zip(urls, results):
+        print(f"  {'✅' if success else '❌'} {url}")
+    return dict(zip(urls, results))
+
+
+async def full_test_batch(urls: List[str], headless: bool = True) -> Dict[str, Dict]:
+    """批量完整测试：各地址同时运行，从BrowserPool借用预热的浏览器（每个测试独立的BrowserContext）"""
+    async with BrowserPool(size=min(MAX_BROWSER_CONTEXTS, len(urls)), headless=headless) as pool:
+        async def run_one(url: str) -> Dict:
+            async with pool.browser() as browser:
+                return await ChanLunTester(url=url, browser=browser).run_full_test()
+        
+        results = await asyncio.gather(*(run_one(url) for url in urls))
+    return dict(zip(urls, results))
+
+
+def setup_playwright():
+    """安装Playwright及其浏览器（只在setup子命令中执行，导入本模块时不会触发）"""
+    import subprocess
+    print("⚙️ 正在安装 Playwright...")
+    subprocess.run([sys.executable, "-m", "pip", "install", "playwright"], check=True)
+    subprocess.run([sys.executable, "-m", "playwright", "install"], check=True)
+    print("✅ Playwright 安装完成")
 
 
 def main():
     parser = argparse.ArgumentParser(description="缠论选股系统自动化测试")
-    parser.add_argument("--url", default="http://localhost:8501", help="测试地址")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("setup", help="安装Playwright及浏览器后退出")
+    parser.add_argument("--url", nargs="+", default=["http://localhost:8501"], help="测试地址（可传多个）")
     parser.add_argument("--full", action="store_true", help="完整测试模式")
     parser.add_argument("--visible", action="store_true", help="显示浏览器窗口（非headless）")
     
     args = parser.parse_args()
     
+    if args.command == "setup":
+        setup_playwright()
+        return
+    
     if args.full:
-        tester = ChanLunTester(url=args.url, headless=not args.visible)
-        result = asyncio.run(tester.run_full_test())
+        results = asyncio.run(full_test_batch(args.url, headless=not args.visible))
         
         # 如果有错误，返回非0退出码
-        if result["fail"] > 0 or result["errors"]:
+        if any(result["fail"] > 0 or result["errors"] for result in results.values()):
             sys.exit(1)
+    elif len(args.url) > 1:
+        results = asyncio.run(quick_test_batch(args.url))
+        sys.exit(0 if all(results.values()) else 1)
     else:
-        success = asyncio.run(quick_test(args.url))
+        success = asyncio.run(quick_test(args.url[0]))
         sys.exit(0 if success else 1)
 
 
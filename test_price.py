@@ -4,14 +4,68 @@
 验证价格是否正确显示为71.6而非38.02
 """
 
+import functools
+import inspect
 import tushare as ts
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-import time
+
+# 尝试导入joblib，把Tushare查询结果缓存到磁盘（不可用时每次都请求接口）
+try:
+    from joblib import Memory
+except ImportError:
+    Memory = None
 
 # 设置Tushare token
 # 请替换为您的实际token
 pro = ts.pro_api()
 
+# 缓存按 (接口, 参数) 区分，只保存数据已定稿的查询
+_memory = Memory(".tushare_cache", verbose=0) if Memory is not None else None
+
+
+def _disk_cached(date_param=None):
+    """
+    有joblib时给Tushare查询加磁盘缓存
+    date_param: 查询日期的参数名；日期为今天或之后时当天数据可能尚未发布，直接请求接口、不读写缓存
+    返回空结果的查询也不留在缓存中，下次运行重新请求
+    """
+    def decorator(func):
+        if _memory is None:
+            return func
+        cached = _memory.cache(func)
+        signature = inspect.signature(func)
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if date_param is not None:
+                day = signature.bind(*args, **kwargs).arguments[date_param]
+                if day >= datetime.now().strftime('%Y%m%d'):
+                    return func(*args, **kwargs)
+            df = cached(*args, **kwargs)
+            if df is None or df.empty:
+                cached.call_and_shelve(*args, **kwargs).clear()
+            return df
+        
+        return wrapper
+    return decorator
+
+
+@_disk_cached(date_param='end_date')
+def fetch_daily(ts_code, start_date, end_date):
+    return pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+
+
+@_disk_cached(date_param='trade_date')
+def fetch_daily_basic(ts_code, trade_date):
+    return pro.daily_basic(ts_code=ts_code, trade_date=trade_date, fields='ts_code,close,open,high,low')
+
+
+@_disk_cached()
+def fetch_stock_basic(ts_code):
+    return pro.stock_basic(ts_code=ts_code, fields='ts_code,name,industry,list_date')
+
+
 def test_price_accuracy(symbol='603256'):
     """测试价格准确性"""
     print("=" * 60)
@@ -24,13 +78,20 @@ def test_price_accuracy(symbol='603256'):
     else:
         ts_code = f"{symbol}.SZ"
     
-    # 1. 获取历史日线数据（不复权）
-    print("\n1. 获取历史日线数据...")
     end_date = datetime.now().strftime('%Y%m%d')
     start_date = (datetime.now() - timedelta(days=90)).strftime('%Y%m%d')
+    today = end_date
+    
+    # 三个查询互不依赖，同时发出（只有3个请求，远低于Tushare每分钟的频次限制，无需再逐个sleep限速）
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        daily_future = executor.submit(fetch_daily, ts_code, start_date, end_date)
+        realtime_future = executor.submit(fetch_daily_basic, ts_code, today)
+        basic_future = executor.submit(fetch_stock_basic, ts_code)
     
+    # 1. 获取历史日线数据（不复权）
+    print("\n1. 获取历史日线数据...")
     try:
-        df_daily = pro.daily(ts_code=ts_code, start_date=start_date, end_date=end_date)
+        df_daily = daily_future.result()
         if df_daily is not None and not df_daily.empty:
             latest = df_daily.iloc[0]
             print(f"   历史数据最新价格: ¥{latest['close']}")
@@ -42,13 +103,10 @@ def test_price_accuracy(symbol='603256'):
     except Exception as e:
         print(f"   ❌ 获取历史数据失败: {e}")
     
-    time.sleep(0.5)  # 限速
-    
     # 2. 获取实时行情数据
     print("\n2. 获取实时行情数据...")
     try:
-        today = datetime.now().strftime('%Y%m%d')
-        df_realtime = pro.daily_basic(ts_code=ts_code, trade_date=today, fields='ts_code,close,open,high,low')
+        df_realtime = realtime_future.result()
         if df_realtime is not None and not df_realtime.empty:
             realtime = df_realtime.iloc[0]
             print(f"   实时行情价格: ¥{realtime['close']}")
@@ -60,12 +118,10 @@ def test_price_accuracy(symbol='603256'):
     except Exception as e:
         print(f"   ❌ 获取实时数据失败: {e}")
     
-    time.sleep(0.5)  # 限速
-    
     # 3. 获取股票基本信息
     print("\n3. 获取股票基本信息...")
     try:
-        df_basic = pro.stock_basic(ts_code=ts_code, fields='ts_code,name,industry,list_date')
+        df_basic = basic_future.result()
         if df_basic is not None and not df_basic.empty:
             info = df_basic.iloc[0]
             print(f"   股票名称: {info['name']}")
@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：app.py 在导入时读取 TUSHARE_TOKEN，测试中不访问真实接口"""
+
+import os
+import sys
+
+os.environ.setdefault("TUSHARE_TOKEN", "test-token")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""本地日线缓存的覆盖区间：只按实际返回的K线前移"""
+
+import pandas as pd
+import pytest
+
+app = pytest.importorskip("app")
+pytest.importorskip("pyarrow")
+
+CODE = "600000.SH"
+
+
+def _bars(*dates):
+    return pd.DataFrame({
+        "trade_date": list(dates),
+        "open": 10.0, "high": 11.0, "low": 9.0, "close": 10.5, "vol": 1000.0,
+    })
+
+
+@pytest.fixture
+def fake_daily(tmp_path, monkeypatch):
+    """把缓存目录指向临时目录，日线接口按预设的返回序列应答并记录请求区间"""
+    monkeypatch.setattr(app, "DAILY_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(app, "get_last_trade_date", lambda now=None: "20260513")
+    responses, requests = [], []
+
+    def fetch(ts_code, start_date, end_date):
+        requests.append((start_date, end_date))
+        return responses.pop(0)
+
+    monkeypatch.setattr(app, "_fetch_daily", fetch)
+    app.get_cached_stock_data.clear()
+    yield responses, requests
+    app.get_cached_stock_data.clear()
+
+
+def test_short_response_covers_only_returned_bars(fake_daily):
+    responses, _ = fake_daily
+    responses.append(_bars("20260511", "20260512"))  # 当天(13日)的K线尚未发布
+
+    df = app.get_cached_stock_data(CODE, "20260501", "20260513")
+
+    assert list(df["trade_date"]) == ["20260511", "20260512"]
+    assert app._daily_cache_meta(CODE) == ("20260501", "20260512")
+
+
+def test_empty_tail_does_not_advance_coverage(fake_daily):
+    responses, requests = fake_daily
+    app.save_daily_cache(CODE, _bars("20260511", "20260512"), "20260501")
+
+    responses.append(_bars()[:0])  # 补取时当天数据仍为空
+    app.get_cached_stock_data(CODE, "20260501", "20260513")
+    assert app._daily_cache_meta(CODE) == ("20260501", "20260512")
+
+    # 之后再次补取仍从13日开始请求，拿到K线后覆盖区间才前移
+    app.get_cached_stock_data.clear()
+    responses.append(_bars("20260513"))
+    df = app.get_cached_stock_data(CODE, "20260501", "20260513")
+
+    assert requests == [("20260513", "20260513"), ("20260513", "20260513")]
+    assert list(df["trade_date"]) == ["20260511", "20260512", "20260513"]
+    assert app._daily_cache_meta(CODE) == ("20260501", "20260513")
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""板块信息：接口临时失败的结果不进缓存"""
+
+import pandas as pd
+import pytest
+
+app = pytest.importorskip("app")
+
+
+class _FlakyCompanyApi:
+    """stock_company先按预设次数报限频错误，之后正常返回"""
+    
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+    
+    def stock_company(self, ts_code):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise Exception("抱歉，您每分钟最多访问该接口200次")
+        return pd.DataFrame({"ts_code": [ts_code], "industry": ["银行"]})
+
+
+@pytest.fixture
+def flaky_api(monkeypatch):
+    api = _FlakyCompanyApi(failures=1)
+    monkeypatch.setattr(app, "pro", api)
+    monkeypatch.setattr(app, "get_industry_map", lambda: {})
+    monkeypatch.setattr(app, "get_sector_money_flow", lambda days=5: ({"银行": 2.0}, False))
+    app.get_stock_industry.clear()
+    yield api
+    app.get_stock_industry.clear()
+
+
+def test_rate_limit_error_is_not_cached(flaky_api):
+    with pytest.raises(app._TushareUnavailable):
+        app.get_stock_sector_info("600000")
+    
+    info = app.get_stock_sector_info("600000")
+    
+    assert flaky_api.calls == 2
+    assert info["main_sector"] == "银行"
+    assert info["main_sector_flow"] == 2.0
+
+
+def test_analysis_without_sector_info_is_not_cached(monkeypatch):
+    sector_infos = [None, {"main_sector": "银行", "main_sector_flow": 2.0, "flow_is_mock": False}]
+    
+    def analyze(symbol, name, days, market_data=None, daily_df=None):
+        return {"code": symbol, "sector_info": sector_infos.pop(0)}
+    
+    monkeypatch.setattr(app, "analyze_single_stock", analyze)
+    app._analyze_single_stock_cached.clear()
+    try:
+        assert app.analyze_single_stock_cached("600000", "浦发银行", 90, "20260513")["sector_info"] is None
+        cached = app.analyze_single_stock_cached("600000", "浦发银行", 90, "20260513")
+        assert cached["sector_info"]["main_sector"] == "银行"
+        assert app.analyze_single_stock_cached("600000", "浦发银行", 90, "20260513") == cached
+    finally:
+        app._analyze_single_stock_cached.clear()
+
+
+def test_mock_flows_are_negatively_cached(monkeypatch):
+    """无pro权限时index_daily持续失败：5分钟内只请求一次，模拟数据带标记且不进分析缓存"""
+    calls = []
+    
+    class _NoPermissionApi:
+        def index_daily(self, **kwargs):
+            calls.append(kwargs)
+            raise Exception("抱歉，您没有访问该接口的权限")
+    
+    monkeypatch.setattr(app, "pro", _NoPermissionApi())
+    monkeypatch.setattr(app, "get_sw_industry_index",
+                        lambda level="L1": pd.DataFrame({"index_code": ["801780.SI"], "industry_name": ["银行"]}))
+    monkeypatch.setattr(app, "get_stock_industry", lambda symbol: "银行")
+    app._sector_money_flow_or_none.clear()
+    try:
+        infos = [app.get_stock_sector_info(f"60000{i}") for i in range(5)]
+    finally:
+        app._sector_money_flow_or_none.clear()
+    
+    assert len(calls) == 1
+    assert all(info["flow_is_mock"] for info in infos)
+    assert infos[0]["main_sector_flow"] == app.MOCK_SECTOR_FLOWS["银行"]
+    
+    analysis = {"code": "600000", "sector_info": infos[0]}
+    monkeypatch.setattr(app, "analyze_single_stock", lambda *args: dict(analysis))
+    app._analyze_single_stock_cached.clear()
+    try:
+        app.analyze_single_stock_cached("600000", "浦发银行", 90, "20260513")
+        analysis["sector_info"] = dict(infos[0], flow_is_mock=False, main_sector_flow=2.0)
+        result = app.analyze_single_stock_cached("600000", "浦发银行", 90, "20260513")
+    finally:
+        app._analyze_single_stock_cached.clear()
+    assert result["sector_info"]["main_sector_flow"] == 2.0
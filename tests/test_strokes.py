@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""笔的端点位置：经过包含合并后仍指向原始K线"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+app = pytest.importorskip("app")
+
+
+def _zigzag_with_inclusions():
+    """锯齿走势，每个转折后插入被包含/包含的K线，保证发生真实的合并"""
+    highs, lows = [], []
+    level = 10.0
+    for leg in range(8):
+        step = 1.0 if leg % 2 == 0 else -1.0
+        for _ in range(4):
+            level += step
+            highs.append(level + 0.5)
+            lows.append(level - 0.5)
+        # 内包K线：被上一根完全包含
+        highs.append(level + 0.3)
+        lows.append(level - 0.3)
+        # 外包K线：完全包含上一根
+        highs.append(level + 0.6)
+        lows.append(level - 0.6)
+    high = np.array(highs)
+    low = np.array(lows)
+    return pd.DataFrame({
+        "open": (high + low) / 2, "high": high, "low": low, "close": (high + low) / 2,
+    })
+
+
+def test_stroke_indices_map_to_raw_bars():
+    df = _zigzag_with_inclusions()
+    df_processed = app.handle_inclusion(df)
+    assert len(df_processed) < len(df)  # 确实发生了合并
+
+    strokes, _, _ = app.find_strokes(df_processed)
+    assert strokes
+
+    orig_idx = df_processed["orig_idx"].to_numpy()
+    group_end = np.append(orig_idx[1:], len(df))
+    merged_strokes, _, _ = app.find_strokes(df_processed.drop(columns="orig_idx"))
+    assert [s["end_idx"] for s in merged_strokes] != [s["end_idx"] for s in strokes]
+
+    for stroke, merged in zip(strokes, merged_strokes):
+        for key in ("start_idx", "end_idx"):
+            assert stroke[key] == orig_idx[merged[key]]
+        # 终点价格就是该原始K线所在合并组的极值
+        k = merged["end_idx"]
+        raw = df.iloc[orig_idx[k]:group_end[k]]
+        extreme = raw["high"].max() if stroke["type"] == "up" else raw["low"].min()
+        assert stroke["end"] == pytest.approx(extreme)
+
+
+def test_stroke_macd_areas_use_raw_positions():
+    df = app.calculate_macd(_zigzag_with_inclusions())
+    strokes, _, _ = app.find_strokes(app.handle_inclusion(df))
+    positive, negative = app.calculate_stroke_macd_areas(df, strokes)
+
+    hist = df["macd_hist"].to_numpy()
+    for stroke, pos, neg in zip(strokes, positive, negative):
+        window = hist[stroke["start_idx"]:stroke["end_idx"] + 1]
+        assert pos == pytest.approx(window[window > 0].sum())
+        assert neg == pytest.approx(-window[window < 0].sum())